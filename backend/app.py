@@ -1,32 +1,200 @@
 import os
-from flask import Flask, request, jsonify
+import click
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from database import Database
-import re
-from datetime import datetime
+from werkzeug.exceptions import RequestEntityTooLarge
+from database import (LazyDatabase, MovimentoInvalido, PRODUTO_COLUMNS, FUNCIONARIO_COLUMNS,
+                      EVENTS_RELAY, WORKERS, criar_dados_teste, is_postgres_url,
+                      open_database)
+import migrations
+from pagination import parse_limit, parse_fields
+from export import FORMATS, export_stream
+from validators import (validate_email, clean_string, is_integer, in_int_range,
+                        parse_quantidade, MAX_QUANTIDADE)
+from stats import DEFAULT_LIMITE
+from cache import ResponseCache, cached
+import metrics
+import ratelimit
+from serialization import stream_array
+from events import format_sse
+from errors import UniqueConflict
+from bulk import (BulkConflict, CONFLICT_POLICIES, detect_format, parse_payload,
+                  validate_rows)
+import time
+from datetime import datetime, timezone
 
 app = Flask(__name__)
 CORS(app)  # Permite requisicoes do React
+metrics.init_app(app)  # Tempos por requisicao e SQL executado
+ratelimit.init_app(app)  # 429 por cliente/rota, 503 sob sobrecarga
 
-# Instancia da database
-db = Database()
+def database_file():
+    """DATABASE_URL (postgresql://...) ou DATABASE_FILE (SQLite)"""
+    return (os.environ.get('DATABASE_URL')
+            or os.environ.get('DATABASE_FILE', 'fabrismart.db'))
 
-def validate_email(email):
-    """Validacao de email - regex simples mas funcional"""
-    if not email:
-        return False
+def open_app_database(target):
+    """Database do app - o relay de eventos depende do servidor (events_relay)"""
+    return open_database(target, events_relay=events_relay())
+
+# Instancia da database, criada na primeira requisicao (DATABASE_FILE
+# permite apontar para outro arquivo). Importar o app nao toca no banco.
+db = LazyDatabase(lambda: open_app_database(database_file()))
+
+def table_versions(tables):
+    """Versoes para o cache - resolvida por chamada para nao abrir o banco no import"""
+    return db.table_versions(tables)
+
+def create_app(db_file=None, warm=False):
+    """Entrada do servidor: gunicorn 'app:create_app()'
+    
+    db_file (arquivo ou URL postgresql://) troca o banco antes do primeiro
+    uso; warm=True conecta agora em vez de na primeira requisicao.
+    """
+    if db_file:
+        db.configure(lambda: open_app_database(db_file))
+    if warm:
+        db.get()
+    return app
+
+@app.cli.command('init-db')
+@click.option('--seed', is_flag=True, help='Cria dados de exemplo')
+def init_db_command(seed):
+    """Aplica migracoes uma vez por deploy (antes de subir os workers)"""
+    target = database_file()
+    if is_postgres_url(target):
+        # No PostgreSQL o schema e criado (IF NOT EXISTS) ao abrir o banco
+        db.get()
+    else:
+        migrations.main(['--db', target])
+    if seed:
+        criar_dados_teste(db.get())
+
+# Cache de respostas GET (invalidado pelas versoes de tabela no banco)
+response_cache = ResponseCache()
+
+def int_arg(nome):
+    """Le parametro inteiro opcional da query string"""
+    valor = request.args.get(nome)
+    if valor is None or valor == '':
+        return None
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise ValueError(f'{nome} deve ser um numero')
+    # Maior que o INTEGER do banco: OverflowError no driver (500)
+    if not in_int_range(numero):
+        raise ValueError(f'{nome} fora do intervalo permitido')
+    return numero
+
+# Listas completas acima disso saem em streaming (sem montar tudo em memoria)
+STREAM_THRESHOLD = int(os.environ.get('STREAM_THRESHOLD', 5000))
+
+def full_list_response(table, columns, lista):
+    """Lista completa: jsonify (cacheavel) se pequena, streaming se grande"""
+    if db.count_rows(table) <= STREAM_THRESHOLD:
+        return jsonify(lista())
     
-    # Pattern basico de email
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
-
-def clean_string(text):
-    """Limpa string de entrada - experiencia com limpeza de dados"""
-    if not text:
-        return ""
-    # Remove espacos e limita tamanho
-    cleaned = text.strip()
-    return cleaned[:200]  # Limita tamanho para seguranca
+    batches = db.iter_rows(table, columns, order_by='nome')
+    # Mesma ordem de chaves do jsonify - o formato nao muda com o tamanho
+    stream = stream_array(columns, batches, sort_keys=app.json.sort_keys)
+    return Response(stream, mimetype='application/json')
+
+# Parametros que ativam a resposta paginada
+LIST_PARAMS = ('limit', 'cursor', 'fields', 'categoria', 'cargo', 'estoque',
+               'qtd_min', 'qtd_max')
+
+def wants_page():
+    return any(p in request.args for p in LIST_PARAMS)
+
+def export_response(table, columns):
+    """Resposta em streaming para /export (?format=ndjson|csv&gzip=1)"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return jsonify({'error': 'Formato deve ser ndjson ou csv'}), 400
+    
+    compress = request.args.get('gzip') in ('1', 'true')
+    
+    # Primeiro lote so e lido quando o cliente comeca a consumir
+    batches = db.iter_rows(table, columns)
+    stream = export_stream(columns, batches, fmt, compress)
+    
+    filename = f"{table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    
+    return Response(stream, mimetype=FORMATS[fmt], headers=headers)
+
+# Corpo maximo por requisicao em bytes (padrao 16 MB): o upload do bulk e
+# lido inteiro antes de ser dividido em lotes
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
+
+def body_too_large_error():
+    limite = app.config['MAX_CONTENT_LENGTH']
+    return {'error': f'Corpo da requisicao muito grande (maximo {limite} bytes)'}
+
+def body_too_large():
+    return jsonify(body_too_large_error()), 413
+
+@app.before_request
+def limitar_corpo():
+    """Recusa pelo Content-Length antes de qualquer rota ler o corpo"""
+    limite = app.config['MAX_CONTENT_LENGTH']
+    if limite and request.content_length and request.content_length > limite:
+        return body_too_large()
+
+def bulk_import(table):
+    """Importacao em lote: JSON, NDJSON ou CSV (corpo ou upload 'file')
+    
+    ?on_conflict=skip|upsert|fail (padrao fail - tudo ou nada)
+    """
+    on_conflict = request.args.get('on_conflict', 'fail')
+    if on_conflict not in CONFLICT_POLICIES:
+        return jsonify({'error': 'on_conflict deve ser skip, upsert ou fail'}), 400
+    
+    try:
+        upload = request.files.get('file')
+        if upload:
+            raw = upload.read()
+            fmt = request.args.get('format') or detect_format(upload.mimetype, upload.filename)
+        else:
+            raw = request.get_data()
+            fmt = request.args.get('format') or detect_format(request.content_type)
+    except RequestEntityTooLarge:
+        # Corpo sem Content-Length (chunked) passou do limite durante a leitura
+        return body_too_large()
+    
+    if not raw:
+        return jsonify({'error': 'Nenhum dado fornecido'}), 400
+    
+    try:
+        rows = parse_payload(raw, fmt)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'error': f'Arquivo invalido: {e}'}), 400
+    
+    validas, erros = validate_rows(table, rows)
+    resultado = {
+        'total': len(rows),
+        'gravados': 0,
+        'ignorados': 0,
+        'invalidos': len(erros),
+        'erros': erros,
+    }
+    
+    # Politica fail nao grava nada se houver linha invalida
+    if on_conflict == 'fail' and erros:
+        return jsonify(resultado), 400
+    
+    try:
+        gravados = db.bulk_insert(table, validas, on_conflict=on_conflict)
+    except BulkConflict as e:
+        resultado['erros'].append({'linha': e.linha, 'error': 'Registro duplicado'})
+        return jsonify(resultado), 409
+    
+    resultado['gravados'] = gravados
+    resultado['ignorados'] = len(validas) - gravados
+    return jsonify(resultado)
 
 # Rota principal
 @app.route('/')
@@ -38,7 +206,7 @@ def home():
         return jsonify({
             'message': 'API Fabrismart funcionando',
             'timestamp': datetime.now().isoformat(),
-            'database': 'SQLite',
+            'database': db.backend,
             'produtos': stats['total_produtos'],
             'funcionarios': stats['total_funcionarios'],
             'endpoints': [
@@ -50,7 +218,23 @@ def home():
                 'POST /api/funcionarios',
                 'PUT /api/funcionarios/{id}',
                 'DELETE /api/funcionarios/{id}',
-                'GET /api/stats'
+                'POST /api/produtos/movimentos',
+                'POST /api/produtos/{id}/estoque',
+                'GET /api/produtos/{id}/movimentos',
+                'GET /api/produtos/low-stock',
+                'GET /api/limites',
+                'PUT /api/limites/{categoria}',
+                'POST /api/produtos/bulk',
+                'POST /api/produtos/batch-get',
+                'POST /api/funcionarios/batch-get',
+                'POST /api/funcionarios/bulk',
+                'GET /api/produtos/export',
+                'GET /api/funcionarios/export',
+                'GET /api/search?q=',
+                'GET /api/stats',
+                'GET /api/stats/history',
+                'GET /api/events',
+                'GET /api/metrics'
             ]
         })
     except Exception as e:
@@ -61,11 +245,14 @@ def home():
 def health_check():
     """Verifica se API esta funcionando"""
     try:
-        # Testa database
-        stats = db.get_stats()
+        # Testa database - SELECT 1 numa conexao do pool
+        pool = db.health_check()
         return jsonify({
             'status': 'ok',
             'database': 'connected',
+            'pool': pool,
+            'events': {'live': events_live()},
+            **ratelimit.stats(),
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
@@ -76,11 +263,100 @@ def health_check():
 
 # PRODUTOS - CRUD completo
 @app.route('/api/produtos', methods=['GET'])
+@cached(response_cache, table_versions, 'produtos')
 def listar_produtos():
-    """Lista todos os produtos"""
+    """Lista produtos - paginado com ?limit=&cursor= e filtros"""
     try:
-        produtos = db.get_produtos()
-        return jsonify(produtos)
+        # Sem parametros mantem o formato antigo (lista completa)
+        if not wants_page():
+            return full_list_response('produtos', PRODUTO_COLUMNS, db.get_produtos)
+        
+        try:
+            items, next_cursor = db.list_produtos(
+                limit=parse_limit(request.args.get('limit')),
+                cursor=request.args.get('cursor'),
+                categoria=request.args.get('categoria'),
+                estoque=request.args.get('estoque'),
+                qtd_min=int_arg('qtd_min'),
+                qtd_max=int_arg('qtd_max'),
+                fields=parse_fields(request.args.get('fields'), PRODUTO_COLUMNS),
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({'items': items, 'next_cursor': next_cursor})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/produtos/low-stock', methods=['GET'])
+@cached(response_cache, table_versions, 'produtos')
+def listar_reposicao():
+    """Produtos no limite de reposicao ou abaixo, mais urgentes primeiro"""
+    try:
+        try:
+            items, next_cursor = db.list_reposicao(
+                limit=parse_limit(request.args.get('limit')),
+                cursor=request.args.get('cursor'),
+                categoria=request.args.get('categoria'),
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({'items': items, 'next_cursor': next_cursor})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/limites', methods=['GET'])
+@cached(response_cache, table_versions, 'produtos')
+def listar_limites():
+    """Limites de reposicao por categoria"""
+    try:
+        return jsonify({
+            'padrao': DEFAULT_LIMITE,
+            'limites': db.get_limites()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/limites/<categoria>', methods=['PUT'])
+def definir_limite(categoria):
+    """Define o limite de reposicao de uma categoria"""
+    try:
+        data = request.get_json()
+        if not data or 'limite' not in data:
+            return jsonify({'error': 'Campo limite e obrigatorio'}), 400
+        
+        categoria = clean_string(categoria)
+        if not categoria:
+            return jsonify({'error': 'Categoria eh obrigatoria'}), 400
+        
+        # Mesma regra do delta: true e 2.7 nao viram 1 e 2
+        limite = data['limite']
+        if not is_integer(limite):
+            return jsonify({'error': 'limite deve ser um numero inteiro'}), 400
+        
+        try:
+            db.set_limite(categoria, limite)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({'categoria': categoria, 'limite': limite})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/produtos/batch-get', methods=['POST'])
+def buscar_produtos_lote():
+    """Varios produtos por id numa chamada"""
+    try:
+        return batch_get('produtos', PRODUTO_COLUMNS)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/produtos/export', methods=['GET'])
+def exportar_produtos():
+    """Exporta todos os produtos em streaming"""
+    try:
+        return export_response('produtos', PRODUTO_COLUMNS)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -108,11 +384,9 @@ def criar_produto():
         
         # Valida quantidade
         try:
-            quantidade = int(quantidade)
-            if quantidade < 0:
-                return jsonify({'error': 'Quantidade nao pode ser negativa'}), 400
-        except (ValueError, TypeError):
-            return jsonify({'error': 'Quantidade deve ser um numero'}), 400
+            quantidade = parse_quantidade(quantidade)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Tenta criar produto
         try:
@@ -120,16 +394,23 @@ def criar_produto():
             produto = db.get_produto_by_id(produto_id)
             return jsonify(produto), 201
             
-        except Exception as e:
-            # Verifica se é erro de duplicata
-            if 'UNIQUE constraint failed' in str(e):
-                return jsonify({'error': 'Produto ja existe nesta categoria'}), 409
-            else:
-                return jsonify({'error': 'Erro ao criar produto'}), 500
+        except UniqueConflict:
+            # Duplicata (mesmo erro tipado no SQLite e no PostgreSQL)
+            return jsonify({'error': 'Produto ja existe nesta categoria'}), 409
+        except Exception:
+            return jsonify({'error': 'Erro ao criar produto'}), 500
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/produtos/bulk', methods=['POST'])
+def importar_produtos():
+    """Importa produtos em lote"""
+    try:
+        return bulk_import('produtos')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/produtos/<int:produto_id>', methods=['PUT'])
 def atualizar_produto(produto_id):
     """Atualiza produto existente"""
@@ -152,11 +433,9 @@ def atualizar_produto(produto_id):
             return jsonify({'error': 'Nome e categoria sao obrigatorios'}), 400
         
         try:
-            quantidade = int(quantidade)
-            if quantidade < 0:
-                return jsonify({'error': 'Quantidade nao pode ser negativa'}), 400
-        except:
-            return jsonify({'error': 'Quantidade deve ser um numero'}), 400
+            quantidade = parse_quantidade(quantidade)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Atualiza produto
         db.update_produto(produto_id, nome, categoria, quantidade)
@@ -164,6 +443,124 @@ def atualizar_produto(produto_id):
         
         return jsonify(produto_atualizado)
         
+    except UniqueConflict:
+        return jsonify({'error': 'Produto ja existe nesta categoria'}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def batch_get(table, columns):
+    """Corpo {"ids": [...], "fields": [...]} -> itens na ordem dos ids"""
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('ids'), list):
+        return jsonify({'error': 'Campo ids (lista) e obrigatorio'}), 400
+    
+    ids = data['ids']
+    if not all(is_integer(i) for i in ids):
+        return jsonify({'error': 'ids deve conter apenas numeros inteiros'}), 400
+    if not all(in_int_range(i) for i in ids):
+        return jsonify({'error': 'ids fora do intervalo permitido'}), 400
+    
+    fields = data.get('fields') or []
+    if not isinstance(fields, list) or not all(isinstance(f, str) for f in fields):
+        return jsonify({'error': 'fields deve ser uma lista de nomes de campos'}), 400
+    
+    try:
+        fields = parse_fields(','.join(fields), columns)
+        items = db.get_many(table, ids, fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'items': items,
+        'missing': [i for i, item in zip(ids, items) if item is None]
+    })
+
+def parse_movimento(item, produto_id=None):
+    """Valida um movimento {produto_id, delta, motivo}"""
+    if not isinstance(item, dict):
+        raise ValueError('Movimento deve ser um objeto')
+    
+    if produto_id is None:
+        produto_id = item.get('produto_id')
+    if not is_integer(produto_id):
+        raise ValueError('produto_id deve ser um numero inteiro')
+    if not in_int_range(produto_id):
+        raise ValueError('produto_id fora do intervalo permitido')
+    
+    delta = item.get('delta')
+    if not is_integer(delta):
+        raise ValueError('delta deve ser um numero inteiro')
+    if not -MAX_QUANTIDADE <= delta <= MAX_QUANTIDADE:
+        raise ValueError('delta fora do intervalo permitido')
+    if delta == 0:
+        raise ValueError('delta nao pode ser zero')
+    
+    motivo = clean_string(item.get('motivo') or '') or None
+    return produto_id, delta, motivo
+
+def aplicar_movimentos(movimentos, unico=False):
+    """Executa movimentos e monta resposta (404/409 desfaz o lote todo)"""
+    try:
+        resultado = db.movimentar_estoque(movimentos)
+    except MovimentoInvalido as e:
+        status = 404 if str(e) == 'Produto nao encontrado' else 409
+        return jsonify({
+            'error': str(e),
+            'indice': e.indice,
+            'produto_id': e.produto_id
+        }), status
+    return jsonify(resultado[0] if unico else resultado)
+
+@app.route('/api/produtos/movimentos', methods=['POST'])
+def movimentar_estoque():
+    """Aplica lote de movimentos de estoque (delta) atomicamente"""
+    try:
+        dados = request.get_json(silent=True)
+        if isinstance(dados, dict):
+            dados = dados.get('movimentos')
+        if not dados or not isinstance(dados, list):
+            return jsonify({'error': 'Lista de movimentos obrigatoria'}), 400
+        
+        try:
+            movimentos = [parse_movimento(item) for item in dados]
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return aplicar_movimentos(movimentos)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/produtos/<int:produto_id>/estoque', methods=['POST'])
+def movimentar_produto(produto_id):
+    """Movimento unico: {delta, motivo} - uma ida ao banco"""
+    try:
+        dados = request.get_json(silent=True)
+        if not dados:
+            return jsonify({'error': 'Nenhum dado fornecido'}), 400
+        
+        try:
+            movimento = parse_movimento(dados, produto_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return aplicar_movimentos([movimento], unico=True)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/produtos/<int:produto_id>/movimentos', methods=['GET'])
+@cached(response_cache, table_versions, 'produtos')
+def listar_movimentos(produto_id):
+    """Historico de movimentos do produto"""
+    try:
+        if not in_int_range(produto_id):
+            return jsonify({'error': 'produto_id fora do intervalo permitido'}), 400
+        try:
+            limit = parse_limit(request.args.get('limit'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(db.get_movimentos(produto_id, limit))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -184,11 +581,40 @@ def excluir_produto(produto_id):
 
 # FUNCIONARIOS - CRUD completo
 @app.route('/api/funcionarios', methods=['GET'])
+@cached(response_cache, table_versions, 'funcionarios')
 def listar_funcionarios():
     """Lista funcionarios"""
     try:
-        funcionarios = db.get_funcionarios()
-        return jsonify(funcionarios)
+        if not wants_page():
+            return full_list_response('funcionarios', FUNCIONARIO_COLUMNS, db.get_funcionarios)
+        
+        try:
+            items, next_cursor = db.list_funcionarios(
+                limit=parse_limit(request.args.get('limit')),
+                cursor=request.args.get('cursor'),
+                cargo=request.args.get('cargo'),
+                fields=parse_fields(request.args.get('fields'), FUNCIONARIO_COLUMNS),
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({'items': items, 'next_cursor': next_cursor})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/funcionarios/batch-get', methods=['POST'])
+def buscar_funcionarios_lote():
+    """Varios funcionarios por id numa chamada"""
+    try:
+        return batch_get('funcionarios', FUNCIONARIO_COLUMNS)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/funcionarios/export', methods=['GET'])
+def exportar_funcionarios():
+    """Exporta todos os funcionarios em streaming"""
+    try:
+        return export_response('funcionarios', FUNCIONARIO_COLUMNS)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -223,15 +649,22 @@ def criar_funcionario():
             funcionario = db.get_funcionario_by_id(funcionario_id)
             return jsonify(funcionario), 201
             
-        except Exception as e:
-            if 'UNIQUE constraint failed' in str(e):
-                return jsonify({'error': 'Email ja cadastrado'}), 409
-            else:
-                return jsonify({'error': 'Erro ao criar funcionario'}), 500
+        except UniqueConflict:
+            return jsonify({'error': 'Email ja cadastrado'}), 409
+        except Exception:
+            return jsonify({'error': 'Erro ao criar funcionario'}), 500
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/funcionarios/bulk', methods=['POST'])
+def importar_funcionarios():
+    """Importa funcionarios em lote"""
+    try:
+        return bulk_import('funcionarios')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/funcionarios/<int:funcionario_id>', methods=['PUT'])
 def atualizar_funcionario(funcionario_id):
     """Atualiza funcionario"""
@@ -262,11 +695,8 @@ def atualizar_funcionario(funcionario_id):
             funcionario_atualizado = db.get_funcionario_by_id(funcionario_id)
             return jsonify(funcionario_atualizado)
             
-        except Exception as e:
-            if 'UNIQUE constraint failed' in str(e):
-                return jsonify({'error': 'Email ja usado por outro funcionario'}), 409
-            else:
-                raise e
+        except UniqueConflict:
+            return jsonify({'error': 'Email ja usado por outro funcionario'}), 409
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -285,8 +715,44 @@ def excluir_funcionario(funcionario_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# BUSCA full-text
+@app.route('/api/search', methods=['GET'])
+@cached(response_cache, table_versions, 'produtos', 'funcionarios')
+def buscar():
+    """Busca por prefixo: ?q=&tipo=produtos|funcionarios&limit=&offset="""
+    try:
+        if not db.fts_enabled:
+            return jsonify({'error': 'Busca indisponivel (SQLite sem FTS5)'}), 501
+        
+        q = clean_string(request.args.get('q', ''))
+        if not q:
+            return jsonify({'error': 'Parametro q eh obrigatorio'}), 400
+        
+        tipo = request.args.get('tipo')
+        tabelas = ('produtos', 'funcionarios') if not tipo else (tipo,)
+        if any(t not in ('produtos', 'funcionarios') for t in tabelas):
+            return jsonify({'error': 'tipo deve ser produtos ou funcionarios'}), 400
+        
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            offset = int_arg('offset') or 0
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if offset < 0:
+            return jsonify({'error': 'offset nao pode ser negativo'}), 400
+        
+        resultado = {'q': q, 'limit': limit, 'offset': offset}
+        for tabela in tabelas:
+            resultado[tabela] = db.search(tabela, q, limit, offset)
+        
+        return jsonify(resultado)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ESTATISTICAS para dashboard
 @app.route('/api/stats', methods=['GET'])
+@cached(response_cache, table_versions, 'produtos', 'funcionarios')
 def get_stats():
     """Retorna estatisticas do sistema"""
     try:
@@ -306,11 +772,133 @@ def get_stats():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# 9999-12-31T23:59:59Z - cabe no INTEGER do SQLite e no datetime
+MAX_EPOCH = 253402300799
+
+def time_arg(nome, padrao):
+    """from/to: epoch em segundos ou data ISO 8601 (sem fuso = UTC)"""
+    valor = request.args.get(nome)
+    if not valor:
+        return padrao
+    try:
+        ts = int(float(valor))
+    except OverflowError:
+        raise ValueError(f'{nome} fora do intervalo permitido')
+    except ValueError:
+        try:
+            data = datetime.fromisoformat(valor)
+        except ValueError:
+            raise ValueError(f'{nome} deve ser epoch ou data ISO 8601')
+        if data.tzinfo is None:
+            data = data.replace(tzinfo=timezone.utc)
+        ts = int(data.timestamp())
+    if not 0 <= ts <= MAX_EPOCH:
+        raise ValueError(f'{nome} fora do intervalo permitido')
+    return ts
+
+@app.route('/api/stats/history', methods=['GET'])
+def get_stats_history():
+    """Serie historica (?from=&to=&step=minute|hour|day) - um nivel de rollup so"""
+    try:
+        try:
+            fim = time_arg('to', int(time.time()))
+            inicio = time_arg('from', fim - 86400)
+            if inicio > fim:
+                raise ValueError('from deve ser anterior a to')
+            step, series = db.get_history(inicio, fim, request.args.get('step') or None)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({'from': inicio, 'to': fim, 'step': step, 'series': series})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# FEED DE MUDANCAS
+# Comentario de keep-alive - proxies derrubam conexoes sem trafego
+EVENTS_HEARTBEAT = float(os.environ.get('EVENTS_HEARTBEAT', 15))
+
+# Cada cliente do feed prende a resposta indefinidamente: so vale com o
+# asgi.py (stream no event loop) ou servidor WSGI com threads
+# (EVENTS_STREAMING=1). Worker sync ficaria preso num dashboard so.
+app.config['EVENTS_STREAMING'] = os.environ.get('EVENTS_STREAMING') == '1'
+
+def events_relay():
+    """Relay entre workers: EVENTS_RELAY se definido, senao so quando ha feed
+    
+    No gunicorn sync (sem streaming) ninguem consome os eventos dos outros
+    workers - o relay so custaria um INSERT por escrita e o polling.
+    """
+    if EVENTS_RELAY is not None:
+        return EVENTS_RELAY == '1'
+    return app.config['EVENTS_STREAMING'] and WORKERS > 1
+
+def events_live():
+    """Feed utilizavel: servidor com streaming e eventos de todos os workers"""
+    return app.config['EVENTS_STREAMING'] and (WORKERS <= 1 or db.relay is not None)
+
+def events_unavailable():
+    # Status != 200: o EventSource desiste em vez de reconectar
+    return jsonify({'error': 'Feed de eventos indisponivel neste servidor (use asgi.py)'}), 501
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """Server-Sent Events: entity, id, op, bucket e contadores a cada escrita"""
+    if not events_live():
+        return events_unavailable()
+    
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+    
+    bus = db.events
+    sub = bus.subscribe(last_id)
+    if sub is None:
+        response = jsonify({'error': 'Limite de conexoes do feed atingido'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    
+    def gerar():
+        try:
+            yield b'retry: 3000\n\n'
+            # Cliente lento derrubado: o navegador reconecta com Last-Event-ID
+            while not sub.dropped:
+                event = sub.get(EVENTS_HEARTBEAT)
+                yield b': ping\n\n' if event is None else format_sse(event)
+        finally:
+            bus.unsubscribe(sub)
+    
+    response = Response(gerar(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# METRICAS
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Histogramas por rota no formato Prometheus"""
+    return Response(metrics.render_prometheus(),
+                    mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/metrics/slow', methods=['GET'])
+def get_slow_requests():
+    """Requisicoes amostradas mais lentas com o SQL (PROFILE_SAMPLE_RATE)"""
+    return jsonify({
+        'sample_rate': metrics.profiler.sample_rate,
+        'requests': metrics.profiler.slowest()
+    })
+
 # Error handlers basicos
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint nao encontrado'}), 404
 
+@app.errorhandler(413)
+def request_too_large(error):
+    return body_too_large()
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Erro interno do servidor'}), 500
@@ -0,0 +1,274 @@
+"""Entrada ASGI - serve as mesmas rotas do app.py num servidor async
+
+    uvicorn asgi:application --host 0.0.0.0 --port $PORT
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker
+
+Conexoes ociosas (keep-alive) ficam no event loop e nao prendem threads.
+So o processamento da rota Flask roda num executor limitado (ASGI_WORKERS);
+as rotas continuam chamando o Database sincrono dentro dele. Cliente que
+desconecta no meio de um stream libera a thread no proximo chunk.
+
+O corpo da requisicao e lido inteiro (memoria/disco) antes da rota, com
+ou sem Content-Length (chunked); passou de MAX_CONTENT_LENGTH, a leitura
+para e a resposta e 413 sem chegar ao Flask.
+
+O feed /api/events roda direto no event loop: cada dashboard aberto e so
+uma fila e uma corrotina, sem thread presa.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from app import app, db, body_too_large_error, events_live, EVENTS_HEARTBEAT
+from events import format_sse
+from serialization import dumps
+
+# Corpo maior que isso vai para disco em vez de memoria
+SPOOL_SIZE = 1024 * 1024
+
+EVENTS_PATH = '/api/events'
+
+# Marca para o app: este servidor aguenta o feed
+app.config['EVENTS_STREAMING'] = True
+
+
+async def wait_disconnect(receive):
+    """Termina quando o cliente fecha a conexao"""
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+class WSGIBridge:
+    """Adaptador ASGI -> WSGI com executor proprio e respostas em streaming"""
+
+    def __init__(self, wsgi_app, max_workers=None):
+        self.wsgi_app = wsgi_app
+        max_workers = max_workers or int(os.environ.get('ASGI_WORKERS', 32))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='asgi-wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            if scope['path'] == EVENTS_PATH and scope['method'] == 'GET':
+                await self.events(scope, receive, send)
+            else:
+                await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                # Sem requisicoes o banco nunca foi aberto - nada a fechar
+                if db.initialized:
+                    db.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        limite = app.config.get('MAX_CONTENT_LENGTH')
+        declarado = dict(scope.get('headers', [])).get(b'content-length', b'')
+        if limite and declarado.isdigit() and int(declarado) > limite:
+            await self.too_large(send)
+            return
+
+        body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if limite and size > limite:
+                # Chunked sem fim nao vai parar no disco
+                body.close()
+                await self.too_large(send)
+                return
+            body.write(chunk)
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+
+        loop = asyncio.get_running_loop()
+        environ = self.build_environ(scope, body, size)
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        def call_app():
+            iterable = self.wsgi_app(environ, start_response)
+            return iterable, iter(iterable)
+
+        iterable, chunks = await loop.run_in_executor(self.executor, call_app)
+        # O servidor descarta send() depois que o cliente sai: sem olhar o
+        # receive() o stream seguiria gerando chunks numa thread do executor
+        disconnect = asyncio.ensure_future(wait_disconnect(receive))
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': response['status'],
+                'headers': response['headers'],
+            })
+            # Cada chunk e gerado no executor (exports/streams leem do banco)
+            while True:
+                pending = loop.run_in_executor(self.executor, next, chunks, None)
+                await asyncio.wait({pending, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+                if not pending.done():
+                    # Cliente saiu: espera so o chunk em andamento e para
+                    await asyncio.wait({pending})
+                    return
+                chunk = pending.result()
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk,
+                                'more_body': True})
+                if disconnect.done():
+                    return
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnect.cancel()
+            if hasattr(iterable, 'close'):
+                await loop.run_in_executor(self.executor, iterable.close)
+            body.close()
+
+    @staticmethod
+    async def too_large(send):
+        """413 no mesmo formato da rota Flask, sem ler o resto do corpo"""
+        await send({'type': 'http.response.start', 'status': 413, 'headers': [
+            (b'content-type', b'application/json'), (b'connection', b'close')]})
+        await send({'type': 'http.response.body', 'body': dumps(body_too_large_error())})
+
+    async def events(self, scope, receive, send):
+        """Feed SSE no event loop - mesmo protocolo da rota Flask"""
+        loop = asyncio.get_running_loop()
+        # Primeiro acesso pode abrir o banco (migracoes): fora do loop
+        if not await loop.run_in_executor(self.executor, events_live):
+            # A rota Flask responde o erro
+            await self.http(scope, receive, send)
+            return
+
+        wake = asyncio.Event()
+        bus = db.events
+        sub = bus.subscribe(self.last_event_id(scope),
+                            notify=lambda: loop.call_soon_threadsafe(wake.set))
+        if sub is None:
+            await send({'type': 'http.response.start', 'status': 503, 'headers': [
+                (b'content-type', b'application/json'), (b'retry-after', b'30')]})
+            await send({'type': 'http.response.body',
+                        'body': dumps({'error': 'Limite de conexoes do feed atingido'})})
+            return
+
+        def body(data):
+            return {'type': 'http.response.body', 'body': data, 'more_body': True}
+
+        disconnect = asyncio.ensure_future(wait_disconnect(receive))
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ]})
+            await send(body(b'retry: 3000\n\n'))
+
+            # Cliente lento derrubado: o navegador reconecta com Last-Event-ID
+            while not sub.dropped and not disconnect.done():
+                event = sub.get_nowait()
+                if event is None:
+                    # Limpa antes de olhar a fila de novo: um publish no meio acorda
+                    wake.clear()
+                    event = sub.get_nowait()
+                if event is not None:
+                    await send(body(format_sse(event)))
+                    continue
+
+                waiter = asyncio.ensure_future(wake.wait())
+                done, _ = await asyncio.wait({waiter, disconnect}, timeout=EVENTS_HEARTBEAT,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if not done:
+                    await send(body(b': ping\n\n'))
+
+            if not disconnect.done():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnect.cancel()
+            bus.unsubscribe(sub)
+
+    @staticmethod
+    def last_event_id(scope):
+        """Header Last-Event-ID (reconexao) ou ?last_event_id="""
+        valor = dict(scope.get('headers', [])).get(b'last-event-id', b'').decode('latin-1')
+        if not valor:
+            query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+            valor = query.get('last_event_id', [''])[0]
+        try:
+            return int(valor) if valor else None
+        except ValueError:
+            return None
+
+    @staticmethod
+    def build_environ(scope, body, length):
+        """Monta o environ WSGI (PEP 3333) a partir do scope ASGI
+
+        length e o tamanho do corpo ja lido: vale tambem para chunked, que
+        chega sem Content-Length.
+        """
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        path = scope['path'].encode('utf-8').decode('latin-1')
+
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': path,
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            'wsgi.input_terminated': True,
+        }
+
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                key = 'CONTENT_TYPE'
+            elif name == 'CONTENT_LENGTH':
+                key = 'CONTENT_LENGTH'
+            else:
+                key = f'HTTP_{name}'
+            if key in environ:
+                value = f'{environ[key]},{value}'
+            environ[key] = value
+
+        environ['CONTENT_LENGTH'] = str(length)
+        return environ
+
+
+application = WSGIBridge(app)
@@ -0,0 +1,218 @@
+"""Backup online do SQLite (API de backup) com compressao, rotacao e restore
+
+    python backup.py create [--dir backups] [--gzip] [--keep 7]
+    python backup.py verify backups/backup_20250101_120000.db.gz
+    python backup.py restore backups/backup_20250101_120000.db.gz
+    python backup.py list
+
+Backups do PostgreSQL (backup_*.dump) saem do pg_dump e voltam com
+pg_restore; verify/restore aqui sao so do SQLite.
+"""
+import argparse
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import quote
+
+# Paginas copiadas por passo - entre passos o lock de leitura e liberado
+PAGES_PER_STEP = 1024
+STEP_SLEEP = 0.005
+
+DEFAULT_DIR = os.environ.get('BACKUP_DIR', 'backups')
+DEFAULT_KEEP = int(os.environ.get('BACKUP_KEEP', 7))
+
+# Tabelas conferidas no verify
+TABLES = ('produtos', 'funcionarios', 'movimentos_estoque')
+
+
+def readonly_uri(path):
+    """URI mode=ro: a conexao nunca escreve nem disputa o lock de escrita"""
+    return f"file:{quote(os.path.abspath(path))}?mode=ro"
+
+
+def snapshot_name(suffix='.db'):
+    return f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}{suffix}"
+
+
+def copy_database(source_file, dest_file, pages=PAGES_PER_STEP, sleep=STEP_SLEEP,
+                  journal_mode='DELETE'):
+    """Copia o banco com a API de backup em passos de N paginas
+
+    A conexao de origem segura uma transacao de leitura durante toda a copia:
+    em WAL isso da um snapshot consistente e os writers seguem livres.
+    """
+    source = sqlite3.connect(readonly_uri(source_file), uri=True)
+    dest = sqlite3.connect(dest_file)
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()
+        source.backup(dest, pages=pages, sleep=sleep)
+        source.rollback()
+        # Backup fica em DELETE (arquivo unico); restore volta para WAL
+        dest.execute(f"PRAGMA journal_mode = {journal_mode}")
+    finally:
+        dest.close()
+        source.close()
+
+
+def _gzip_file(path):
+    with open(path, 'rb') as src, gzip.open(path + '.gz', 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.remove(path)
+    return path + '.gz'
+
+
+@contextmanager
+def opened_backup(path):
+    """Caminho de um .db legivel (descomprime .gz num temporario)"""
+    if not path.endswith('.gz'):
+        yield path
+        return
+
+    fd, tmp = tempfile.mkstemp(suffix='.db')
+    try:
+        with os.fdopen(fd, 'wb') as dst, gzip.open(path, 'rb') as src:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        yield tmp
+    finally:
+        os.remove(tmp)
+
+
+def list_backups(directory=DEFAULT_DIR):
+    """Backups do diretorio, do mais novo para o mais antigo"""
+    files = []
+    for pattern in ('backup_*.db', 'backup_*.db.gz', 'backup_*.dump'):
+        files.extend(glob.glob(os.path.join(directory, pattern)))
+    return sorted(files, reverse=True)
+
+
+def prune(directory=DEFAULT_DIR, keep=DEFAULT_KEEP):
+    """Remove backups alem dos N mais recentes"""
+    removed = list_backups(directory)[keep:]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def create_backup(db_file, directory=DEFAULT_DIR, compress=False, keep=DEFAULT_KEEP,
+                  pages=PAGES_PER_STEP):
+    """Snapshot do banco vivo -> arquivo no diretorio de backups"""
+    os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+
+    path = os.path.join(directory, snapshot_name())
+    copy_database(db_file, path, pages=pages)
+    if compress:
+        path = _gzip_file(path)
+
+    removed = prune(directory, keep) if keep else []
+    return {
+        'file': path,
+        'bytes': os.path.getsize(path),
+        'seconds': round(time.perf_counter() - start, 3),
+        'removed': removed,
+    }
+
+
+def count_rows(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        existing = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                for t in TABLES if t in existing}
+    finally:
+        conn.close()
+
+
+def verify(path, db_file=None):
+    """integrity_check + contagem de linhas (e comparacao com o banco vivo)"""
+    with opened_backup(path) as readable:
+        conn = sqlite3.connect(readable)
+        try:
+            integrity = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+        finally:
+            conn.close()
+        counts = count_rows(readable)
+
+    result = {
+        'file': path,
+        'integrity': integrity,
+        'counts': counts,
+        'ok': integrity == ['ok'],
+    }
+    if db_file:
+        live = count_rows(db_file)
+        result['live_counts'] = live
+        result['matches_live'] = live == counts
+    return result
+
+
+def restore(path, db_file, pages=PAGES_PER_STEP):
+    """Copia o backup para o banco vivo (usa a API de backup no sentido inverso)
+
+    Recusa backups que falham no integrity_check.
+    """
+    check = verify(path)
+    if not check['ok']:
+        raise ValueError(f"Backup corrompido: {check['integrity'][:5]}")
+
+    with opened_backup(path) as readable:
+        copy_database(readable, db_file, pages=pages, journal_mode='WAL')
+    return check
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backups do banco Fabrismart')
+    parser.add_argument('--db', default=os.environ.get('DATABASE_FILE', 'fabrismart.db'))
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    create = sub.add_parser('create')
+    create.add_argument('--dir', default=DEFAULT_DIR)
+    create.add_argument('--gzip', action='store_true')
+    create.add_argument('--keep', type=int, default=DEFAULT_KEEP)
+    create.add_argument('--verify', action='store_true')
+
+    check = sub.add_parser('verify')
+    check.add_argument('file')
+
+    rest = sub.add_parser('restore')
+    rest.add_argument('file')
+
+    lst = sub.add_parser('list')
+    lst.add_argument('--dir', default=DEFAULT_DIR)
+
+    args = parser.parse_args(argv)
+
+    if args.comando == 'create':
+        info = create_backup(args.db, args.dir, args.gzip, args.keep)
+        print(f"Backup salvo: {info['file']} ({info['bytes']} bytes, {info['seconds']}s)")
+        for path in info['removed']:
+            print(f"Removido: {path}")
+        if args.verify:
+            result = verify(info['file'])
+            print(f"Verificacao: {'ok' if result['ok'] else 'FALHOU'} {result['counts']}")
+            return 0 if result['ok'] else 1
+    elif args.comando == 'verify':
+        result = verify(args.file, args.db)
+        print(f"Integridade: {', '.join(result['integrity'][:5])}")
+        print(f"Linhas no backup: {result['counts']}")
+        print(f"Linhas no banco:  {result['live_counts']}")
+        return 0 if result['ok'] else 1
+    elif args.comando == 'restore':
+        result = restore(args.file, args.db)
+        print(f"Restaurado {args.file} -> {args.db} {result['counts']}")
+    else:
+        for path in list_backups(args.dir):
+            print(f"{path}  {os.path.getsize(path)} bytes")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,16 @@
+"""Benchmarks do backend - datasets sinteticos, Database e API
+
+Uso (a partir de backend/):
+
+    python -m benchmarks generate --db bench.db --produtos 100000
+    python -m benchmarks db --db bench.db
+    python -m benchmarks api --db bench.db --clients 16 --requests 2000
+    python -m benchmarks api --url http://localhost:5000 --clients 16
+    python -m benchmarks api --db bench.db --cache uncached
+    python -m benchmarks startup --db bench.db --runs 20 --budget-ms 1500
+
+Resultados saem em JSON (stdout ou --out) para comparar entre execucoes.
+O bench da API roda cada endpoint duas vezes: cached (mesma URL, servida
+pelo cache de respostas) e uncached (URL unica por requisicao, sempre vai
+ao banco) - os dois modos saem separados no JSON.
+"""
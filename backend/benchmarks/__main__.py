@@ -0,0 +1,83 @@
+"""CLI dos benchmarks - ver benchmarks/__init__.py"""
+import argparse
+import contextlib
+import json
+import platform
+import sqlite3
+import sys
+from datetime import datetime
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('--out', help='Arquivo JSON de saida (padrao: stdout)')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    gen = sub.add_parser('generate', help='Gera dataset sintetico')
+    gen.add_argument('--db', default='bench.db')
+    gen.add_argument('--produtos', type=int, default=10000)
+    gen.add_argument('--funcionarios', type=int, default=1000)
+    gen.add_argument('--seed', type=int, default=42)
+
+    dbp = sub.add_parser('db', help='Micro-benchmarks do Database')
+    dbp.add_argument('--db', default='bench.db')
+    dbp.add_argument('--iterations', type=int, default=200)
+    dbp.add_argument('--only', nargs='*', help='Somente estes metodos')
+
+    api = sub.add_parser('api', help='Carga concorrente na API')
+    api.add_argument('--db', default='bench.db')
+    api.add_argument('--url', help='Servidor ja rodando (senao usa test client)')
+    api.add_argument('--clients', type=int, default=8)
+    api.add_argument('--requests', type=int, default=500)
+    api.add_argument('--endpoints', nargs='*')
+    api.add_argument('--cache', nargs='*', choices=('cached', 'uncached'),
+                     default=['cached', 'uncached'],
+                     help='Modos: cached (mesma URL) e/ou uncached (ignora o cache)')
+
+    start = sub.add_parser('startup', help='Cold start: import do app + primeira requisicao')
+    start.add_argument('--db', default='bench.db')
+    start.add_argument('--runs', type=int, default=10)
+    start.add_argument('--path', default='/api/health')
+    start.add_argument('--budget-ms', type=float, help='Falha (exit 1) se o p95 passar disso')
+
+    args = parser.parse_args(argv)
+
+    # Prints do Database/app nao podem sujar o JSON do stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.comando == 'generate':
+            from benchmarks.datasets import generate
+            results = generate(args.db, args.produtos, args.funcionarios, args.seed)
+        elif args.comando == 'db':
+            from benchmarks.db_bench import run
+            results = run(args.db, args.iterations, args.only)
+        elif args.comando == 'api':
+            from benchmarks.api_bench import run
+            results = run(args.db, args.url, args.clients, args.requests, args.endpoints,
+                          args.cache)
+        else:
+            from benchmarks.startup_bench import run, DEFAULT_BUDGET_MS
+            results = run(args.db, args.runs, args.path, args.budget_ms or DEFAULT_BUDGET_MS)
+
+    report = {
+        'benchmark': args.comando,
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'args': {k: v for k, v in vars(args).items() if k not in ('out', 'comando')},
+        'results': results,
+    }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
+
+    if args.comando == 'startup' and not results['budget']['ok']:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
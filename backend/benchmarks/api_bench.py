@@ -0,0 +1,128 @@
+"""Carga concorrente na API - test client do Flask ou servidor local"""
+import http.client
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from benchmarks.timing import summarize
+
+ENDPOINTS = [
+    '/api/health',
+    '/api/stats',
+    '/api/produtos?limit=50',
+    '/api/produtos?limit=50&categoria=Roupas',
+    '/api/produtos?limit=50&estoque=sem_estoque',
+    '/api/funcionarios?limit=50',
+    '/api/search?q=note&limit=20',
+]
+
+# Respostas do rate limit (429) e da admissao (503)
+THROTTLED = {429, 503}
+
+# cached: mesma URL sempre (depois da 1a, tudo sai do cache de respostas)
+# uncached: parametro extra unico por requisicao - chave nova no cache, a
+# rota sempre consulta o banco. Funciona tambem contra --url.
+CACHE_MODES = ('cached', 'uncached')
+BYPASS_PARAM = '_bench'
+
+_nonce = itertools.count()
+
+
+def bypass(path):
+    """path com um parametro que o cache nunca viu"""
+    sep = '&' if '?' in path else '?'
+    return f'{path}{sep}{BYPASS_PARAM}={next(_nonce)}'
+
+
+class TestClientDriver:
+    """Chama o app em processo, sem rede (um client por thread)
+
+    Todas as threads saem de 127.0.0.1: com RATE_LIMIT_RATE definido elas
+    dividem o mesmo bucket.
+    """
+
+    def __init__(self, db_file):
+        os.environ['DATABASE_FILE'] = db_file
+        import app as app_module
+        self.app = app_module.app
+        self.local = threading.local()
+
+    def get(self, path):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        # Fechar a resposta e o que o servidor faz: devolve a vaga da admissao
+        with client.get(path) as response:
+            return response.status_code
+
+
+class HTTPDriver:
+    """Servidor real via HTTP keep-alive (uma conexao por thread)"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.local = threading.local()
+
+    def get(self, path):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self.local.conn = None
+            raise
+
+
+def load(driver, path, clients, requests, cache='cached'):
+    """N requisicoes em paralelo com C clientes
+
+    429/503 do rate limit e da admissao contam em 'throttled', nao em errors.
+    cache='uncached' troca a URL a cada requisicao (ver CACHE_MODES).
+    """
+    target = bypass if cache == 'uncached' else lambda p: p
+    latencies = []
+    errors = 0
+    throttled = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors, throttled
+        t0 = time.perf_counter()
+        try:
+            status = driver.get(target(path))
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - t0
+        with lock:
+            latencies.append(elapsed)
+            if status in THROTTLED:
+                throttled += 1
+            elif status is None or status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one, range(requests)))
+    summary = summarize(latencies, time.perf_counter() - start, errors)
+    summary['throttled'] = throttled
+    return summary
+
+
+def run(db_file=None, url=None, clients=8, requests=500, endpoints=None, modes=CACHE_MODES):
+    """Roda cada endpoint em cada modo: {modo: {endpoint: resumo}}"""
+    driver = HTTPDriver(url) if url else TestClientDriver(db_file)
+    return {
+        mode: {path: load(driver, path, clients, requests, mode)
+               for path in (endpoints or ENDPOINTS)}
+        for mode in modes
+    }
@@ -0,0 +1,70 @@
+"""Geracao de datasets sinteticos num banco de rascunho"""
+import random
+import time
+
+from database import Database
+
+CATEGORIAS = ['Eletronicos', 'Roupas', 'Alimentos', 'Limpeza', 'Papelaria',
+              'Ferramentas', 'Brinquedos', 'Moveis', 'Cozinha', 'Esportes']
+CARGOS = ['Vendedor', 'Gerente', 'Estoquista', 'Caixa', 'Analista', '']
+PALAVRAS = ['Notebook', 'Mouse', 'Teclado', 'Camisa', 'Calca', 'Arroz', 'Feijao',
+            'Cadeira', 'Mesa', 'Panela', 'Bola', 'Caneta', 'Martelo', 'Sabao']
+
+BATCH = 10000
+
+
+def produtos_rows(total, seed):
+    rng = random.Random(seed)
+    for i in range(total):
+        # ~20% zerados, ~30% baixo, resto normal
+        faixa = rng.random()
+        if faixa < 0.2:
+            quantidade = 0
+        elif faixa < 0.5:
+            quantidade = rng.randint(1, 9)
+        else:
+            quantidade = rng.randint(10, 500)
+        nome = f"{rng.choice(PALAVRAS)} {rng.choice(PALAVRAS)} {i}"
+        yield (nome, rng.choice(CATEGORIAS), quantidade)
+
+
+def funcionarios_rows(total, seed):
+    rng = random.Random(seed + 1)
+    for i in range(total):
+        nome = f"{rng.choice(PALAVRAS)} Silva {i}"
+        yield (nome, f"func{i}@empresa.com", rng.choice(CARGOS))
+
+
+def _insert(conn, query, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH:
+            conn.executemany(query, batch)
+            batch.clear()
+    if batch:
+        conn.executemany(query, batch)
+
+
+def generate(db_file, produtos=10000, funcionarios=1000, seed=42):
+    """Cria o schema e insere as linhas numa unica transacao"""
+    db = Database(db_file)
+    start = time.perf_counter()
+
+    with db.pool.connection() as conn:
+        conn.execute("BEGIN")
+        _insert(conn, "INSERT OR IGNORE INTO produtos (nome, categoria, quantidade) VALUES (?, ?, ?)",
+                produtos_rows(produtos, seed))
+        _insert(conn, "INSERT OR IGNORE INTO funcionarios (nome, email, cargo) VALUES (?, ?, ?)",
+                funcionarios_rows(funcionarios, seed))
+        conn.commit()
+
+    elapsed = time.perf_counter() - start
+    db.close()
+    return {
+        'db_file': db_file,
+        'produtos': produtos,
+        'funcionarios': funcionarios,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round((produtos + funcionarios) / elapsed, 1) if elapsed else 0.0,
+    }
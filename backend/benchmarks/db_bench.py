@@ -0,0 +1,108 @@
+"""Micro-benchmarks dos metodos do Database
+
+Os casos de escrita (create, movimentar, bulk...) rodam numa copia do
+banco: o dataset gerado fica igual entre execucoes e os numeros continuam
+comparaveis.
+"""
+import itertools
+import os
+import random
+import tempfile
+import tracemalloc
+
+from backup import copy_database
+from database import Database
+from serialization import dumps_rows
+from benchmarks.timing import timed
+
+
+def _ids(db, table):
+    row = db.fetch_one(f"SELECT MIN(id) AS lo, MAX(id) AS hi FROM {table}")
+    return (row['lo'] or 1), (row['hi'] or 1)
+
+
+def cases(db, rng):
+    """(nome, funcao, fator de iteracoes) - fator < 1 para metodos pesados"""
+    p_lo, p_hi = _ids(db, 'produtos')
+    f_lo, f_hi = _ids(db, 'funcionarios')
+    contador = itertools.count()
+    criados = []
+
+    def criar():
+        criados.append(db.create_produto(f'bench {next(contador)}', 'Benchmark', 5))
+
+    def atualizar():
+        if criados:
+            db.update_produto(criados[-1], f'bench upd {next(contador)}', 'Benchmark', 7)
+
+    def excluir():
+        if criados:
+            db.delete_produto(criados.pop())
+
+    def bulk():
+        base = next(contador)
+        rows = [(i, (f'bulk {base} {i}', 'Benchmark', i)) for i in range(1000)]
+        db.bulk_insert('produtos', rows, on_conflict='skip')
+
+    def exportar():
+        for _ in db.iter_rows('produtos', ('id', 'nome', 'categoria', 'quantidade')):
+            pass
+
+    return [
+        ('get_stats', db.get_stats, 1),
+        ('get_produto_by_id', lambda: db.get_produto_by_id(rng.randint(p_lo, p_hi)), 1),
+        ('get_funcionario_by_id', lambda: db.get_funcionario_by_id(rng.randint(f_lo, f_hi)), 1),
+        ('list_produtos', lambda: db.list_produtos(limit=50), 1),
+        ('list_produtos_categoria', lambda: db.list_produtos(limit=50, categoria='Roupas'), 1),
+        ('list_produtos_estoque_baixo', lambda: db.list_produtos(limit=50, estoque='estoque_baixo'), 1),
+        ('list_funcionarios', lambda: db.list_funcionarios(limit=50), 1),
+        ('search', lambda: db.search('produtos', rng.choice(['note', 'cam', 'arroz']), 20), 1),
+        ('create_produto', criar, 1),
+        ('update_produto', atualizar, 1),
+        ('delete_produto', excluir, 1),
+        ('movimentar_estoque', lambda: db.movimentar_estoque([(rng.randint(p_lo, p_hi), 1, 'bench')]), 1),
+        ('bulk_insert_1000', bulk, 0.1),
+        ('get_produtos_full', db.get_produtos, 0.05),
+        ('get_funcionarios_full', db.get_funcionarios, 0.05),
+        # Busca + serializacao: o caminho do GET /api/produtos
+        ('dumps_produtos_full', lambda: dumps_rows(db.get_produtos()), 0.05),
+        ('iter_rows_full', exportar, 0.05),
+    ]
+
+
+def memory(fn):
+    """Pico de memoria (bytes) e bytes por linha de um metodo de listagem"""
+    tracemalloc.start()
+    try:
+        rows = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'rows': len(rows),
+        'peak_bytes': peak,
+        'bytes_per_row': round(peak / len(rows), 1) if rows else 0.0,
+    }
+
+
+def run(db_file, iterations=200, only=None, seed=42):
+    """Roda cada caso numa copia de db_file e devolve {metodo: resumo}"""
+    with tempfile.TemporaryDirectory(prefix='bench-') as tmp:
+        copia = os.path.join(tmp, os.path.basename(db_file))
+        copy_database(db_file, copia, pages=-1, sleep=0, journal_mode='WAL')
+
+        db = Database(copia)
+        rng = random.Random(seed)
+        results = {}
+        try:
+            for nome, fn, fator in cases(db, rng):
+                if only and nome not in only:
+                    continue
+                results[nome] = timed(fn, max(1, int(iterations * fator)))
+
+            if not only or 'memory' in only:
+                results['memory_get_produtos'] = memory(db.get_produtos)
+                results['memory_get_funcionarios'] = memory(db.get_funcionarios)
+        finally:
+            db.close()
+    return results
@@ -0,0 +1,70 @@
+"""Tempo de cold start de um worker: import do app e primeira requisicao
+
+Cada amostra roda num processo novo (como um worker do gunicorn subindo),
+com o banco ja migrado pelo deploy.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import migrations
+from benchmarks.timing import summarize
+
+# Orcamento do cold start (import + primeira requisicao), em ms
+DEFAULT_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', 1500))
+
+# Roda dentro do processo filho e devolve os tempos em JSON
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+lazy = not app.db.initialized
+client = app.app.test_client()
+status = client.get(sys.argv[1]).status_code
+t2 = time.perf_counter()
+print(json.dumps({'import': t1 - t0, 'first_request': t2 - t1, 'status': status,
+                  'lazy': lazy}))
+"""
+
+
+def sample(db_file, path):
+    """Um processo novo: (tempos da sonda, tempo total do processo)"""
+    env = dict(os.environ, DATABASE_FILE=os.path.abspath(db_file), DB_AUTO_MIGRATE='0')
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', PROBE, path], cwd=backend, env=env,
+                         capture_output=True, text=True, check=True)
+    total = time.perf_counter() - start
+    return json.loads(out.stdout.strip().splitlines()[-1]), total
+
+
+def run(db_file, runs=10, path='/api/health', budget_ms=DEFAULT_BUDGET_MS):
+    """Mede N cold starts e compara o p95 com o orcamento"""
+    # Migracao e trabalho do deploy, fora da medicao
+    migrations.main(['--db', db_file])
+
+    fases = {'import': [], 'first_request': [], 'cold_start': [], 'process': []}
+    errors = 0
+    eager = 0
+    start = time.perf_counter()
+    for _ in range(runs):
+        tempos, total = sample(db_file, path)
+        if tempos['status'] != 200:
+            errors += 1
+        if not tempos['lazy']:
+            eager += 1
+        fases['import'].append(tempos['import'])
+        fases['first_request'].append(tempos['first_request'])
+        fases['cold_start'].append(tempos['import'] + tempos['first_request'])
+        fases['process'].append(total)
+    wall = time.perf_counter() - start
+
+    results = {nome: summarize(valores, wall, errors) for nome, valores in fases.items()}
+    p95 = results['cold_start']['p95_ms']
+    results['budget'] = {'budget_ms': budget_ms, 'p95_ms': p95, 'ok': p95 <= budget_ms}
+    # Import que abriu o banco = regressao do cold start
+    results['eager_db_imports'] = eager
+    return results
@@ -0,0 +1,41 @@
+"""Percentis e resumo de latencias"""
+import time
+
+
+def percentile(sorted_values, p):
+    """Percentil por nearest-rank (valores ja ordenados)"""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def summarize(latencies, wall_time, errors=0):
+    """Resumo em ms: p50/p95/p99, media e throughput"""
+    values = sorted(latencies)
+    total = len(values)
+    return {
+        'count': total,
+        'errors': errors,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0,
+        'mean_ms': round(sum(values) / total * 1000, 3) if total else 0.0,
+        'throughput_rps': round(total / wall_time, 1) if wall_time else 0.0,
+    }
+
+
+def timed(fn, iterations):
+    """Executa fn N vezes e devolve o resumo"""
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - start, errors)
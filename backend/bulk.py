@@ -0,0 +1,137 @@
+"""Importacao em lote - parse, validacao e politicas de conflito"""
+import csv
+import io
+import json
+
+from validators import validate_email, clean_string, parse_quantidade
+
+CONFLICT_POLICIES = ('skip', 'upsert', 'fail')
+CHUNK_SIZE = 1000
+
+
+class BulkConflict(Exception):
+    """Conflito de UNIQUE com politica 'fail' - nada foi gravado"""
+
+    def __init__(self, linha, message):
+        super().__init__(message)
+        self.linha = linha
+
+
+def parse_payload(raw, fmt):
+    """Converte corpo da requisicao em lista de dicts (json, ndjson ou csv)"""
+    text = raw.decode('utf-8-sig') if isinstance(raw, bytes) else raw
+
+    if fmt == 'json':
+        data = json.loads(text)
+        if not isinstance(data, list):
+            raise ValueError('JSON deve ser uma lista de objetos')
+        return data
+
+    if fmt == 'ndjson':
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    if fmt == 'csv':
+        return list(csv.DictReader(io.StringIO(text)))
+
+    raise ValueError(f'Formato invalido: {fmt}')
+
+
+def detect_format(content_type, filename=None):
+    """Descobre o formato pelo content-type ou extensao do arquivo"""
+    if filename:
+        ext = filename.rsplit('.', 1)[-1].lower()
+        if ext in ('json', 'ndjson', 'csv'):
+            return ext
+        if ext == 'jsonl':
+            return 'ndjson'
+
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('application/x-ndjson', 'application/jsonl'):
+        return 'ndjson'
+    if content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    return 'json'
+
+
+def _text(row, campo):
+    valor = row.get(campo)
+    if valor is None:
+        return ''
+    return clean_string(str(valor))
+
+
+def _produto(row):
+    """Valida uma linha de produto - retorna tupla ou levanta ValueError"""
+    nome = _text(row, 'nome')
+    categoria = _text(row, 'categoria')
+    quantidade = row.get('quantidade', 0)
+
+    if not nome:
+        raise ValueError('Nome eh obrigatorio')
+    if not categoria:
+        raise ValueError('Categoria eh obrigatoria')
+
+    quantidade = parse_quantidade(quantidade if quantidade not in (None, '') else 0)
+    return (nome, categoria, quantidade)
+
+
+def _funcionario(row):
+    """Valida uma linha de funcionario"""
+    nome = _text(row, 'nome')
+    email = _text(row, 'email').lower()
+    cargo = _text(row, 'cargo')
+
+    if not nome:
+        raise ValueError('Nome eh obrigatorio')
+    if not email:
+        raise ValueError('Email eh obrigatorio')
+    if not validate_email(email):
+        raise ValueError('Email invalido')
+
+    return (nome, email, cargo)
+
+
+VALIDATORS = {
+    'produtos': _produto,
+    'funcionarios': _funcionario,
+}
+
+# Posicoes das colunas UNIQUE nas tuplas dos VALIDATORS
+UNIQUE_KEYS = {
+    'produtos': (0, 1),
+    'funcionarios': (1,),
+}
+
+
+def validate_rows(table, rows):
+    """Uma passada sobre todas as linhas: separa validas e erros"""
+    validar = VALIDATORS[table]
+    validas, erros = [], []
+
+    for linha, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            erros.append({'linha': linha, 'error': 'Linha deve ser um objeto'})
+            continue
+        try:
+            validas.append((linha, validar(row)))
+        except ValueError as e:
+            erros.append({'linha': linha, 'error': str(e)})
+
+    return validas, erros
+
+
+def last_per_key(table, rows):
+    """upsert: so a ultima ocorrencia de cada chave, na ordem das linhas
+
+    Sem isso a mesma chave seria gravada (e contada) uma vez por repeticao.
+    """
+    posicoes = UNIQUE_KEYS[table]
+    ultimas = {}
+    for linha, valores in rows:
+        ultimas[tuple(valores[i] for i in posicoes)] = (linha, valores)
+    return sorted(ultimas.values(), key=lambda item: item[0])
+
+
+def chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
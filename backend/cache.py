@@ -0,0 +1,93 @@
+"""Cache de respostas GET com ETag forte e invalidacao por versao de tabela"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+
+
+class ResponseCache:
+    """LRU limitado + TTL. Entradas valem enquanto as versoes nao mudarem.
+
+    As versoes vem do banco (triggers), entao uma escrita em qualquer
+    worker invalida as entradas de todos; o TTL so limita a memoria.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = max_size or int(os.environ.get('RESPONSE_CACHE_SIZE', 256))
+        self.ttl = ttl or float(os.environ.get('RESPONSE_CACHE_TTL', 10))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, versions):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if entry['versions'] != versions or entry['expires'] < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, versions, body, mimetype, etag):
+        entry = {
+            'versions': versions,
+            'expires': time.monotonic() + self.ttl,
+            'body': body,
+            'mimetype': mimetype,
+            'etag': etag,
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def make_etag(body):
+    """ETag forte a partir do conteudo"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def cached(cache, get_versions, *tables):
+    """Decorator para rotas GET: serve do cache e responde 304 via If-None-Match"""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (request.path, tuple(sorted(request.args.items(multi=True))))
+            versions = get_versions(tables)
+
+            entry = cache.get(key, versions)
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                # Erros e streams nao entram no cache
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                body = response.get_data()
+                entry = cache.put(key, versions, body, response.mimetype, make_etag(body))
+
+            response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+            response.set_etag(entry['etag'])
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+
+        return wrapper
+
+    return decorator
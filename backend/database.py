@@ -1,217 +1,737 @@
+import json
+import logging
 import sqlite3
 import os
-from datetime import datetime
+import threading
+from pool import ConnectionPool
+from events import EventBus
+from writer import GroupCommitWriter
+from replica import Replica
+from relay import EventRelay
+import errors
+import stats as stats_engine
+import search as search_engine
+import timeseries
+import migrations
+import backup
+from pagination import encode_cursor, decode_cursor
+from serialization import Rows, column_names
+from bulk import BulkConflict, chunks, last_per_key
+from validators import MAX_QUANTIDADE
+
+PRODUTO_COLUMNS = ('id', 'nome', 'categoria', 'quantidade', 'created_at')
+FUNCIONARIO_COLUMNS = ('id', 'nome', 'email', 'cargo', 'created_at')
+MOVIMENTO_COLUMNS = ('id', 'produto_id', 'delta', 'quantidade_final', 'motivo', 'created_at')
+
+# Gravadas como texto UTC (CURRENT_TIMESTAMP); saem em ISO 8601 ja no SQL,
+# sem conversor Python por linha
+TIMESTAMP_COLUMNS = ('created_at', 'updated_at')
+
+# Filtro de status de estoque em faixas de quantidade (usa indice)
+_LIMITE = stats_engine.LIMITE_SQL.format(c='produtos.categoria')
+
+# Mesmas faixas dos contadores: baixo = ate o limite de reposicao da categoria
+ESTOQUE_FILTROS = {
+    'sem_estoque': 'quantidade <= 0',
+    'estoque_baixo': f'quantidade > 0 AND quantidade <= {_LIMITE}',
+    'estoque_normal': f'quantidade > {_LIMITE}',
+}
+
+# Produtos no limite de reposicao ou abaixo, mais urgentes primeiro
+# (quantidade / limite). CROSS JOIN fixa a ordem: categorias por fora e, em
+# cada uma, so o trecho do indice parcial idx_produtos_reposicao ate o
+# limite - custo proporcional aos itens em falta.
+REPOSICAO_SQL = f'''
+    SELECT * FROM (
+        SELECT p.id, p.nome, p.categoria, p.quantidade, l.limite,
+               CAST(p.quantidade AS REAL) / MAX(l.limite, 1) AS urgencia
+        FROM (SELECT s.categoria, COALESCE(r.limite, {stats_engine.DEFAULT_LIMITE}) AS limite
+              FROM stats_categoria s
+              LEFT JOIN limites_reposicao r ON r.categoria = s.categoria
+              {{where}}) l
+        CROSS JOIN produtos p ON p.categoria = l.categoria
+        WHERE p.quantidade <= {stats_engine.MAX_LIMITE} AND p.quantidade <= l.limite
+    )
+    WHERE (urgencia, id) > (?, ?)
+    ORDER BY urgencia, id
+    LIMIT ?
+'''
+
+# Versoes do cache de respostas (tabela pequena, lida inteira)
+VERSIONS_SQL = "SELECT tabela, versao FROM table_versions"
+# Invalida tudo - mudancas que os triggers nao veem (recalculo dos contadores)
+BUMP_VERSIONS_SQL = "UPDATE table_versions SET versao = versao + 1"
+
+# Ids aceitos por chamada de get_many
+MAX_BATCH_IDS = int(os.environ.get('MAX_BATCH_IDS', 5000))
+
+# SQL de insercao em lote por politica de conflito
+BULK_SQL = {
+    'produtos': {
+        'fail': "INSERT INTO produtos (nome, categoria, quantidade) VALUES (?, ?, ?)",
+        'skip': "INSERT INTO produtos (nome, categoria, quantidade) VALUES (?, ?, ?) "
+                "ON CONFLICT DO NOTHING",
+        'upsert': "INSERT INTO produtos (nome, categoria, quantidade) VALUES (?, ?, ?) "
+                  "ON CONFLICT(nome, categoria) DO UPDATE SET quantidade = excluded.quantidade",
+    },
+    'funcionarios': {
+        'fail': "INSERT INTO funcionarios (nome, email, cargo) VALUES (?, ?, ?)",
+        'skip': "INSERT INTO funcionarios (nome, email, cargo) VALUES (?, ?, ?) "
+                "ON CONFLICT DO NOTHING",
+        'upsert': "INSERT INTO funcionarios (nome, email, cargo) VALUES (?, ?, ?) "
+                  "ON CONFLICT(email) DO UPDATE SET nome = excluded.nome, cargo = excluded.cargo",
+    },
+}
+
+# DB_AUTO_MIGRATE=0: o deploy roda `python migrations.py` uma vez e os
+# workers so conferem a versao
+AUTO_MIGRATE = os.environ.get('DB_AUTO_MIGRATE', '1') != '0'
+
+# DB_GROUP_COMMIT_MS > 0: create/update/delete passam pelo writer em lote
+GROUP_COMMIT_MS = float(os.environ.get('DB_GROUP_COMMIT_MS', 0))
+
+# STATS_SNAPSHOT_INTERVAL > 0: grava a serie historica a cada N segundos
+# (idempotente por minuto entre workers; alternativa: cron com timeseries.py)
+SNAPSHOT_INTERVAL = float(os.environ.get('STATS_SNAPSHOT_INTERVAL', 0))
+
+# Roteamento de leituras pesadas (DB_READ_MODE):
+#   primary - tudo no primario (padrao)
+#   ro      - conexoes mode=ro no mesmo arquivo (snapshot WAL, sem lock de escrita)
+#   replica - copia local renovada a cada DB_REPLICA_REFRESH segundos
+READ_MODES = ('primary', 'ro', 'replica')
+READ_MODE = os.environ.get('DB_READ_MODE', 'primary')
+
+# Metodos roteados (DB_READ_ROUTES=get_stats,iter_rows,...)
+HEAVY_READS = ('get_stats', 'get_history', 'get_produtos', 'get_funcionarios',
+               'iter_rows', 'backup_data')
+# Padrao na replica: so leituras fora do cache de respostas. O cache versiona
+# pelo primario e guardaria o corpo atrasado (ate DB_REPLICA_REFRESH s) sob a
+# versao nova - GET /api/produtos nao veria a propria escrita
+REPLICA_READS = ('get_history', 'backup_data')
+READ_ROUTES = os.environ.get('DB_READ_ROUTES')
+
+# Feed de eventos entre workers pela tabela eventos (relay.py). EVENTS_RELAY=1
+# liga e =0 desliga; sem valor quem decide e o app (so com servidor de
+# streaming e mais de um worker - WEB_CONCURRENCY). Fora do app: desligado.
+WORKERS = int(os.environ.get('WEB_CONCURRENCY', 1))
+EVENTS_RELAY = os.environ.get('EVENTS_RELAY')
+
+log = logging.getLogger(__name__)
+
+class MovimentoInvalido(Exception):
+    """Movimento de estoque rejeitado - o lote inteiro foi desfeito"""
+    
+    def __init__(self, indice, produto_id, motivo):
+        super().__init__(motivo)
+        self.indice = indice
+        self.produto_id = produto_id
+
+def motivo_rejeicao(existe, delta):
+    """Por que o UPDATE com guarda de estoque nao alterou nada"""
+    if not existe:
+        return 'Produto nao encontrado'
+    return 'Estoque acima do maximo permitido' if delta > 0 else 'Estoque insuficiente'
 
 class Database:
-    def __init__(self, db_file='fabrismart.db'):
+    backend = 'SQLite'
+    TIMESTAMP_SQL = "strftime('%Y-%m-%dT%H:%M:%S+00:00', {coluna}) AS {nome}"
+    # Erros do driver que nao devem derrubar a publicacao de eventos
+    driver_errors = (sqlite3.Error,)
+    
+    def __init__(self, db_file='fabrismart.db', pool_size=None, group_commit_ms=None,
+                 read_mode=None, read_routes=None, events_relay=None):
         self.db_file = db_file
+        self.pool = ConnectionPool(db_file, max_size=pool_size)
+        # Feed de mudancas (/api/events)
+        self.events = EventBus()
         self.init_database()
+        
+        if group_commit_ms is None:
+            group_commit_ms = GROUP_COMMIT_MS
+        self.writer = GroupCommitWriter(self.pool, group_commit_ms) if group_commit_ms > 0 else None
+        self.snapshotter = (timeseries.Snapshotter(self, SNAPSHOT_INTERVAL)
+                            if SNAPSHOT_INTERVAL > 0 else None)
+        
+        self.read_mode = read_mode or READ_MODE
+        if self.read_mode not in READ_MODES:
+            raise ValueError(f"DB_READ_MODE deve ser um de: {', '.join(READ_MODES)}")
+        if read_routes is None:
+            read_routes = (READ_ROUTES.split(',') if READ_ROUTES is not None
+                           else REPLICA_READS if self.read_mode == 'replica' else HEAVY_READS)
+        self.read_routes = frozenset(filter(None, read_routes))
+        self.ro_pool = None
+        self.replica = None
+        if self.read_mode == 'ro':
+            self.ro_pool = ConnectionPool(db_file, max_size=pool_size, readonly=True)
+        elif self.read_mode == 'replica':
+            self.replica = Replica(db_file, pool_size=pool_size)
+        
+        if events_relay is None:
+            events_relay = EVENTS_RELAY == '1'
+        self.relay = EventRelay(self, self.events) if events_relay else None
     
     def init_database(self):
-        """Cria tabelas se nao existirem - similar a create table no SQL"""
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
-        
-        # Tabela produtos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS produtos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL,
-                categoria TEXT NOT NULL,
-                quantidade INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(nome, categoria)
-            )
-        ''')
-        
-        # Tabela funcionários
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS funcionarios (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                cargo TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        print(f"Database inicializado: {self.db_file}")
+        """Aplica migracoes pendentes (no-op se o banco ja esta na ultima versao)"""
+        with self.pool.connection() as conn:
+            if AUTO_MIGRATE:
+                for versao in migrations.migrate(conn, verbose=False):
+                    log.info("Migracao %s aplicada em %s", versao, self.db_file)
+            elif migrations.pending(conn):
+                raise migrations.MigrationError(
+                    f"Banco {self.db_file} desatualizado - rode: python migrations.py")
+            self.fts_enabled = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'produtos_fts'"
+            ).fetchone() is not None
+        log.info("Database inicializado: %s", self.db_file)
     
-    def execute_query(self, query, params=None):
-        """Executa query SQL"""
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
+    def health_check(self):
+        """Verifica conexao com o banco sem varrer tabelas"""
+        info = self.pool.health_check()
+        info['read_mode'] = self.read_mode
+        if self.replica:
+            info['replica_lag'] = self.replica.lag()
+        if self.writer:
+            info['group_commit'] = self.writer.stats()
+        if self.relay:
+            info['events_relay'] = self.relay.stats()
+        return info
+    
+    def _publish(self, entity, op, entity_id=None, **extra):
+        """Evento de mudanca para o feed SSE
+        
+        Contadores e faixa de estoque so sao lidos se ha alguem ouvindo;
+        sem eles o cliente recarrega /api/stats.
+        """
+        counters = None
+        if self.events.has_subscribers:
+            try:
+                with self.pool.connection() as conn:
+                    counters = self._counters(conn)
+                    if entity == 'produtos' and op in ('create', 'update'):
+                        extra['bucket'] = self._bucket_of(conn, entity_id)
+                    for item in extra.get('itens', ()):
+                        item['bucket'] = self._bucket_of(conn, item['produto_id'])
+            except self.driver_errors:
+                pass
+        data = {'entity': entity, 'op': op, 'id': entity_id, **extra, 'counters': counters}
+        event_id = None
+        if self.relay:
+            try:
+                event_id = self.relay.record(data)
+            except self.driver_errors:
+                # Sem o relay o evento ainda chega aos clientes deste worker
+                pass
+        self.events.publish(data, event_id)
+    
+    def _counters(self, conn):
+        return stats_engine.counters(conn)
+    
+    def _bucket_of(self, conn, produto_id):
+        return stats_engine.bucket_of(conn, produto_id)
+    
+    def table_versions(self, tables):
+        """Versoes por tabela mantidas por triggers (table_versions)
         
-        try:
-            if params:
+        Ficam no banco: uma escrita em qualquer worker - ou SQL manual -
+        invalida o cache de respostas de todos.
+        """
+        with self.pool.connection() as conn:
+            versoes = dict(conn.execute(VERSIONS_SQL).fetchall())
+        return tuple(versoes.get(table, 0) for table in tables)
+    
+    def close(self):
+        """Fecha conexoes do pool (depois de aplicar escritas na fila)"""
+        if self.snapshotter:
+            self.snapshotter.close()
+        if self.relay:
+            self.relay.close()
+        if self.replica:
+            self.replica.close()
+        if self.ro_pool:
+            self.ro_pool.close()
+        if self.writer:
+            self.writer.close()
+        self.pool.close()
+    
+    def select_list(self, columns, prefix=''):
+        """Colunas do SELECT com os timestamps ja formatados pelo banco"""
+        return ', '.join(
+            self.TIMESTAMP_SQL.format(coluna=prefix + c, nome=c) if c in TIMESTAMP_COLUMNS
+            else prefix + c
+            for c in columns)
+    
+    def _pool_for(self, method):
+        """Pool de leitura do metodo: replica/mode=ro se roteado, senao o primario"""
+        if method in self.read_routes:
+            if self.replica:
+                return self.replica.pool
+            if self.ro_pool:
+                return self.ro_pool
+        return self.pool
+    
+    def fetch_rows(self, query, params=(), route=None):
+        """SELECT -> Rows (tuplas + colunas), sem dict por linha
+        
+        Para listas grandes que vao direto para a resposta JSON.
+        """
+        with self._pool_for(route).connection() as conn:
+            cursor = conn.cursor()
+            try:
+                rows = cursor.execute(query, params).fetchall()
+                return Rows(column_names(cursor), rows)
+            finally:
+                cursor.close()
+    
+    def fetch_all(self, query, params=(), route=None):
+        """SELECT -> lista de dicts (acesso por nome)"""
+        return list(self.fetch_rows(query, params, route))
+    
+    def fetch_one(self, query, params=(), route=None):
+        """SELECT de uma linha -> dict ou None"""
+        with self._pool_for(route).connection() as conn:
+            cursor = conn.cursor()
+            try:
+                row = cursor.execute(query, params).fetchone()
+                return None if row is None else dict(zip(column_names(cursor), row))
+            finally:
+                cursor.close()
+    
+    def execute_write(self, query, params=()):
+        """INSERT/UPDATE/DELETE com commit - retorna lastrowid"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
                 cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            # Se for SELECT, retorna dados
-            if query.strip().upper().startswith('SELECT'):
-                # Converte para lista de dicts
-                columns = [description[0] for description in cursor.description]
-                rows = cursor.fetchall()
-                result = []
-                for row in rows:
-                    result.append(dict(zip(columns, row)))
-                return result
-            else:
                 conn.commit()
                 return cursor.lastrowid
-                
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+            except sqlite3.IntegrityError as e:
+                conn.rollback()
+                raise errors.from_sqlite(e) from e
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+    
+    def _write(self, query, params):
+        """Escrita de uma linha - pelo group commit quando ativo"""
+        if self.writer:
+            return self.writer.execute(query, params)
+        return self.execute_write(query, params)
+    
+    def execute_query(self, query, params=None):
+        """Compatibilidade com scripts antigos - prefira fetch_all/execute_write"""
+        if query.lstrip().upper().startswith('SELECT'):
+            return self.fetch_all(query, params or ())
+        return self.execute_write(query, params or ())
+    
+    def _list_page(self, table, fields, where, params, limit, cursor):
+        """Pagina por keyset em (nome, id) - custo proporcional ao limit"""
+        where = list(where)
+        params = list(params)
+        
+        if cursor:
+            nome, last_id = decode_cursor(cursor)
+            where.append("(nome, id) > (?, ?)")
+            params.extend([nome, last_id])
+        
+        # id e nome sempre lidos para montar o proximo cursor
+        columns = list(dict.fromkeys(['id', 'nome'] + list(fields)))
+        query = f"SELECT {self.select_list(columns)} FROM {table}"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY nome, id LIMIT ?"
+        params.append(limit + 1)
+        
+        rows = self.fetch_all(query, params)
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['nome'], rows[-1]['id'])
+        
+        if list(fields) != columns:
+            rows = [{f: row[f] for f in fields} for row in rows]
+        
+        return rows, next_cursor
+    
+    def get_many(self, table, ids, fields):
+        """Linhas por id numa unica query, na ordem pedida (None = nao existe)
+        
+        Os ids vao como um unico parametro JSON (json_each): sem limite de
+        variaveis do SQLite e o mesmo statement em cache para qualquer tamanho.
+        """
+        if len(ids) > MAX_BATCH_IDS:
+            raise ValueError(f'Maximo de {MAX_BATCH_IDS} ids por chamada')
+        
+        columns = list(dict.fromkeys(['id'] + list(fields)))
+        query = f"""
+            SELECT {self.select_list(columns)} FROM {table}
+            WHERE id IN (SELECT value FROM json_each(?))
+        """
+        rows = self.fetch_all(query, (json.dumps(ids),))
+        
+        por_id = {row['id']: row for row in rows}
+        if list(fields) != columns:
+            por_id = {k: {f: row[f] for f in fields} for k, row in por_id.items()}
+        return [por_id.get(i) for i in ids]
+    
+    def iter_rows(self, table, columns, batch_size=1000, order_by='id'):
+        """Gera lotes de linhas (tuplas) com fetchmany - memoria constante"""
+        query = f"SELECT {self.select_list(columns)} FROM {table} ORDER BY {order_by}"
+        
+        with self._pool_for('iter_rows').connection() as conn:
+            cursor = conn.execute(query)
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+    
+    def bulk_insert(self, table, rows, on_conflict='fail', chunk_size=1000):
+        """Insere lista de (linha, valores) com executemany em lotes
+        
+        Uma transacao so em qualquer politica: erro no meio nao deixa lotes
+        anteriores gravados. skip mantem a primeira ocorrencia de cada chave,
+        upsert a ultima (contada uma vez); fail levanta BulkConflict com a
+        linha do conflito.
+        """
+        query = BULK_SQL[table][on_conflict]
+        if on_conflict == 'upsert':
+            rows = last_per_key(table, rows)
+        
+        gravados = self._bulk_insert(query, rows, on_conflict, chunk_size)
+        self._publish(table, 'bulk', count=gravados)
+        return gravados
+    
+    def _bulk_insert(self, query, rows, on_conflict, chunk_size):
+        gravados = 0
+        
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for chunk in chunks(rows, chunk_size):
+                    valores = [v for _, v in chunk]
+                    if on_conflict != 'fail':
+                        gravados += conn.executemany(query, valores).rowcount
+                        continue
+                    
+                    conn.execute("SAVEPOINT bulk_chunk")
+                    try:
+                        gravados += conn.executemany(query, valores).rowcount
+                        conn.execute("RELEASE bulk_chunk")
+                    except sqlite3.IntegrityError as e:
+                        # Refaz o lote linha a linha so para achar quem conflitou
+                        conn.execute("ROLLBACK TO bulk_chunk")
+                        linha, erro = chunk[0][0], str(e)
+                        for linha, row in chunk:
+                            try:
+                                conn.execute(query, row)
+                            except sqlite3.IntegrityError as row_error:
+                                erro = str(row_error)
+                                break
+                        raise BulkConflict(linha, erro)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        
+        return gravados
     
     # Metodos para produtos
+    def list_produtos(self, limit, cursor=None, categoria=None, estoque=None,
+                      qtd_min=None, qtd_max=None, fields=PRODUTO_COLUMNS):
+        """Lista paginada de produtos com filtros"""
+        where, params = [], []
+        
+        if categoria:
+            where.append("categoria = ?")
+            params.append(categoria)
+        if estoque:
+            if estoque not in ESTOQUE_FILTROS:
+                raise ValueError(f"Status de estoque invalido: {estoque}")
+            where.append(ESTOQUE_FILTROS[estoque])
+        if qtd_min is not None:
+            where.append("quantidade >= ?")
+            params.append(qtd_min)
+        if qtd_max is not None:
+            where.append("quantidade <= ?")
+            params.append(qtd_max)
+        
+        return self._list_page('produtos', fields, where, params, limit, cursor)
+    
     def get_produtos(self):
-        """Lista todos os produtos - query SQL simples"""
-        query = """
-            SELECT id, nome, categoria, quantidade, created_at
-            FROM produtos 
-            ORDER BY nome
-        """
-        return self.execute_query(query)
+        """Lista todos os produtos (Rows - serializada sem dict por linha)"""
+        query = f"SELECT {self.select_list(PRODUTO_COLUMNS)} FROM produtos ORDER BY nome"
+        return self.fetch_rows(query, route='get_produtos')
     
     def get_produto_by_id(self, produto_id):
         """Busca produto por ID"""
-        query = "SELECT * FROM produtos WHERE id = ?"
-        result = self.execute_query(query, (produto_id,))
-        return result[0] if result else None
+        query = f"SELECT {self.select_list(PRODUTO_COLUMNS)} FROM produtos WHERE id = ?"
+        return self.fetch_one(query, (produto_id,))
     
     def create_produto(self, nome, categoria, quantidade):
         """Cria novo produto"""
         query = "INSERT INTO produtos (nome, categoria, quantidade) VALUES (?, ?, ?)"
-        return self.execute_query(query, (nome, categoria, quantidade))
+        new_id = self._write(query, (nome, categoria, quantidade))
+        self._publish('produtos', 'create', new_id)
+        return new_id
     
     def update_produto(self, produto_id, nome, categoria, quantidade):
         """Atualiza produto"""
         query = "UPDATE produtos SET nome = ?, categoria = ?, quantidade = ? WHERE id = ?"
-        self.execute_query(query, (nome, categoria, quantidade, produto_id))
+        self._write(query, (nome, categoria, quantidade, produto_id))
+        self._publish('produtos', 'update', produto_id)
     
     def delete_produto(self, produto_id):
         """Remove produto"""
         query = "DELETE FROM produtos WHERE id = ?"
-        self.execute_query(query, (produto_id,))
+        self._write(query, (produto_id,))
+        self._publish('produtos', 'delete', produto_id)
+    
+    def movimentar_estoque(self, movimentos):
+        """Aplica lista de (produto_id, delta, motivo) numa unica transacao
+        
+        Cada movimento eh um UPDATE ... RETURNING com guarda de estoque
+        (entre 0 e MAX_QUANTIDADE), sem ler o produto antes. Retorna as
+        quantidades finais.
+        """
+        update = f'''
+            UPDATE produtos SET quantidade = quantidade + ?
+            WHERE id = ? AND quantidade + ? BETWEEN 0 AND {MAX_QUANTIDADE}
+            RETURNING quantidade
+        '''
+        ledger = '''
+            INSERT INTO movimentos_estoque (produto_id, delta, quantidade_final, motivo)
+            VALUES (?, ?, ?, ?)
+        '''
+        resultado = []
+        
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for indice, (produto_id, delta, motivo) in enumerate(movimentos):
+                    row = conn.execute(update, (delta, produto_id, delta)).fetchone()
+                    
+                    if row is None:
+                        # So no caminho de erro descobre o motivo
+                        existe = conn.execute(
+                            "SELECT 1 FROM produtos WHERE id = ?", (produto_id,)
+                        ).fetchone()
+                        raise MovimentoInvalido(indice, produto_id,
+                                                motivo_rejeicao(existe, delta))
+                    
+                    conn.execute(ledger, (produto_id, delta, row[0], motivo))
+                    resultado.append({'produto_id': produto_id, 'quantidade': row[0]})
+                
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        
+        self._publish('produtos', 'estoque', itens=[dict(item) for item in resultado])
+        return resultado
+    
+    def get_movimentos(self, produto_id, limit=50):
+        """Ultimos movimentos de um produto (mais recentes primeiro)"""
+        query = f'''
+            SELECT {self.select_list(MOVIMENTO_COLUMNS)}
+            FROM movimentos_estoque
+            WHERE produto_id = ?
+            ORDER BY id DESC
+            LIMIT ?
+        '''
+        return self.fetch_all(query, (produto_id, limit))
+    
+    def search(self, table, q, limit, offset=0):
+        """Busca por prefixo ordenada por relevancia (bm25)"""
+        match = search_engine.build_match(q)
+        if match is None:
+            return []
+        select = self.select_list(search_engine.RESULT_COLUMNS[table], 't.')
+        return self.fetch_all(search_engine.search_sql(table, select), (match, limit, offset))
+    
+    def list_reposicao(self, limit, cursor=None, categoria=None):
+        """Pagina de produtos a repor (quantidade <= limite da categoria)"""
+        where, params = '', []
+        if categoria:
+            where = 'WHERE s.categoria = ?'
+            params.append(categoria)
+        
+        urgencia, last_id = -1.0, 0
+        if cursor:
+            urgencia, last_id = decode_cursor(cursor, key_types=(int, float))
+        params.extend([urgencia, last_id, limit + 1])
+        
+        rows = self.fetch_all(REPOSICAO_SQL.format(where=where), params)
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['urgencia'], rows[-1]['id'])
+        return rows, next_cursor
+    
+    def get_limites(self):
+        """Limites de reposicao configurados (categorias sem linha usam o padrao)"""
+        return self.fetch_all(
+            f"SELECT {self.select_list(('categoria', 'limite', 'updated_at'))} "
+            "FROM limites_reposicao ORDER BY categoria")
+    
+    def set_limite(self, categoria, limite):
+        """Grava o limite da categoria e recalcula as faixas de estoque"""
+        if not 0 <= limite <= stats_engine.MAX_LIMITE:
+            raise ValueError(f'limite deve estar entre 0 e {stats_engine.MAX_LIMITE}')
+        
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute('''
+                    INSERT INTO limites_reposicao (categoria, limite) VALUES (?, ?)
+                    ON CONFLICT(categoria) DO UPDATE SET
+                        limite = excluded.limite, updated_at = CURRENT_TIMESTAMP
+                ''', (categoria, limite))
+                # Mudar o limite move produtos entre as faixas
+                stats_engine.rebuild_estoque(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        
+        self._publish('limites', 'update', categoria, limite=limite)
     
     # Metodos para funcionarios
     def get_funcionarios(self):
-        """Lista funcionarios"""
-        query = """
-            SELECT id, nome, email, cargo, created_at
-            FROM funcionarios 
-            ORDER BY nome
-        """
-        return self.execute_query(query)
+        """Lista funcionarios (Rows - serializada sem dict por linha)"""
+        query = f"SELECT {self.select_list(FUNCIONARIO_COLUMNS)} FROM funcionarios ORDER BY nome"
+        return self.fetch_rows(query, route='get_funcionarios')
+    
+    def list_funcionarios(self, limit, cursor=None, cargo=None,
+                          fields=FUNCIONARIO_COLUMNS):
+        """Lista paginada de funcionarios com filtro por cargo"""
+        where, params = [], []
+        
+        if cargo:
+            where.append("cargo = ?")
+            params.append(cargo)
+        
+        return self._list_page('funcionarios', fields, where, params, limit, cursor)
     
     def get_funcionario_by_id(self, funcionario_id):
         """Busca funcionario por ID"""
-        query = "SELECT * FROM funcionarios WHERE id = ?"
-        result = self.execute_query(query, (funcionario_id,))
-        return result[0] if result else None
+        query = f"SELECT {self.select_list(FUNCIONARIO_COLUMNS)} FROM funcionarios WHERE id = ?"
+        return self.fetch_one(query, (funcionario_id,))
     
     def create_funcionario(self, nome, email, cargo):
         """Cria funcionario"""
         query = "INSERT INTO funcionarios (nome, email, cargo) VALUES (?, ?, ?)"
-        return self.execute_query(query, (nome, email, cargo))
+        new_id = self._write(query, (nome, email, cargo))
+        self._publish('funcionarios', 'create', new_id)
+        return new_id
     
     def update_funcionario(self, funcionario_id, nome, email, cargo):
         """Atualiza funcionario"""
         query = "UPDATE funcionarios SET nome = ?, email = ?, cargo = ? WHERE id = ?"
-        self.execute_query(query, (nome, email, cargo, funcionario_id))
+        self._write(query, (nome, email, cargo, funcionario_id))
+        self._publish('funcionarios', 'update', funcionario_id)
     
     def delete_funcionario(self, funcionario_id):
         """Remove funcionario"""
         query = "DELETE FROM funcionarios WHERE id = ?"
-        self.execute_query(query, (funcionario_id,))
+        self._write(query, (funcionario_id,))
+        self._publish('funcionarios', 'delete', funcionario_id)
     
     def get_stats(self):
-        """Calcula estatisticas"""
-        stats = {}
-        
-        # Total de produtos
-        query = "SELECT COUNT(*) as total FROM produtos"
-        result = self.execute_query(query)
-        stats['total_produtos'] = result[0]['total']
-        
-        # Total de funcionarios
-        query = "SELECT COUNT(*) as total FROM funcionarios"
-        result = self.execute_query(query)
-        stats['total_funcionarios'] = result[0]['total']
-        
-        # Produtos por categoria
-        query = """
-            SELECT categoria, COUNT(*) as quantidade 
-            FROM produtos 
-            GROUP BY categoria
-            ORDER BY quantidade DESC
-        """
-        stats['produtos_por_categoria'] = self.execute_query(query)
-        
-        # Funcionarios por cargo
-        query = """
-            SELECT 
-                CASE WHEN cargo IS NULL OR cargo = '' THEN 'Sem cargo' ELSE cargo END as cargo,
-                COUNT(*) as quantidade 
-            FROM funcionarios 
-            GROUP BY cargo
-            ORDER BY quantidade DESC
-        """
-        stats['funcionarios_por_cargo'] = self.execute_query(query)
-        
-        # Status do estoque - CASE WHEN como em SQL tradicional
-        query = """
-            SELECT 
-                SUM(CASE WHEN quantidade = 0 THEN 1 ELSE 0 END) as sem_estoque,
-                SUM(CASE WHEN quantidade > 0 AND quantidade < 10 THEN 1 ELSE 0 END) as estoque_baixo,
-                SUM(CASE WHEN quantidade >= 10 THEN 1 ELSE 0 END) as estoque_normal
-            FROM produtos
-        """
-        result = self.execute_query(query)
-        
-        if result:
-            estoque = result[0]
-            stats['status_estoque'] = [
-                {'status': 'Sem Estoque', 'quantidade': estoque['sem_estoque'] or 0},
-                {'status': 'Estoque Baixo', 'quantidade': estoque['estoque_baixo'] or 0},
-                {'status': 'Estoque Normal', 'quantidade': estoque['estoque_normal'] or 0}
-            ]
-        
-        # Total de categorias
-        query = "SELECT COUNT(DISTINCT categoria) as total FROM produtos"
-        result = self.execute_query(query)
-        stats['total_categorias'] = result[0]['total']
-              
-        return stats
-    
-    def backup_data(self):
-        """Backup simples - experiencia com automacao"""
-        import json
-        
-        dados = {
-            'produtos': self.get_produtos(),
-            'funcionarios': self.get_funcionarios(),
-            'backup_date': datetime.now().isoformat()
-        }
-        
-        filename = f'backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(dados, f, indent=2, ensure_ascii=False, default=str)
-        
-        print(f"Backup salvo: {filename}")
-        return filename
+        """Calcula estatisticas - le contadores pre-agregados numa unica query"""
+        with self._pool_for('get_stats').connection() as conn:
+            return stats_engine.read(conn)
+    
+    def snapshot_stats(self):
+        """Grava um ponto da serie historica agora (False se ja ha neste minuto)"""
+        with self.pool.connection() as conn:
+            return timeseries.snapshot(conn)
+    
+    def get_history(self, inicio, fim, step=None):
+        """Serie historica lida de um unico nivel de rollup"""
+        step = timeseries.resolve_level(inicio, fim, step)
+        with self._pool_for('get_history').connection() as conn:
+            return step, timeseries.history(conn, inicio, fim, step)
+    
+    def count_rows(self, table):
+        """Total de produtos/funcionarios lido dos contadores (O(1))"""
+        with self.pool.connection() as conn:
+            return stats_engine.count(conn, table)
+    
+    def rebuild_stats(self):
+        """Recalcula contadores do zero (ex: apos import manual via SQL)"""
+        with self.pool.connection() as conn:
+            stats_engine.rebuild(conn)
+            # Mesma transacao: /api/stats em cache nao sobrevive ao recalculo
+            conn.execute(BUMP_VERSIONS_SQL)
+            conn.commit()
+        self._publish('stats', 'rebuild')
+    
+    def backup_data(self, directory=backup.DEFAULT_DIR, compress=False, keep=backup.DEFAULT_KEEP):
+        """Backup online com a API de backup do SQLite (snapshot consistente)"""
+        # Com replica roteada o backup sai dela (sem tocar no primario)
+        source = self.db_file
+        if self.replica and 'backup_data' in self.read_routes:
+            source = self.replica.replica_file
+        info = backup.create_backup(source, directory, compress=compress, keep=keep)
+        log.info("Backup salvo: %s", info['file'])
+        return info['file']
+
+def is_postgres_url(target):
+    return target.startswith(('postgres://', 'postgresql://'))
+
+def open_database(target, **kwargs):
+    """Database do backend certo: URL postgresql://... ou arquivo SQLite"""
+    if is_postgres_url(target):
+        from postgres import PostgresDatabase
+        return PostgresDatabase(target, **kwargs)
+    return Database(target, **kwargs)
+
+class LazyDatabase:
+    """Database construido no primeiro uso, uma vez so (thread-safe)
+
+    Importar o app nao abre o banco nem roda migracoes: cada worker conecta
+    na primeira requisicao.
+    """
+    
+    def __init__(self, factory):
+        self._factory = factory
+        self._db = None
+        self._lock = threading.Lock()
+    
+    @property
+    def initialized(self):
+        return self._db is not None
+    
+    def configure(self, factory):
+        """Troca a fabrica (ex: outro arquivo) antes do primeiro uso"""
+        with self._lock:
+            if self._db is not None:
+                raise RuntimeError("Database ja inicializado")
+            self._factory = factory
+    
+    def get(self):
+        db = self._db
+        if db is None:
+            with self._lock:
+                if self._db is None:
+                    self._db = self._factory()
+                db = self._db
+        return db
+    
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
 
 # Função para popular dados iniciais
-def criar_dados_teste():
+def criar_dados_teste(db=None):
     """Cria dados de teste - como faria em automacao/scripts"""
-    db = Database()
+    db = db or Database()
     
     # Lista de produtos para teste
     produtos = [
@@ -231,19 +751,9 @@ def criar_dados_teste():
     ]
     
     try:
-        # Insere produtos
-        for nome, categoria, quantidade in produtos:
-            try:
-                db.create_produto(nome, categoria, quantidade)
-            except:
-                pass  # Ignora duplicatas
-        
-        # Insere funcionarios
-        for nome, email, cargo in funcionarios:
-            try:
-                db.create_funcionario(nome, email, cargo)
-            except:
-                pass  # Ignora duplicatas
+        # Insere tudo em lote - duplicatas sao ignoradas
+        db.bulk_insert('produtos', list(enumerate(produtos, start=1)), on_conflict='skip')
+        db.bulk_insert('funcionarios', list(enumerate(funcionarios, start=1)), on_conflict='skip')
         
         print("Dados de teste criados!")
         return True
@@ -0,0 +1,45 @@
+"""Erros do Database independentes do backend (SQLite ou PostgreSQL)
+
+As rotas tratam UniqueConflict em vez de procurar texto na mensagem do
+driver ('UNIQUE constraint failed' so existe no SQLite).
+"""
+import re
+
+
+class ConflictError(Exception):
+    """Escrita rejeitada por uma restricao do banco"""
+
+    def __init__(self, msg, table=None, columns=()):
+        super().__init__(msg)
+        self.table = table
+        self.columns = tuple(columns)
+
+
+class UniqueConflict(ConflictError):
+    """Violacao de UNIQUE (registro duplicado)"""
+
+
+# "UNIQUE constraint failed: produtos.nome, produtos.categoria"
+_SQLITE_UNIQUE = re.compile(r'UNIQUE constraint failed: (.+)')
+
+
+def from_sqlite(error):
+    """sqlite3.IntegrityError -> UniqueConflict (outros erros voltam iguais)"""
+    match = _SQLITE_UNIQUE.search(str(error))
+    if not match:
+        return error
+    colunas = [c.strip() for c in match.group(1).split(',')]
+    table = colunas[0].split('.')[0] if colunas else None
+    return UniqueConflict(str(error), table, [c.split('.')[-1] for c in colunas])
+
+
+# "Key (nome, categoria)=(Arroz, Alimentos) already exists."
+_PG_KEY = re.compile(r'Key \((.+?)\)=')
+
+
+def from_postgres(error):
+    """psycopg.errors.UniqueViolation -> UniqueConflict"""
+    diag = error.diag
+    match = _PG_KEY.search(diag.message_detail or '')
+    colunas = [c.strip() for c in match.group(1).split(',')] if match else []
+    return UniqueConflict(diag.message_primary or str(error), diag.table_name, colunas)
@@ -0,0 +1,115 @@
+"""Pub/sub em processo para o feed de mudancas (Server-Sent Events)
+
+Cada assinante tem uma fila limitada. publish() nunca bloqueia: se a fila
+de um assinante enche (cliente lento ou parado), ele e derrubado e o
+navegador reconecta com Last-Event-ID, recebendo o que ainda estiver no
+historico recente.
+
+O barramento e por processo. Com varios workers o relay.py repassa os
+eventos de todos por uma tabela no banco (EVENTS_RELAY).
+"""
+import itertools
+import os
+import queue
+import threading
+from collections import deque
+
+from serialization import dumps
+
+
+class Subscription:
+    """Fila de eventos de um cliente
+
+    notify (opcional) e chamado a cada evento ou queda - leitores asyncio
+    acordam com ele em vez de bloquear uma thread no get().
+    """
+
+    def __init__(self, max_queue, notify=None):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = False
+        self.notify = notify
+
+    def get(self, timeout):
+        """Proximo evento ou None se nada chegou no intervalo (heartbeat)"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def get_nowait(self):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """Distribui eventos para os assinantes sem bloquear quem publica"""
+
+    def __init__(self, max_queue=None, max_subscribers=None, history=None):
+        self.max_queue = max_queue or int(os.environ.get('EVENTS_QUEUE_SIZE', 100))
+        self.max_subscribers = max_subscribers or int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', 200))
+        self._history = deque(maxlen=history or int(os.environ.get('EVENTS_HISTORY', 256)))
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def subscribe(self, last_event_id=None, notify=None):
+        """Nova assinatura (None se o limite de clientes foi atingido)
+
+        Com last_event_id, reenfileira os eventos do historico depois dele.
+        """
+        sub = Subscription(self.max_queue, notify)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            if last_event_id is not None:
+                for event in self._history:
+                    if event['id'] > last_event_id and not sub.queue.full():
+                        sub.queue.put_nowait(event)
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, data, event_id=None):
+        """Envia para todos; assinante com fila cheia e derrubado
+
+        event_id vem do relay quando o feed e compartilhado entre workers.
+        """
+        with self._lock:
+            event = {'id': next(self._ids) if event_id is None else event_id, 'data': data}
+            self._history.append(event)
+            self.published += 1
+            for sub in list(self._subscribers):
+                try:
+                    sub.queue.put_nowait(event)
+                except queue.Full:
+                    sub.dropped = True
+                    self._subscribers.discard(sub)
+                    self.dropped += 1
+                if sub.notify:
+                    sub.notify()
+        return event['id']
+
+    def stats(self):
+        return {
+            'subscribers': len(self._subscribers),
+            'published': self.published,
+            'dropped': self.dropped,
+            'max_queue': self.max_queue,
+        }
+
+
+def format_sse(event, name='change'):
+    """Evento no formato text/event-stream"""
+    return (f"id: {event['id']}\nevent: {name}\ndata: ".encode()
+            + dumps(event['data']) + b'\n\n')
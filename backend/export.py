@@ -0,0 +1,56 @@
+"""Exportacao em streaming (NDJSON / CSV) com gzip opcional"""
+import csv
+import io
+import zlib
+
+from serialization import dumps, rows_to_dicts
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def ndjson_lines(columns, batches):
+    """Um objeto JSON por linha, um bloco por lote"""
+    for rows in batches:
+        yield b''.join(dumps(item) + b'\n' for item in rows_to_dicts(columns, rows))
+
+
+def csv_lines(columns, batches):
+    """CSV com cabecalho, reaproveitando o mesmo buffer"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Tabela vazia - so o cabecalho
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_stream(chunks):
+    """Comprime o stream sem juntar tudo em memoria"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 = formato gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(columns, batches, fmt, compress=False):
+    """Escolhe o formato e aplica gzip se pedido"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato invalido: {fmt}")
+
+    lines = ndjson_lines if fmt == 'ndjson' else csv_lines
+    chunks = lines(columns, batches)
+    if compress:
+        return gzip_stream(chunks)
+    return chunks
@@ -0,0 +1,266 @@
+"""Instrumentacao por requisicao: SQL, tempos por fase e histogramas
+
+Cada requisicao ganha um RequestRecorder (thread-local). As conexoes do
+pool usam InstrumentedConnection, que soma no recorder atual quantos
+statements rodaram e o tempo de execute/fetch. Ao fim da requisicao os
+numeros vao para histogramas expostos em formato Prometheus.
+
+Profiler opcional (PROFILE_SAMPLE_RATE > 0): requisicoes amostradas guardam
+o SQL executado e as N mais lentas (PROFILE_KEEP) ficam disponiveis.
+"""
+import heapq
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from flask import g, request
+
+from serialization import JSONProvider
+
+_local = threading.local()
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000, 10000, 100000)
+PHASES = ('connect', 'execute', 'fetch', 'serialize')
+
+
+class RequestRecorder:
+    __slots__ = ('statements', 'rows', 'phases', 'sql')
+
+    def __init__(self, capture_sql=False):
+        self.statements = 0
+        self.rows = 0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.sql = [] if capture_sql else None
+
+
+def current():
+    return getattr(_local, 'recorder', None)
+
+
+def record_phase(phase, seconds):
+    recorder = current()
+    if recorder is not None:
+        recorder.phases[phase] += seconds
+
+
+def _record_execute(sql, seconds):
+    recorder = current()
+    if recorder is not None:
+        recorder.statements += 1
+        recorder.phases['execute'] += seconds
+        if recorder.sql is not None:
+            recorder.sql.append({'sql': ' '.join(sql.split()), 'ms': round(seconds * 1000, 3)})
+
+
+def _record_fetch(rows, seconds):
+    recorder = current()
+    if recorder is not None:
+        recorder.rows += rows
+        recorder.phases['fetch'] += seconds
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que mede execute/fetch"""
+
+    def execute(self, sql, parameters=()):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_execute(sql, time.perf_counter() - t0)
+
+    def executemany(self, sql, seq_of_parameters):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_execute(sql, time.perf_counter() - t0)
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        _record_fetch(0 if row is None else 1, time.perf_counter() - t0)
+        return row
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        _record_fetch(len(rows), time.perf_counter() - t0)
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        _record_fetch(len(rows), time.perf_counter() - t0)
+        return rows
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Conexao cujos cursores (e atalhos execute*) sao instrumentados"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class Histogram:
+    """Histograma cumulativo no estilo Prometheus, com labels"""
+
+    def __init__(self, name, help_text, buckets, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted(self._series.items())
+            for labels, (counts, total, count) in items:
+                base = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+                sep = ',' if base else ''
+                for bound, c in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {c}')
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {count}')
+                lines.append(f'{self.name}_sum{{{base}}} {total}')
+                lines.append(f'{self.name}_count{{{base}}} {count}')
+        return '\n'.join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = Histogram('fabrismart_request_duration_seconds',
+                            'Duracao total da requisicao', LATENCY_BUCKETS,
+                            ('route', 'method', 'status'))
+PHASE_SECONDS = Histogram('fabrismart_request_phase_seconds',
+                          'Tempo por fase (connect, execute, fetch, serialize)',
+                          LATENCY_BUCKETS, ('route', 'phase'))
+SQL_STATEMENTS = Histogram('fabrismart_sql_statements_per_request',
+                           'Statements SQL por requisicao', COUNT_BUCKETS, ('route',))
+SQL_ROWS = Histogram('fabrismart_sql_rows_per_request',
+                     'Linhas lidas por requisicao', COUNT_BUCKETS, ('route',))
+
+HISTOGRAMS = (REQUEST_SECONDS, PHASE_SECONDS, SQL_STATEMENTS, SQL_ROWS)
+
+
+class SlowRequestProfiler:
+    """Guarda as N requisicoes amostradas mais lentas, com o SQL"""
+
+    def __init__(self, sample_rate=None, keep=None):
+        if sample_rate is None:
+            sample_rate = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+        self.sample_rate = sample_rate
+        self.keep = keep or int(os.environ.get('PROFILE_KEEP', 20))
+        self._heap = []
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def should_sample(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def add(self, duration, entry):
+        with self._lock:
+            self._seq += 1
+            item = (duration, self._seq, entry)
+            if len(self._heap) < self.keep:
+                heapq.heappush(self._heap, item)
+            elif duration > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def slowest(self):
+        with self._lock:
+            return [entry for _, _, entry in sorted(self._heap, reverse=True)]
+
+
+profiler = SlowRequestProfiler()
+
+
+class TimedJSONProvider(JSONProvider):
+    """JSON provider do Flask que conta o tempo de serializacao"""
+
+    def dumps_bytes(self, obj):
+        t0 = time.perf_counter()
+        try:
+            return super().dumps_bytes(obj)
+        finally:
+            record_phase('serialize', time.perf_counter() - t0)
+
+
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def init_app(app):
+    """Registra hooks de inicio/fim de requisicao no app"""
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_recorder():
+        g.metrics_start = time.perf_counter()
+        _local.recorder = RequestRecorder(capture_sql=profiler.should_sample())
+
+    @app.teardown_request
+    def _finish_recorder(error=None):
+        recorder = current()
+        _local.recorder = None
+        start = g.pop('metrics_start', None)
+        if recorder is None or start is None:
+            return
+
+        duration = time.perf_counter() - start
+        route = _route()
+        status = g.pop('metrics_status', 500 if error else 200)
+
+        REQUEST_SECONDS.observe(duration, route, request.method, str(status))
+        for phase, seconds in recorder.phases.items():
+            PHASE_SECONDS.observe(seconds, route, phase)
+        SQL_STATEMENTS.observe(recorder.statements, route)
+        SQL_ROWS.observe(recorder.rows, route)
+
+        if recorder.sql is not None:
+            profiler.add(duration, {
+                'route': route,
+                'path': request.full_path.rstrip('?'),
+                'method': request.method,
+                'status': status,
+                'ms': round(duration * 1000, 3),
+                'statements': recorder.statements,
+                'rows': recorder.rows,
+                'phases_ms': {k: round(v * 1000, 3) for k, v in recorder.phases.items()},
+                'sql': recorder.sql,
+            })
+
+    @app.after_request
+    def _keep_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+
+def render_prometheus():
+    """Texto no formato de exposicao do Prometheus"""
+    return '\n'.join(h.render() for h in HISTOGRAMS) + '\n'
@@ -0,0 +1,503 @@
+"""Migracoes versionadas do schema (PRAGMA user_version)
+
+Cada migracao roda na sua propria transacao (BEGIN IMMEDIATE) e grava a
+nova versao no mesmo commit. Com varios workers subindo juntos so o
+primeiro aplica; os outros esperam o lock, releem a versao e seguem.
+
+O SQLite nao tem build de indice online: o CREATE INDEX roda dentro desse
+BEGIN IMMEDIATE e bloqueia os escritores ate o commit (leitores seguem no
+WAL). A unica ajuda e o sorter com PRAGMA threads = 4 durante a migracao.
+
+O DDL de cada migracao publicada fica congelado aqui, sem ler o schema
+atual de outros modulos - mudancas entram em migracoes novas.
+
+    python migrations.py            # aplica pendentes
+    python migrations.py --status   # versao atual e pendentes
+    python migrations.py --check    # EXPLAIN QUERY PLAN das queries quentes
+"""
+import argparse
+import os
+import sqlite3
+import time
+from collections import namedtuple
+
+import stats as stats_engine
+
+
+class MigrationError(Exception):
+    pass
+
+
+Migration = namedtuple('Migration', 'version nome apply checks')
+
+
+# Queries quentes -> indice que o plano deve usar
+HOT_QUERIES = {
+    'produtos_por_nome': (
+        "SELECT id, nome FROM produtos WHERE (nome, id) > (?, ?) ORDER BY nome, id LIMIT 50",
+        ('', 0), 'idx_produtos_nome'),
+    'produtos_por_categoria': (
+        "SELECT id, nome FROM produtos WHERE categoria = ? AND (nome, id) > (?, ?) "
+        "ORDER BY nome, id LIMIT 50",
+        ('', '', 0), 'idx_produtos_categoria_nome'),
+    'produtos_por_quantidade': (
+        "SELECT id FROM produtos WHERE quantidade >= ? AND quantidade <= ?",
+        (0, 9), 'idx_produtos_quantidade'),
+    'funcionarios_por_nome': (
+        "SELECT id, nome FROM funcionarios WHERE (nome, id) > (?, ?) ORDER BY nome, id LIMIT 50",
+        ('', 0), 'idx_funcionarios_nome'),
+    'funcionarios_por_cargo': (
+        "SELECT id, nome FROM funcionarios WHERE cargo = ? AND (nome, id) > (?, ?) "
+        "ORDER BY nome, id LIMIT 50",
+        ('', '', 0), 'idx_funcionarios_cargo_nome'),
+    'movimentos_por_produto': (
+        "SELECT id FROM movimentos_estoque WHERE produto_id = ? ORDER BY id DESC LIMIT 50",
+        (0,), 'idx_movimentos_produto'),
+    'produtos_reposicao': (
+        "SELECT p.id FROM stats_categoria s CROSS JOIN produtos p ON p.categoria = s.categoria "
+        f"WHERE p.quantidade <= {stats_engine.MAX_LIMITE} AND p.quantidade <= ?",
+        (9,), 'idx_produtos_reposicao'),
+}
+
+
+def _tabelas_base(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS produtos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            quantidade INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(nome, categoria)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS funcionarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            cargo TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _indices_listagem(conn):
+    # (categoria, nome) e (cargo, nome) tambem servem filtros so por categoria/cargo
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_produtos_nome ON produtos(nome)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_produtos_categoria_nome ON produtos(categoria, nome)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_produtos_quantidade ON produtos(quantidade)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_funcionarios_nome ON funcionarios(nome)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_funcionarios_cargo_nome ON funcionarios(cargo, nome)")
+
+
+def _movimentos_estoque(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS movimentos_estoque (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            produto_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            quantidade_final INTEGER NOT NULL,
+            motivo TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_movimentos_produto ON movimentos_estoque(produto_id, id)")
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_movimentos_no_update
+        BEFORE UPDATE ON movimentos_estoque BEGIN
+            SELECT RAISE(ABORT, 'movimentos_estoque eh somente insercao');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_movimentos_no_delete
+        BEFORE DELETE ON movimentos_estoque BEGIN
+            SELECT RAISE(ABORT, 'movimentos_estoque eh somente insercao');
+        END
+    ''')
+
+
+# Migracao 3 como foi publicada (faixa fixa: baixo = quantidade < 10).
+# Congelada aqui - mudancas nos contadores entram em migracoes novas.
+_V3_BUCKET = """CASE
+    WHEN {p}.quantidade IS NULL OR {p}.quantidade <= 0 THEN 'sem_estoque'
+    WHEN {p}.quantidade < 10 THEN 'estoque_baixo'
+    ELSE 'estoque_normal' END"""
+
+_V3_CARGO = "CASE WHEN {p}.cargo IS NULL OR {p}.cargo = '' THEN 'Sem cargo' ELSE {p}.cargo END"
+
+
+def _v3_incr(table, key_col, key_expr, delta):
+    return f"""
+        INSERT INTO {table} ({key_col}, total) VALUES ({key_expr}, {delta})
+        ON CONFLICT({key_col}) DO UPDATE SET total = total + ({delta});
+        DELETE FROM {table} WHERE {key_col} = {key_expr} AND total <= 0;"""
+
+
+def _v3_bucket(p):
+    return _V3_BUCKET.format(p=p)
+
+
+def _v3_cargo(p):
+    return _V3_CARGO.format(p=p)
+
+
+CONTADORES_V3 = [
+    """CREATE TABLE IF NOT EXISTS stats_categoria (
+        categoria TEXT PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS stats_cargo (
+        cargo TEXT PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS stats_estoque (
+        bucket TEXT PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_produtos_insert
+        AFTER INSERT ON produtos BEGIN
+        {_v3_incr('stats_categoria', 'categoria', 'NEW.categoria', 1)}
+        {_v3_incr('stats_estoque', 'bucket', _v3_bucket('NEW'), 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_produtos_delete
+        AFTER DELETE ON produtos BEGIN
+        {_v3_incr('stats_categoria', 'categoria', 'OLD.categoria', -1)}
+        {_v3_incr('stats_estoque', 'bucket', _v3_bucket('OLD'), -1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_produtos_update
+        AFTER UPDATE OF categoria, quantidade ON produtos BEGIN
+        {_v3_incr('stats_categoria', 'categoria', 'OLD.categoria', -1)}
+        {_v3_incr('stats_categoria', 'categoria', 'NEW.categoria', 1)}
+        {_v3_incr('stats_estoque', 'bucket', _v3_bucket('OLD'), -1)}
+        {_v3_incr('stats_estoque', 'bucket', _v3_bucket('NEW'), 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_funcionarios_insert
+        AFTER INSERT ON funcionarios BEGIN
+        {_v3_incr('stats_cargo', 'cargo', _v3_cargo('NEW'), 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_funcionarios_delete
+        AFTER DELETE ON funcionarios BEGIN
+        {_v3_incr('stats_cargo', 'cargo', _v3_cargo('OLD'), -1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_funcionarios_update
+        AFTER UPDATE OF cargo ON funcionarios BEGIN
+        {_v3_incr('stats_cargo', 'cargo', _v3_cargo('OLD'), -1)}
+        {_v3_incr('stats_cargo', 'cargo', _v3_cargo('NEW'), 1)}
+    END""",
+]
+
+
+def _contadores_dashboard(conn):
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_estoque'"
+    ).fetchone()
+
+    for ddl in CONTADORES_V3:
+        conn.execute(ddl)
+
+    if not existe:
+        conn.execute("""
+            INSERT INTO stats_categoria (categoria, total)
+            SELECT categoria, COUNT(*) FROM produtos GROUP BY categoria
+        """)
+        conn.execute(f"""
+            INSERT INTO stats_cargo (cargo, total)
+            SELECT {_v3_cargo('funcionarios')} AS c, COUNT(*) FROM funcionarios GROUP BY c
+        """)
+        conn.execute(f"""
+            INSERT INTO stats_estoque (bucket, total)
+            SELECT {_v3_bucket('produtos')} AS b, COUNT(*) FROM produtos GROUP BY b
+        """)
+
+
+# Migracao 5 como foi publicada: FTS5 externo sobre as tabelas base.
+# remove_diacritics: 'cafe' encontra 'Café', 'eletronicos' encontra 'Eletrônicos'
+_V5_TOKENIZER = "unicode61 remove_diacritics 2"
+
+_V5_INDEXES = {
+    'produtos': ('nome', 'categoria'),
+    'funcionarios': ('nome', 'email', 'cargo'),
+}
+
+
+def _v5_fts(table, columns):
+    fts = f'{table}_fts'
+    cols = ', '.join(columns)
+    new = ', '.join(f'NEW.{c}' for c in columns)
+    old = ', '.join(f'OLD.{c}' for c in columns)
+
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {cols}, content='{table}', content_rowid='id', tokenize='{_V5_TOKENIZER}'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {cols}) VALUES (NEW.id, {new});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', OLD.id, {old});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', OLD.id, {old});
+            INSERT INTO {fts}(rowid, {cols}) VALUES (NEW.id, {new});
+        END""",
+    ]
+
+
+def _busca_full_text(conn):
+    # Sem FTS5 no SQLite a busca fica desligada (Database.fts_enabled)
+    try:
+        for table, columns in _V5_INDEXES.items():
+            fts = f'{table}_fts'
+            existe = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)
+            ).fetchone()
+
+            for ddl in _v5_fts(table, columns):
+                conn.execute(ddl)
+
+            if not existe:
+                conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        if 'fts5' not in str(e):
+            raise
+
+
+# Migracao 6 como foi publicada: baixo = ate o limite da categoria (padrao
+# 9, teto 100). Substitui os triggers de produtos da migracao 3.
+_V6_LIMITE = "COALESCE((SELECT limite FROM limites_reposicao WHERE categoria = {p}.categoria), 9)"
+
+_V6_BUCKET = """CASE
+    WHEN {p}.quantidade IS NULL OR {p}.quantidade <= 0 THEN 'sem_estoque'
+    WHEN {p}.quantidade <= """ + _V6_LIMITE + """ THEN 'estoque_baixo'
+    ELSE 'estoque_normal' END"""
+
+
+def _v6_bucket(p):
+    return _V6_BUCKET.format(p=p)
+
+
+LIMITES_V6 = [
+    """CREATE TABLE IF NOT EXISTS limites_reposicao (
+        categoria TEXT PRIMARY KEY,
+        limite INTEGER NOT NULL CHECK (limite BETWEEN 0 AND 100),
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "DROP TRIGGER IF EXISTS trg_stats_produtos_insert",
+    "DROP TRIGGER IF EXISTS trg_stats_produtos_delete",
+    "DROP TRIGGER IF EXISTS trg_stats_produtos_update",
+    f"""CREATE TRIGGER trg_stats_produtos_insert
+        AFTER INSERT ON produtos BEGIN
+        {_v3_incr('stats_categoria', 'categoria', 'NEW.categoria', 1)}
+        {_v3_incr('stats_estoque', 'bucket', _v6_bucket('NEW'), 1)}
+    END""",
+    f"""CREATE TRIGGER trg_stats_produtos_delete
+        AFTER DELETE ON produtos BEGIN
+        {_v3_incr('stats_categoria', 'categoria', 'OLD.categoria', -1)}
+        {_v3_incr('stats_estoque', 'bucket', _v6_bucket('OLD'), -1)}
+    END""",
+    f"""CREATE TRIGGER trg_stats_produtos_update
+        AFTER UPDATE OF categoria, quantidade ON produtos BEGIN
+        {_v3_incr('stats_categoria', 'categoria', 'OLD.categoria', -1)}
+        {_v3_incr('stats_categoria', 'categoria', 'NEW.categoria', 1)}
+        {_v3_incr('stats_estoque', 'bucket', _v6_bucket('OLD'), -1)}
+        {_v3_incr('stats_estoque', 'bucket', _v6_bucket('NEW'), 1)}
+    END""",
+    # Faixas recalculadas com os triggers novos
+    "DELETE FROM stats_estoque",
+    f"""INSERT INTO stats_estoque (bucket, total)
+        SELECT {_v6_bucket('produtos')} AS b, COUNT(*) FROM produtos GROUP BY b""",
+    """CREATE INDEX IF NOT EXISTS idx_produtos_reposicao ON produtos(categoria, quantidade)
+        WHERE quantidade <= 100""",
+]
+
+
+def _limites_reposicao(conn):
+    for ddl in LIMITES_V6:
+        conn.execute(ddl)
+
+
+# Migracao 7 como foi publicada
+SERIE_V7 = [
+    # WITHOUT ROWID: a PK (nivel, ts, ...) e a propria tabela, leitura por faixa
+    """CREATE TABLE IF NOT EXISTS serie_estoque (
+        nivel TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        tipo TEXT NOT NULL,
+        chave TEXT NOT NULL,
+        ultimo INTEGER NOT NULL,
+        minimo INTEGER NOT NULL,
+        maximo INTEGER NOT NULL,
+        soma INTEGER NOT NULL,
+        amostras INTEGER NOT NULL,
+        PRIMARY KEY (nivel, ts, tipo, chave)
+    ) WITHOUT ROWID""",
+]
+
+
+def _serie_historica(conn):
+    for ddl in SERIE_V7:
+        conn.execute(ddl)
+
+
+# tabela da versao -> tabelas cujas escritas a incrementam
+VERSOES = {
+    'produtos': ('produtos', 'limites_reposicao'),
+    'funcionarios': ('funcionarios',),
+}
+
+
+def _versoes_cache(conn):
+    # Versoes do cache de respostas no banco: valem para todos os workers
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            tabela TEXT PRIMARY KEY,
+            versao INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for tabela, fontes in VERSOES.items():
+        conn.execute("INSERT OR IGNORE INTO table_versions (tabela) VALUES (?)", (tabela,))
+        for fonte in fontes:
+            for evento in ('INSERT', 'UPDATE', 'DELETE'):
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_versao_{fonte}_{evento.lower()}
+                    AFTER {evento} ON {fonte} BEGIN
+                        UPDATE table_versions SET versao = versao + 1 WHERE tabela = '{tabela}';
+                    END
+                ''')
+
+
+def _eventos(conn):
+    # AUTOINCREMENT: ids nunca reusados (clientes guardam o Last-Event-ID)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            origem TEXT NOT NULL,
+            data TEXT NOT NULL
+        )
+    ''')
+
+
+# Todas com IF NOT EXISTS: bancos criados antes do versionamento
+# (user_version = 0) passam por elas sem erro.
+MIGRATIONS = [
+    Migration(1, 'tabelas produtos e funcionarios', _tabelas_base, ()),
+    Migration(2, 'indices de listagem e filtros', _indices_listagem,
+              ('produtos_por_nome', 'produtos_por_categoria', 'produtos_por_quantidade',
+               'funcionarios_por_nome', 'funcionarios_por_cargo')),
+    Migration(3, 'contadores do dashboard', _contadores_dashboard, ()),
+    Migration(4, 'movimentos de estoque', _movimentos_estoque, ('movimentos_por_produto',)),
+    Migration(5, 'busca full-text', _busca_full_text, ()),
+    Migration(6, 'limites de reposicao por categoria', _limites_reposicao,
+              ('produtos_reposicao',)),
+    Migration(7, 'serie historica do estoque', _serie_historica, ()),
+    Migration(8, 'versoes do cache de respostas', _versoes_cache, ()),
+    Migration(9, 'feed de eventos entre workers', _eventos, ()),
+]
+
+LATEST = MIGRATIONS[-1].version
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def query_plan(conn, nome):
+    """Linhas de detalhe do EXPLAIN QUERY PLAN de uma query quente"""
+    sql, params, _ = HOT_QUERIES[nome]
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def check_plans(conn, nomes=None):
+    """{query: (usa_indice_esperado, plano)}"""
+    resultado = {}
+    for nome in (HOT_QUERIES if nomes is None else nomes):
+        _, _, indice = HOT_QUERIES[nome]
+        plano = query_plan(conn, nome)
+        usa = any(f'INDEX {indice}' in linha for linha in plano)
+        resultado[nome] = (usa, plano)
+    return resultado
+
+
+def _apply(conn, migration):
+    """Aplica uma migracao com o lock de escrita; False se outro processo ja aplicou"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if current_version(conn) >= migration.version:
+            conn.rollback()
+            return False
+
+        # CREATE INDEX em tabela grande: sorter com threads auxiliares
+        conn.execute("PRAGMA threads = 4")
+        migration.apply(conn)
+
+        falhas = [nome for nome, (usa, _) in check_plans(conn, migration.checks).items() if not usa]
+        if falhas:
+            raise MigrationError(
+                f"Migracao {migration.version} nao indexou: {', '.join(falhas)}")
+
+        conn.execute(f"PRAGMA user_version = {migration.version}")
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA threads = 0")
+
+
+def pending(conn):
+    versao = current_version(conn)
+    return [m for m in MIGRATIONS if m.version > versao]
+
+
+def migrate(conn, verbose=True):
+    """Aplica migracoes pendentes em ordem; retorna as versoes aplicadas"""
+    # Caminho rapido: nada pendente, nenhum lock de escrita
+    if not pending(conn):
+        return []
+
+    aplicadas = []
+    for migration in pending(conn):
+        inicio = time.perf_counter()
+        if _apply(conn, migration):
+            aplicadas.append(migration.version)
+            if verbose:
+                print(f"Migracao {migration.version} aplicada: {migration.nome} "
+                      f"({time.perf_counter() - inicio:.2f}s)")
+    return aplicadas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Migracoes do banco Fabrismart')
+    parser.add_argument('--db', default=os.environ.get('DATABASE_FILE', 'fabrismart.db'))
+    parser.add_argument('--status', action='store_true', help='Mostra versao e pendentes')
+    parser.add_argument('--check', action='store_true', help='Confere planos das queries quentes')
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db, timeout=60)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        if args.status:
+            print(f"Versao atual: {current_version(conn)} (ultima: {LATEST})")
+            for m in pending(conn):
+                print(f"  pendente {m.version}: {m.nome}")
+            return 0
+
+        if args.check:
+            ok = True
+            for nome, (usa, plano) in check_plans(conn).items():
+                ok = ok and usa
+                print(f"{'ok   ' if usa else 'FALHA'} {nome}: {' | '.join(plano)}")
+            return 0 if ok else 1
+
+        aplicadas = migrate(conn)
+        print(f"Banco na versao {current_version(conn)}"
+              + ('' if aplicadas else ' (nada pendente)'))
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
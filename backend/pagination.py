@@ -0,0 +1,52 @@
+"""Paginacao por cursor (keyset) em (chave, id) - chave e o nome na maioria das listas"""
+import base64
+import json
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(nome, row_id):
+    """Cursor opaco com a chave da ultima linha da pagina"""
+    raw = json.dumps([nome, row_id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, key_types=(str,)):
+    """Volta o cursor para (nome, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        nome, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(nome, key_types) or not isinstance(row_id, int):
+            raise ValueError
+        return nome, row_id
+    except (ValueError, TypeError):
+        raise InvalidCursor('Cursor invalido')
+
+
+def parse_limit(value):
+    """Valida limit vindo da query string"""
+    if value is None or value == '':
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except (ValueError, TypeError):
+        raise ValueError('limit deve ser um numero')
+    if limit < 1:
+        raise ValueError('limit deve ser maior que zero')
+    return min(limit, MAX_LIMIT)
+
+
+def parse_fields(value, allowed):
+    """Projecao fields=a,b,c validada contra colunas permitidas"""
+    if not value:
+        return list(allowed)
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    invalid = [f for f in fields if f not in allowed]
+    if invalid:
+        raise ValueError(f"Campos invalidos: {', '.join(invalid)}")
+    return fields
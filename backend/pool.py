@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from backup import readonly_uri
+from metrics import InstrumentedConnection, record_phase
+
+# Pragmas aplicados uma vez por conexao (nao por query)
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -20000",      # ~20MB de cache de paginas
+    "PRAGMA mmap_size = 268435456",    # 256MB mapeados em memoria
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Conexoes mode=ro: sem journal_mode (e do arquivo) e com query_only
+READONLY_PRAGMAS = PRAGMAS[1:] + ("PRAGMA query_only = 1",)
+
+
+# Statements preparados ficam em cache na conexao (reusados entre requisicoes)
+STATEMENT_CACHE = 256
+
+
+def default_size():
+    """Tamanho do pool sem precisar abrir o banco (DB_POOL_SIZE)"""
+    return int(os.environ.get('DB_POOL_SIZE', 8))
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexao livre dentro do tempo de espera"""
+
+
+class ConnectionPool:
+    """Pool limitado de conexoes SQLite com checkout e devolucao
+
+    Quem espera por conexao acorda tanto na devolucao quanto no descarte
+    (conexao quebrada libera a vaga para uma nova).
+    """
+
+    def __init__(self, db_file, max_size=None, timeout=None, readonly=False):
+        self.db_file = db_file
+        self.readonly = readonly
+        self.max_size = max_size or default_size()
+        self.timeout = timeout or float(os.environ.get('DB_POOL_TIMEOUT', 10))
+        # Ociosas em pilha (LIFO): a mais recente tem cache de paginas quente
+        self._idle = []
+        self._cond = threading.Condition()
+        self._created = 0
+        self._closed = False
+        self._draining = False
+
+    def _connect(self):
+        """Abre conexao nova e aplica pragmas"""
+        target = readonly_uri(self.db_file) if self.readonly else self.db_file
+        conn = sqlite3.connect(target, timeout=self.timeout,
+                               check_same_thread=False,
+                               factory=InstrumentedConnection,
+                               cached_statements=STATEMENT_CACHE,
+                               uri=self.readonly)
+        for pragma in (READONLY_PRAGMAS if self.readonly else PRAGMAS):
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        """Pega conexao livre ou cria uma nova ate o limite"""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError('Pool fechado')
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self.max_size:
+                    self._created += 1
+                    break
+                # Pool cheio - espera alguem devolver ou descartar
+                restante = deadline - time.monotonic()
+                if restante <= 0:
+                    raise PoolTimeout(f'Sem conexao livre apos {self.timeout}s')
+                self._cond.wait(restante)
+
+        # Conectar fora do lock: os outros checkouts nao esperam o open
+        try:
+            return self._connect()
+        except Exception:
+            self._free_slot()
+            raise
+
+    def release(self, conn, broken=False):
+        """Devolve conexao ao pool (ou descarta se estiver quebrada)"""
+        if broken or self._closed or self._draining:
+            self._discard(conn)
+            return
+
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        self._free_slot()
+
+    def _free_slot(self):
+        """Uma conexao a menos: quem espera pode abrir outra"""
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Checkout com devolucao automatica"""
+        t0 = time.perf_counter()
+        conn = self.acquire()
+        record_phase('connect', time.perf_counter() - t0)
+        broken = False
+        try:
+            yield conn
+        except sqlite3.DatabaseError as e:
+            # Erros de integridade nao invalidam a conexao
+            broken = not isinstance(e, sqlite3.IntegrityError)
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    def health_check(self):
+        """Testa uma conexao do pool com SELECT 1"""
+        with self.connection() as conn:
+            conn.execute("SELECT 1").fetchone()
+        return {
+            'size': self._created,
+            'idle': len(self._idle),
+            'max_size': self.max_size,
+        }
+
+    def drain(self):
+        """Fecha as ociosas e descarta as demais na devolucao
+
+        Diferente de close(), checkouts continuam funcionando: quem ja pegou
+        a referencia do pool (ex: replica trocada) nao recebe erro.
+        """
+        self._draining = True
+        self._close_idle()
+
+    def close(self):
+        """Fecha todas as conexoes ociosas"""
+        with self._cond:
+            self._closed = True
+            # Quem esta esperando recebe 'Pool fechado' em vez do timeout
+            self._cond.notify_all()
+        self._close_idle()
+
+    def _close_idle(self):
+        with self._cond:
+            ociosas, self._idle = self._idle, []
+        for conn in ociosas:
+            self._discard(conn)
@@ -0,0 +1,328 @@
+"""Rate limit por cliente/rota e controle de admissao
+
+Duas protecoes, nesta ordem, antes de cada requisicao:
+
+1. Token bucket por (cliente, metodo + rota). Cada rota custa tokens
+   conforme o peso da query (ROUTE_COSTS): a lista completa de produtos
+   gasta bem mais que um GET por id. Sem tokens -> 429 + Retry-After.
+2. Limite global de requisicoes simultaneas no worker com fila de espera
+   limitada. Fila cheia ou espera estourada -> 503 + Retry-After, em vez
+   de deixar todas as threads presas no banco.
+
+Os buckets ficam em memoria (por worker). Com RATE_LIMIT_STORE=<arquivo>
+eles vao para um SQLite compartilhado e o limite vale para todos os
+workers da maquina. A admissao e sempre por worker (o pool tambem e).
+
+    RATE_LIMIT_RATE=0             tokens por segundo (padrao 0: desligado)
+    RATE_LIMIT_BURST=100          tamanho do bucket
+    RATE_LIMIT_STORE=rl.db        bucket compartilhado (padrao: memoria)
+    RATE_LIMIT_TRUST_PROXY=1      cliente = primeiro IP do X-Forwarded-For
+    ADMISSION_MAX_CONCURRENT=16   requisicoes simultaneas (0 desliga)
+    ADMISSION_QUEUE=32            esperando por uma vaga
+    ADMISSION_WAIT=2              segundos maximos na fila
+
+O rate limit so liga quando RATE_LIMIT_RATE e definido. Atras do router
+(Procfile/Heroku) todo request chega do IP do proxy e todos os clientes
+dividiriam um bucket: ao ligar la, defina tambem RATE_LIMIT_TRUST_PROXY=1.
+Nunca ligar com o servidor exposto direto - o X-Forwarded-For viria do
+proprio cliente e trocaria de bucket a cada requisicao.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, jsonify, request
+
+from pool import default_size
+
+RATE = float(os.environ.get('RATE_LIMIT_RATE', 0))
+BURST = float(os.environ.get('RATE_LIMIT_BURST', 100))
+STORE = os.environ.get('RATE_LIMIT_STORE', '')
+TRUST_PROXY = os.environ.get('RATE_LIMIT_TRUST_PROXY', '0') == '1'
+
+MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', default_size() * 2))
+MAX_QUEUE = int(os.environ.get('ADMISSION_QUEUE', MAX_CONCURRENT * 2))
+MAX_WAIT = float(os.environ.get('ADMISSION_WAIT', 2))
+
+# Tokens por requisicao (padrao 1) - proporcional ao trabalho no banco
+ROUTE_COSTS = {
+    'GET /api/produtos': 5,
+    'GET /api/funcionarios': 5,
+    'GET /api/produtos/export': 20,
+    'GET /api/funcionarios/export': 20,
+    'POST /api/produtos/bulk': 20,
+    'POST /api/funcionarios/bulk': 20,
+    'POST /api/produtos/batch-get': 3,
+    'POST /api/funcionarios/batch-get': 3,
+    'GET /api/produtos/low-stock': 3,
+    'GET /api/stats': 3,
+    'GET /api/stats/history': 3,
+    'GET /api/search': 2,
+    'POST /api/produtos/movimentos': 2,
+}
+
+# Fora do rate limit e da admissao: monitoramento e o feed SSE (conexao
+# longa, com limite proprio de assinantes)
+EXEMPT = {'/api/health', '/api/metrics', '/api/metrics/slow', '/api/events'}
+
+
+def _refill(tokens, updated, now, rate, burst):
+    return min(burst, tokens + (now - updated) * rate)
+
+
+class MemoryStore:
+    """Buckets do worker em um LRU limitado (bucket despejado volta cheio)"""
+
+    def __init__(self, max_keys=None):
+        self.max_keys = max_keys or int(os.environ.get('RATE_LIMIT_MAX_KEYS', 10000))
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, rate, burst):
+        """(permitido, tokens restantes)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = _refill(tokens, updated, now, rate, burst)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def close(self):
+        pass
+
+
+class SQLiteStore:
+    """Buckets num arquivo SQLite compartilhado pelos workers
+
+    Uma transacao IMMEDIATE curta por requisicao (ler, recarregar,
+    descontar); relogio de parede porque os processos nao compartilham
+    o monotonic.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS rate_buckets (
+                chave TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            ) WITHOUT ROWID""")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, cost, rate, burst):
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE chave = ?",
+                               (key,)).fetchone()
+            tokens = _refill(*row, now, rate, burst) if row else burst
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute("""
+                INSERT INTO rate_buckets (chave, tokens, updated) VALUES (?, ?, ?)
+                ON CONFLICT(chave) DO UPDATE SET tokens = excluded.tokens,
+                                                 updated = excluded.updated
+            """, (key, tokens, now))
+
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                # Buckets parados ha mais que um refill completo ja estariam cheios
+                conn.execute("DELETE FROM rate_buckets WHERE updated < ?",
+                             (now - burst / rate,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class RateLimiter:
+    """Token bucket por chave com custo por rota"""
+
+    def __init__(self, rate=None, burst=None, store=None, costs=None):
+        self.rate = RATE if rate is None else rate
+        self.burst = BURST if burst is None else burst
+        self.store = store or (SQLiteStore(STORE) if STORE else MemoryStore())
+        self.costs = ROUTE_COSTS if costs is None else costs
+        self.limited = 0
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def cost(self, route):
+        # Custo maior que o bucket nunca passaria
+        return min(self.costs.get(route, 1), self.burst)
+
+    def check(self, client, route):
+        """None se permitido, senao segundos ate haver tokens (Retry-After)"""
+        cost = self.cost(route)
+        allowed, tokens = self.store.take(f"{client}|{route}", cost, self.rate, self.burst)
+        if allowed:
+            return None
+        self.limited += 1
+        return (cost - tokens) / self.rate
+
+    def stats(self):
+        return {'rate': self.rate, 'burst': self.burst, 'limited': self.limited,
+                'store': 'sqlite' if isinstance(self.store, SQLiteStore) else 'memory'}
+
+
+class AdmissionGate:
+    """Semaforo com fila de espera limitada - descarta cedo sob sobrecarga"""
+
+    def __init__(self, max_concurrent=None, max_queue=None, max_wait=None):
+        self.max_concurrent = MAX_CONCURRENT if max_concurrent is None else max_concurrent
+        self.max_queue = MAX_QUEUE if max_queue is None else max_queue
+        self.max_wait = MAX_WAIT if max_wait is None else max_wait
+        self.active = 0
+        self.waiting = 0
+        self.shed = 0
+        self._cond = threading.Condition()
+
+    @property
+    def enabled(self):
+        return self.max_concurrent > 0
+
+    def acquire(self):
+        """True com vaga; False se a fila esta cheia ou a espera estourou"""
+        with self._cond:
+            if self.active < self.max_concurrent:
+                self.active += 1
+                return True
+            if self.waiting >= self.max_queue:
+                self.shed += 1
+                return False
+
+            self.waiting += 1
+            try:
+                ok = self._cond.wait_for(lambda: self.active < self.max_concurrent,
+                                         timeout=self.max_wait)
+            finally:
+                self.waiting -= 1
+            if not ok:
+                self.shed += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def stats(self):
+        return {'max_concurrent': self.max_concurrent, 'max_queue': self.max_queue,
+                'active': self.active, 'waiting': self.waiting, 'shed': self.shed}
+
+
+limiter = RateLimiter()
+gate = AdmissionGate()
+
+
+def client_id():
+    """IP do cliente (X-Forwarded-For so atras de um proxy confiavel)"""
+    if TRUST_PROXY:
+        forwarded = request.headers.get('X-Forwarded-For')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.remote_addr or 'unknown'
+
+
+def _reject(status, message, retry_after):
+    response = jsonify({'error': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def stats():
+    return {'rate_limit': limiter.stats(), 'admission': gate.stats()}
+
+
+def _release_once():
+    """gate.release que so vale na primeira chamada (fim do corpo e close)"""
+    released = []
+
+    def release():
+        if not released:
+            released.append(True)
+            gate.release()
+    return release
+
+
+def _until_done(body, release):
+    # Gerador que nunca comecou nao roda o finally no close: por isso o
+    # call_on_close tambem chama release
+    try:
+        yield from body
+    finally:
+        release()
+
+
+def init_app(app):
+    """Registra rate limit e admissao antes de cada requisicao"""
+
+    @app.before_request
+    def _admit():
+        rule = request.url_rule
+        path = rule.rule if rule is not None else 'unmatched'
+        if request.method == 'OPTIONS' or path in EXEMPT:
+            return None
+
+        if limiter.enabled:
+            espera = limiter.check(client_id(), f"{request.method} {path}")
+            if espera is not None:
+                return _reject(429, 'Muitas requisicoes - tente novamente depois', espera)
+
+        if gate.enabled:
+            if not gate.acquire():
+                return _reject(503, 'Servidor sobrecarregado - tente novamente', gate.max_wait)
+            g.admitted = True
+        return None
+
+    @app.after_request
+    def _release_after_stream(response):
+        # Streams (export, listas grandes) leem o banco depois da view: a vaga
+        # volta no fim do corpo ou quando o servidor fecha a resposta
+        if response.is_streamed and g.pop('admitted', False):
+            release = _release_once()
+            response.response = _until_done(response.response, release)
+            response.call_on_close(release)
+        return response
+
+    @app.teardown_request
+    def _release(error=None):
+        # Corpo ja montado (ou erro antes do after_request) - devolve aqui,
+        # sem depender do close do servidor
+        if g.pop('admitted', False):
+            gate.release()
@@ -0,0 +1,85 @@
+"""Feed de eventos compartilhado entre workers
+
+Cada worker grava seus eventos na tabela eventos e um thread le, a cada
+EVENTS_RELAY_INTERVAL segundos, os gravados pelos outros, publicando no
+EventBus local com o mesmo id. Todo dashboard ve as escritas de todos os
+workers, e o Last-Event-ID vale em qualquer um deles.
+
+Custo: um INSERT a mais por escrita e uma leitura pequena por intervalo.
+Ligado por padrao so quando o servidor faz streaming (asgi.py ou
+EVENTS_STREAMING=1) com mais de um worker; EVENTS_RELAY=0/1 forca.
+"""
+import json
+import os
+import threading
+import uuid
+from collections import deque
+
+from serialization import dumps
+
+# Ids alocados antes do commit (PostgreSQL) podem aparecer fora de ordem:
+# cada leitura volta esse tanto atras e ignora os ja vistos
+LOOKBACK = 100
+PRUNE_EVERY = 256
+
+
+class EventRelay:
+    """Grava eventos locais e repassa os dos outros workers"""
+
+    def __init__(self, db, bus, interval=None, keep=None):
+        self.db = db
+        self.bus = bus
+        self.interval = interval or float(os.environ.get('EVENTS_RELAY_INTERVAL', 0.5))
+        self.keep = keep or int(os.environ.get('EVENTS_RELAY_KEEP', 10000))
+        self.origin = uuid.uuid4().hex
+        self.last_id = db.fetch_one("SELECT COALESCE(MAX(id), 0) AS ultimo FROM eventos")['ultimo']
+        # Eventos de antes deste worker subir nao sao repassados
+        self._start_id = self.last_id
+        self.relayed = 0
+        self._recorded = 0
+        self._seen = deque(maxlen=LOOKBACK * 10)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='events-relay', daemon=True)
+        self._thread.start()
+
+    def record(self, data):
+        """Grava o evento e retorna o id compartilhado"""
+        event_id = self.db.execute_write(
+            "INSERT INTO eventos (origem, data) VALUES (?, ?)",
+            (self.origin, dumps(data).decode()))
+        self._recorded += 1
+        if self._recorded % PRUNE_EVERY == 0:
+            self.db.execute_write("DELETE FROM eventos WHERE id <= ?", (event_id - self.keep,))
+        return event_id
+
+    def poll(self):
+        """Publica os eventos novos dos outros workers; retorna quantos"""
+        rows = self.db.fetch_all(
+            "SELECT id, origem, data FROM eventos WHERE id > ? ORDER BY id",
+            (self.last_id - LOOKBACK,))
+        novos = 0
+        for row in rows:
+            if row['id'] <= self._start_id or row['id'] in self._seen:
+                continue
+            self._seen.append(row['id'])
+            self.last_id = max(self.last_id, row['id'])
+            if row['origem'] != self.origin:
+                self.bus.publish(json.loads(row['data']), row['id'])
+                novos += 1
+        self.relayed += novos
+        return novos
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except self.db.driver_errors:
+                # Banco ocupado - tenta no proximo intervalo
+                pass
+
+    def stats(self):
+        return {'origin': self.origin, 'last_id': self.last_id, 'relayed': self.relayed}
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,89 @@
+"""Replica local do banco para leituras pesadas
+
+Uma copia (API de backup) do primario e trocada atomicamente (os.replace)
+a cada DB_REPLICA_REFRESH segundos. As leituras roteadas para a replica
+nao disputam nada com as escritas do primario; em troca, podem estar ate
+um intervalo atrasadas.
+
+Varios workers podem apontar para o mesmo arquivo: quem encontra a replica
+ainda fresca (mtime) so reabre o pool se outro processo ja trocou o arquivo.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import backup
+from pool import ConnectionPool
+
+
+class Replica:
+    """Arquivo de replica + pool somente leitura renovados periodicamente"""
+
+    def __init__(self, primary_file, replica_file=None, refresh=None, pool_size=None):
+        self.primary_file = primary_file
+        self.replica_file = replica_file or os.environ.get('DB_REPLICA_FILE') or primary_file + '.replica'
+        self.refresh_seconds = refresh or float(os.environ.get('DB_REPLICA_REFRESH', 60))
+        self.pool_size = pool_size
+        self.pool = None
+        self.refreshed_at = 0.0
+        self._inode = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name='db-replica', daemon=True)
+        self._thread.start()
+
+    def _copy(self):
+        """Primario -> temporario no mesmo diretorio -> os.replace (atomico)"""
+        directory = os.path.dirname(os.path.abspath(self.replica_file))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            backup.copy_database(self.primary_file, tmp)
+            os.replace(tmp, self.replica_file)
+        except Exception:
+            os.remove(tmp)
+            raise
+
+    def refresh(self, force=False):
+        """Copia o primario se a replica esta velha; troca o pool se o arquivo mudou"""
+        with self._lock:
+            try:
+                st = os.stat(self.replica_file)
+            except FileNotFoundError:
+                st = None
+
+            if force or st is None or time.time() - st.st_mtime >= self.refresh_seconds:
+                self._copy()
+                st = os.stat(self.replica_file)
+
+            if st.st_ino != self._inode:
+                # Pool antigo drena: requisicoes que ja o pegaram seguem
+                # funcionando e as conexoes sao descartadas ao voltar
+                old = self.pool
+                self.pool = ConnectionPool(self.replica_file, max_size=self.pool_size, readonly=True)
+                self._inode = st.st_ino
+                self.refreshed_at = st.st_mtime
+                if old:
+                    old.drain()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except (OSError, sqlite3.Error):
+                # Primario ocupado/indisponivel - segue com a replica atual
+                pass
+
+    def lag(self):
+        """Segundos desde a copia em uso"""
+        return round(time.time() - self.refreshed_at, 1)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        if self.pool:
+            self.pool.close()
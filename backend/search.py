@@ -0,0 +1,47 @@
+"""Busca full-text (FTS5) em produtos e funcionarios
+
+Indices e triggers criados pela migracao 5 (migrations.py).
+"""
+import re
+
+# tabela -> colunas indexadas e peso de cada uma no bm25
+INDEXES = {
+    'produtos': (('nome', 10.0), ('categoria', 2.0)),
+    'funcionarios': (('nome', 10.0), ('email', 5.0), ('cargo', 2.0)),
+}
+
+RESULT_COLUMNS = {
+    'produtos': ('id', 'nome', 'categoria', 'quantidade', 'created_at'),
+    'funcionarios': ('id', 'nome', 'email', 'cargo', 'created_at'),
+}
+
+
+def terms(q):
+    """Palavras do texto livre (sem operadores nem pontuacao)"""
+    return re.findall(r'\w+', q or '')
+
+
+def build_match(q):
+    """Texto livre -> expressao MATCH com prefixo em cada termo
+
+    Termos viram strings entre aspas, entao operadores do FTS5 digitados
+    pelo usuario (AND, NEAR, *, :) nao quebram a query.
+    """
+    termos = terms(q)
+    if not termos:
+        return None
+    return ' '.join(f'"{termo}"*' for termo in termos)
+
+
+def search_sql(table, select):
+    """SELECT ordenado por bm25 com pesos por coluna (select: colunas de t)"""
+    fts = f'{table}_fts'
+    pesos = ', '.join(str(peso) for _, peso in INDEXES[table])
+    return f"""
+        SELECT {select}
+        FROM {fts} f
+        JOIN {table} t ON t.id = f.rowid
+        WHERE {fts} MATCH ?
+        ORDER BY bm25({fts}, {pesos})
+        LIMIT ? OFFSET ?
+    """
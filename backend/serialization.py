@@ -0,0 +1,130 @@
+"""Serializacao JSON das respostas
+
+Usa orjson quando instalado (bem mais rapido em listas grandes) e cai para
+o json da stdlib se nao estiver. JSON_BACKEND=json forca a stdlib.
+"""
+import json
+import os
+from datetime import date, datetime
+from itertools import repeat
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+if os.environ.get('JSON_BACKEND') == 'json':
+    orjson = None
+
+BACKEND = 'orjson' if orjson else 'json'
+
+_flask_default = DefaultJSONProvider.default
+
+
+def _default(o):
+    # ISO 8601 em vez do formato HTTP do Flask
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, Rows):
+        return list(o)
+    return _flask_default(o)
+
+
+def dumps(obj, sort_keys=False):
+    """Objeto -> bytes UTF-8"""
+    if orjson is not None:
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(obj, default=_default, ensure_ascii=False, sort_keys=sort_keys,
+                      separators=(',', ':')).encode('utf-8')
+
+
+class Rows:
+    """Resultado compacto de um SELECT: tuplas do cursor + nomes das colunas
+
+    Nenhum dict por linha fica em memoria: dumps_rows monta os objetos JSON
+    lote a lote. Iterar devolve dicts (um por vez) para quem so le campos.
+    """
+
+    __slots__ = ('columns', 'rows')
+
+    def __init__(self, columns, rows):
+        self.columns = tuple(columns)
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return map(dict, map(zip, repeat(self.columns), self.rows))
+
+    def __getitem__(self, index):
+        return dict(zip(self.columns, self.rows[index]))
+
+
+def column_names(cursor):
+    """Nomes das colunas do ultimo SELECT (DB-API cursor.description)"""
+    return tuple(d[0] for d in cursor.description)
+
+
+def rows_to_dicts(columns, rows):
+    """Lote de tuplas -> lista de dicts (tipos nativos do orjson)"""
+    return list(map(dict, map(zip, repeat(tuple(columns)), rows)))
+
+
+def encode_batches(columns, batches, sort_keys=False):
+    """Itens JSON de cada lote, sem os colchetes; lotes vazios sao pulados
+
+    So os dicts de um lote existem ao mesmo tempo.
+    """
+    for rows in batches:
+        encoded = dumps(rows_to_dicts(columns, rows), sort_keys=sort_keys)
+        if len(encoded) > 2:
+            yield encoded[1:-1]
+
+
+def dumps_rows(result, sort_keys=False, batch_size=1000):
+    """Rows -> array JSON (bytes) sem montar a lista inteira de dicts"""
+    rows = result.rows
+    batches = (rows[i:i + batch_size] for i in range(0, len(rows), batch_size))
+    return b'[' + b','.join(encode_batches(result.columns, batches, sort_keys)) + b']'
+
+
+def stream_array(columns, batches, sort_keys=False):
+    """Array JSON em pedacos: cada lote do cursor e serializado e enviado
+    enquanto o proximo ainda esta sendo lido do banco."""
+    yield b'['
+    first = True
+    for encoded in encode_batches(columns, batches, sort_keys):
+        # Junta os lotes com virgula
+        yield encoded if first else b',' + encoded
+        first = False
+    yield b']\n'
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Provider padrao do app - orjson e datas em ISO 8601"""
+
+    default = staticmethod(_default)
+    ensure_ascii = False
+
+    def dumps_bytes(self, obj):
+        if isinstance(obj, Rows):
+            return dumps_rows(obj, sort_keys=self.sort_keys)
+        return dumps(obj, sort_keys=self.sort_keys)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Chamadas com opcoes (indent etc) usam a stdlib
+            kwargs.setdefault('default', self.default)
+            kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+            kwargs.setdefault('sort_keys', self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n',
+                                        mimetype=self.mimetype)
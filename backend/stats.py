@@ -0,0 +1,141 @@
+"""Estatisticas mantidas por triggers - leitura O(1) no dashboard"""
+
+# Limite de reposicao de categorias sem linha em limites_reposicao
+# (quantidade <= 9 = estoque baixo, igual as faixas antigas)
+DEFAULT_LIMITE = 9
+# Teto dos limites - o indice parcial de reposicao cobre ate aqui
+MAX_LIMITE = 100
+
+LIMITE_SQL = ("COALESCE((SELECT limite FROM limites_reposicao WHERE categoria = {c}), "
+              f"{DEFAULT_LIMITE})")
+
+# Faixas de estoque usadas no dashboard (baixo = ate o limite da categoria)
+BUCKET_SQL = """CASE
+    WHEN {q} IS NULL OR {q} <= 0 THEN 'sem_estoque'
+    WHEN {q} <= """ + LIMITE_SQL + """ THEN 'estoque_baixo'
+    ELSE 'estoque_normal' END"""
+
+CARGO_SQL = "CASE WHEN {c} IS NULL OR {c} = '' THEN 'Sem cargo' ELSE {c} END"
+
+BUCKETS = (
+    ('sem_estoque', 'Sem Estoque'),
+    ('estoque_baixo', 'Estoque Baixo'),
+    ('estoque_normal', 'Estoque Normal'),
+)
+
+TABLES = ('stats_categoria', 'stats_cargo', 'stats_estoque')
+
+
+def bucket_of(conn, produto_id):
+    """Faixa atual de um produto (None se nao existe)"""
+    row = conn.execute(
+        f"SELECT {BUCKET_SQL.format(q='quantidade', c='produtos.categoria')} "
+        "FROM produtos WHERE id = ?", (produto_id,)).fetchone()
+    return row[0] if row else None
+
+
+# Uma unica query le todos os contadores
+READ_SQL = """
+    SELECT 'categoria' AS tipo, categoria AS chave, total FROM stats_categoria
+    UNION ALL
+    SELECT 'cargo', cargo, total FROM stats_cargo
+    UNION ALL
+    SELECT 'estoque', bucket, total FROM stats_estoque
+"""
+
+
+def rebuild(conn):
+    """Recalcula contadores a partir das tabelas base (full scan)"""
+    for table in TABLES:
+        conn.execute(f"DELETE FROM {table}")
+
+    conn.execute("""
+        INSERT INTO stats_categoria (categoria, total)
+        SELECT categoria, COUNT(*) FROM produtos GROUP BY categoria
+    """)
+    conn.execute(f"""
+        INSERT INTO stats_cargo (cargo, total)
+        SELECT {CARGO_SQL.format(c='cargo')} AS c, COUNT(*)
+        FROM funcionarios GROUP BY c
+    """)
+    rebuild_estoque(conn)
+
+
+def rebuild_estoque(conn):
+    """Recalcula so as faixas de estoque (apos mudar um limite)"""
+    conn.execute("DELETE FROM stats_estoque")
+    conn.execute(f"""
+        INSERT INTO stats_estoque (bucket, total)
+        SELECT {BUCKET_SQL.format(q='quantidade', c='produtos.categoria')} AS b, COUNT(*)
+        FROM produtos GROUP BY b
+    """)
+
+
+def read(conn):
+    """Monta o dict de estatisticas com uma ida ao banco"""
+    return assemble(conn.execute(READ_SQL))
+
+
+def assemble(rows):
+    """(tipo, chave, total) -> dict do dashboard (mesmo formato em qualquer backend)"""
+    categorias, cargos, estoque = [], [], {}
+
+    for tipo, chave, total in rows:
+        if tipo == 'categoria':
+            categorias.append({'categoria': chave, 'quantidade': total})
+        elif tipo == 'cargo':
+            cargos.append({'cargo': chave, 'quantidade': total})
+        else:
+            estoque[chave] = total
+
+    categorias.sort(key=lambda item: item['quantidade'], reverse=True)
+    cargos.sort(key=lambda item: item['quantidade'], reverse=True)
+
+    return {
+        'total_produtos': sum(estoque.values()),
+        'total_funcionarios': sum(item['quantidade'] for item in cargos),
+        'produtos_por_categoria': categorias,
+        'funcionarios_por_cargo': cargos,
+        'status_estoque': [
+            {'status': label, 'quantidade': estoque.get(bucket, 0)}
+            for bucket, label in BUCKETS
+        ],
+        'total_categorias': len(categorias),
+    }
+
+
+# Tabela de contadores que soma o total de linhas de cada tabela base
+COUNT_SQL = {
+    'produtos': "SELECT COALESCE(SUM(total), 0) FROM stats_estoque",
+    'funcionarios': "SELECT COALESCE(SUM(total), 0) FROM stats_cargo",
+}
+
+
+def count(conn, table):
+    """Total de linhas sem COUNT(*) na tabela base"""
+    return conn.execute(COUNT_SQL[table]).fetchone()[0]
+
+
+COUNTERS_SQL = """
+    SELECT bucket, total FROM stats_estoque
+    UNION ALL
+    SELECT 'funcionarios', COALESCE(SUM(total), 0) FROM stats_cargo
+"""
+
+
+def counters(conn):
+    """Totais do dashboard (so numeros) para os eventos de mudanca"""
+    return counters_from(conn.execute(COUNTERS_SQL).fetchall())
+
+
+def counters_from(rows):
+    """(bucket ou 'funcionarios', total) -> totais do dashboard"""
+    valores = dict(rows)
+    por_bucket = {b: valores.get(b, 0) for b, _ in BUCKETS}
+    return {
+        'total_produtos': sum(por_bucket.values()),
+        'total_funcionarios': valores['funcionarios'],
+        'produtos_sem_estoque': por_bucket['sem_estoque'],
+        'produtos_estoque_baixo': por_bucket['estoque_baixo'],
+        'produtos_estoque_normal': por_bucket['estoque_normal'],
+    }
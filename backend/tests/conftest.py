@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# Modulos do backend sao planos (import database, import postgres...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """Modulo app apontando para um SQLite temporario, com cache vazio"""
+    import app as app_module
+    from database import Database, LazyDatabase
+
+    database = Database(str(tmp_path / 'api.db'))
+    monkeypatch.setattr(app_module, 'db', LazyDatabase(lambda: database))
+    app_module.response_cache.clear()
+    yield app_module
+    app_module.response_cache.clear()
+    database.close()
+
+
+@pytest.fixture
+def client(api):
+    return api.app.test_client()
@@ -0,0 +1,68 @@
+"""Ponte ASGI -> WSGI (asgi.py): corpo da requisicao e limite de tamanho"""
+import asyncio
+import json
+
+import pytest
+
+
+@pytest.fixture
+def bridge(api, monkeypatch):
+    # Importar o asgi liga EVENTS_STREAMING no app: volta ao valor original
+    monkeypatch.setitem(api.app.config, 'EVENTS_STREAMING', api.app.config['EVENTS_STREAMING'])
+    import asgi
+    ponte = asgi.WSGIBridge(api.app, max_workers=2)
+    yield ponte
+    ponte.executor.shutdown(wait=True)
+
+
+def call(bridge, method, path, chunks, headers=()):
+    """Roda uma requisicao; o corpo chega em varias mensagens http.request"""
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+             'headers': [(b'content-type', b'application/json'), *headers]}
+    mensagens = [{'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+                 for i, chunk in enumerate(chunks)]
+    lidas = []
+    enviadas = []
+
+    async def receive():
+        if mensagens:
+            lidas.append(mensagens[0])
+            return mensagens.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        enviadas.append(message)
+
+    asyncio.run(bridge(scope, receive, send))
+    status = enviadas[0]['status']
+    corpo = b''.join(m.get('body', b'') for m in enviadas[1:])
+    return status, json.loads(corpo), len(lidas)
+
+
+def test_corpo_chunked_sem_content_length(bridge):
+    corpo = json.dumps({'nome': 'Arroz', 'categoria': 'Alimentos', 'quantidade': 3}).encode()
+    status, resposta, _ = call(bridge, 'POST', '/api/produtos', [corpo[:10], corpo[10:], b''])
+    assert status == 201
+    assert (resposta['nome'], resposta['quantidade']) == ('Arroz', 3)
+
+
+def test_content_length_declarado(bridge):
+    corpo = json.dumps({'nome': 'Feijao', 'categoria': 'Alimentos'}).encode()
+    status, _, _ = call(bridge, 'POST', '/api/produtos', [corpo],
+                        [(b'content-length', str(len(corpo)).encode())])
+    assert status == 201
+
+
+def test_chunked_acima_do_limite_para_de_ler(bridge, api, monkeypatch):
+    monkeypatch.setitem(api.app.config, 'MAX_CONTENT_LENGTH', 64)
+    status, resposta, lidas = call(bridge, 'POST', '/api/produtos', [b'x' * 40] * 10)
+    assert status == 413
+    assert resposta == {'error': 'Corpo da requisicao muito grande (maximo 64 bytes)'}
+    assert lidas == 2
+
+
+def test_content_length_acima_do_limite_nem_le(bridge, api, monkeypatch):
+    monkeypatch.setitem(api.app.config, 'MAX_CONTENT_LENGTH', 64)
+    status, _, lidas = call(bridge, 'POST', '/api/produtos', [b'x' * 100],
+                            [(b'content-length', b'100')])
+    assert (status, lidas) == (413, 0)
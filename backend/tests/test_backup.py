@@ -0,0 +1,20 @@
+"""Database.backup_data - mesmo padrao do CLI (backup.py create)"""
+import logging
+
+import backup
+from database import Database
+
+
+def test_padrao_sem_compressao_e_logado(tmp_path, caplog):
+    db = Database(str(tmp_path / 'origem.db'))
+    db.create_produto('A', 'X', 1)
+    try:
+        with caplog.at_level(logging.INFO, logger='database'):
+            path = db.backup_data(str(tmp_path / 'backups'))
+        assert path.endswith('.db')
+        assert f'Backup salvo: {path}' in caplog.text
+        assert backup.verify(path)['counts']['produtos'] == 1
+
+        assert db.backup_data(str(tmp_path / 'backups'), compress=True).endswith('.db.gz')
+    finally:
+        db.close()
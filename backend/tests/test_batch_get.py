@@ -0,0 +1,66 @@
+"""Batch-get: varios registros por id numa chamada"""
+import json
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def ids(client):
+    criados = []
+    for nome in ('A', 'B', 'C'):
+        resposta = client.post('/api/produtos', json={'nome': nome, 'categoria': 'X'})
+        criados.append(resposta.get_json()['id'])
+    return criados
+
+
+def test_ordem_dos_ids_e_missing(client, ids):
+    a, b, c = ids
+    resposta = client.post('/api/produtos/batch-get', json={'ids': [c, 999, a, c]})
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    assert [item and item['nome'] for item in corpo['items']] == ['C', None, 'A', 'C']
+    assert corpo['missing'] == [999]
+
+
+def test_fields(client, ids):
+    corpo = client.post('/api/produtos/batch-get',
+                        json={'ids': ids[:1], 'fields': ['nome']}).get_json()
+    assert corpo['items'] == [{'nome': 'A'}]
+
+    resposta = client.post('/api/produtos/batch-get', json={'ids': ids, 'fields': ['senha']})
+    assert resposta.status_code == 400
+
+
+def test_funcionarios(client):
+    criado = client.post('/api/funcionarios', json={
+        'nome': 'Ana', 'email': 'ana@empresa.com', 'cargo': 'Gerente'}).get_json()
+    corpo = client.post('/api/funcionarios/batch-get', json={'ids': [criado['id']]}).get_json()
+    assert corpo['items'][0]['email'] == 'ana@empresa.com'
+    assert corpo['missing'] == []
+
+
+def test_limite_de_ids(client, monkeypatch):
+    monkeypatch.setattr(database, 'MAX_BATCH_IDS', 3)
+    assert client.post('/api/produtos/batch-get', json={'ids': [1, 2, 3]}).status_code == 200
+    resposta = client.post('/api/produtos/batch-get', json={'ids': [1, 2, 3, 4]})
+    assert resposta.status_code == 400
+    assert resposta.get_json() == {'error': 'Maximo de 3 ids por chamada'}
+
+
+@pytest.mark.parametrize('corpo, erro', [
+    ({}, 'Campo ids (lista) e obrigatorio'),
+    ({'ids': '1,2'}, 'Campo ids (lista) e obrigatorio'),
+    ({'ids': [1, '2']}, 'ids deve conter apenas numeros inteiros'),
+    ({'ids': [True]}, 'ids deve conter apenas numeros inteiros'),
+    ({'ids': [2 ** 70]}, 'ids fora do intervalo permitido'),
+    ({'ids': [-2 ** 63 - 1]}, 'ids fora do intervalo permitido'),
+    ({'ids': [1], 'fields': 'nome'}, 'fields deve ser uma lista de nomes de campos'),
+])
+def test_corpo_invalido_400(client, corpo, erro):
+    # json.dumps: o orjson do test client nao codifica inteiros > 64 bits
+    resposta = client.post('/api/produtos/batch-get', data=json.dumps(corpo),
+                           content_type='application/json')
+    assert resposta.status_code == 400
+    assert resposta.get_json() == {'error': erro}
@@ -0,0 +1,28 @@
+"""Smoke test dos benchmarks: rodam sem erro e nao alteram o dataset"""
+from benchmarks import db_bench
+from benchmarks.datasets import generate
+from database import Database
+
+
+def contagens(db_file):
+    db = Database(db_file)
+    try:
+        return db.count_rows('produtos'), db.count_rows('funcionarios'), db.get_stats()
+    finally:
+        db.close()
+
+
+def test_db_bench_roda_numa_copia(tmp_path):
+    db_file = str(tmp_path / 'bench.db')
+    generate(db_file, produtos=200, funcionarios=20)
+    antes = contagens(db_file)
+
+    results = db_bench.run(db_file, iterations=20)
+
+    assert {'create_produto', 'movimentar_estoque', 'bulk_insert_1000',
+            'memory_get_produtos'} <= set(results)
+    assert all(r['errors'] == 0 for r in results.values() if 'errors' in r)
+    assert results['memory_get_produtos']['rows'] > 200
+    # Execucao repetida parte do mesmo banco
+    assert contagens(db_file) == antes
+    assert db_bench.run(db_file, iterations=2, only=['get_stats'])['get_stats']['count'] == 2
@@ -0,0 +1,97 @@
+"""Importacao em lote: politicas de conflito, erros por linha e limites"""
+import io
+
+
+def importar(client, corpo, table='produtos', **query):
+    return client.post(f'/api/{table}/bulk', data=corpo, query_string=query,
+                       content_type='application/x-ndjson')
+
+
+NDJSON = (b'{"nome": "A", "categoria": "X", "quantidade": 1}\n'
+          b'{"nome": "", "categoria": "X"}\n'
+          b'{"nome": "B", "categoria": "X", "quantidade": -2}\n'
+          b'{"nome": "C", "categoria": "X", "quantidade": "3"}\n')
+
+
+def nomes(client):
+    return sorted(p['nome'] for p in client.get('/api/produtos').get_json())
+
+
+def test_fail_nao_grava_nada_com_linha_invalida(client):
+    resposta = importar(client, NDJSON, on_conflict='fail')
+    assert resposta.status_code == 400
+    corpo = resposta.get_json()
+    assert (corpo['total'], corpo['gravados'], corpo['invalidos']) == (4, 0, 2)
+    assert corpo['erros'] == [{'linha': 2, 'error': 'Nome eh obrigatorio'},
+                              {'linha': 3, 'error': 'Quantidade nao pode ser negativa'}]
+    assert nomes(client) == []
+
+
+def test_skip_grava_validas_e_ignora_duplicadas(client):
+    client.post('/api/produtos', json={'nome': 'C', 'categoria': 'X', 'quantidade': 9})
+    corpo = importar(client, NDJSON, on_conflict='skip').get_json()
+    assert (corpo['gravados'], corpo['ignorados'], corpo['invalidos']) == (1, 1, 2)
+    assert [e['linha'] for e in corpo['erros']] == [2, 3]
+    assert nomes(client) == ['A', 'C']
+
+
+def test_quantidade_fora_do_intervalo_e_erro_da_linha(client):
+    corpo = (b'{"nome": "A", "categoria": "X", "quantidade": 1}\n'
+             b'{"nome": "B", "categoria": "X", "quantidade": 10000000000000000000000}\n'
+             b'{"nome": "C", "categoria": "X", "quantidade": 1e400}\n')
+    resposta = importar(client, corpo, on_conflict='skip')
+    assert resposta.status_code == 200
+    assert resposta.get_json()['erros'] == [
+        {'linha': 2, 'error': 'Quantidade acima do maximo permitido'},
+        {'linha': 3, 'error': 'Quantidade deve ser um numero'}]
+    assert nomes(client) == ['A']
+
+
+def test_upsert_conta_chave_repetida_uma_vez(client):
+    corpo = b'nome,categoria,quantidade\nA,X,1\nB,X,2\nA,X,3\n'
+    resposta = client.post('/api/produtos/bulk?on_conflict=upsert', data=corpo,
+                           content_type='text/csv')
+    assert (resposta.get_json()['gravados'], resposta.get_json()['ignorados']) == (2, 1)
+    itens = {p['nome']: p['quantidade'] for p in client.get('/api/produtos').get_json()}
+    assert itens == {'A': 3, 'B': 2}
+
+
+def test_fail_com_duplicada_informa_a_linha_e_desfaz(client):
+    client.post('/api/produtos', json={'nome': 'B', 'categoria': 'X'})
+    corpo = b'nome,categoria\nA,X\nB,X\n'
+    resposta = client.post('/api/produtos/bulk', data=corpo, content_type='text/csv')
+    assert resposta.status_code == 409
+    assert resposta.get_json()['erros'] == [{'linha': 2, 'error': 'Registro duplicado'}]
+    assert nomes(client) == ['B']
+
+
+def test_upload_de_funcionarios(client):
+    arquivo = (io.BytesIO(b'nome,email,cargo\nAna,ANA@empresa.com,Gerente\nBia,invalido,\n'),
+               'equipe.csv')
+    resposta = client.post('/api/funcionarios/bulk?on_conflict=skip', data={'file': arquivo})
+    corpo = resposta.get_json()
+    assert (corpo['gravados'], corpo['erros']) == (1, [{'linha': 2, 'error': 'Email invalido'}])
+
+
+def test_arquivo_com_encoding_invalido(client):
+    arquivo = (io.BytesIO('nome,categoria\nCafé,X\n'.encode('latin-1')), 'produtos.csv')
+    resposta = client.post('/api/produtos/bulk', data={'file': arquivo})
+    assert resposta.status_code == 400
+    assert resposta.get_json()['error'].startswith('Arquivo invalido:')
+
+
+def test_politica_e_corpo_invalidos(client):
+    assert importar(client, NDJSON, on_conflict='replace').status_code == 400
+    assert importar(client, b'').get_json() == {'error': 'Nenhum dado fornecido'}
+    resposta = client.post('/api/produtos/bulk', data=b'{"nome": "A"}',
+                           content_type='application/json')
+    assert resposta.get_json() == {'error': 'Arquivo invalido: JSON deve ser uma lista de objetos'}
+
+
+def test_corpo_acima_do_limite_413(client, api, monkeypatch):
+    monkeypatch.setitem(api.app.config, 'MAX_CONTENT_LENGTH', 64)
+    resposta = importar(client, NDJSON)
+    assert resposta.status_code == 413
+    assert resposta.get_json() == {'error': 'Corpo da requisicao muito grande (maximo 64 bytes)'}
+    arquivo = (io.BytesIO(NDJSON), 'produtos.ndjson')
+    assert client.post('/api/produtos/bulk', data={'file': arquivo}).status_code == 413
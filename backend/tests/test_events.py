@@ -0,0 +1,22 @@
+"""Feed de eventos: quando o relay entre workers liga"""
+import pytest
+
+
+@pytest.mark.parametrize('streaming, workers, env, esperado', [
+    (False, 4, None, False),   # gunicorn sync: ninguem consome o feed
+    (True, 4, None, True),     # asgi.py com varios workers
+    (True, 1, None, False),    # um worker so: o barramento local basta
+    (False, 4, '1', True),     # EVENTS_RELAY forca
+    (True, 4, '0', False),
+])
+def test_relay_so_com_feed_para_servir(api, monkeypatch, streaming, workers, env, esperado):
+    monkeypatch.setitem(api.app.config, 'EVENTS_STREAMING', streaming)
+    monkeypatch.setattr(api, 'WORKERS', workers)
+    monkeypatch.setattr(api, 'EVENTS_RELAY', env)
+    assert api.events_relay() is esperado
+
+
+def test_sem_streaming_o_feed_responde_501(client, api, monkeypatch):
+    monkeypatch.setitem(api.app.config, 'EVENTS_STREAMING', False)
+    assert client.get('/api/events').status_code == 501
+    assert client.get('/api/health').get_json()['events'] == {'live': False}
@@ -0,0 +1,55 @@
+"""/api/stats/history - validacao de from/to/step"""
+import time
+
+import pytest
+
+
+def history(client, **query):
+    resposta = client.get('/api/stats/history', query_string=query)
+    return resposta.status_code, resposta.get_json()
+
+
+def test_padrao_ultimas_24h(client, api):
+    api.db.create_produto('A', 'X', 1)
+    api.db.snapshot_stats()
+    status, corpo = history(client)
+    assert status == 200
+    assert corpo['to'] - corpo['from'] == 86400
+    assert corpo['step'] == 'hour'
+    assert corpo['series']['categoria']['X'][-1]['valor'] == 1
+
+
+@pytest.mark.parametrize('inicio, fim, step', [
+    (0, 600, 'minute'),
+    (0, 86400, 'hour'),
+    (0, 86400 * 30, 'day'),
+])
+def test_step_escolhido_pelo_intervalo(client, inicio, fim, step):
+    assert history(client, **{'from': inicio, 'to': fim})[1]['step'] == step
+
+
+def test_datas_iso_sem_fuso_sao_utc(client):
+    status, corpo = history(client, **{'from': '2024-01-01', 'to': '2024-01-01T01:00:00-03:00',
+                                       'step': 'hour'})
+    assert status == 200
+    assert (corpo['from'], corpo['to'], corpo['step']) == (1704067200, 1704067200 + 4 * 3600, 'hour')
+
+
+@pytest.mark.parametrize('query, erro', [
+    ({'step': 'week'}, 'step deve ser um de: minute, hour, day'),
+    ({'from': '200', 'to': '100'}, 'from deve ser anterior a to'),
+    ({'from': 'ontem'}, 'from deve ser epoch ou data ISO 8601'),
+    ({'to': 'nan'}, 'to deve ser epoch ou data ISO 8601'),
+    ({'to': 'inf'}, 'to fora do intervalo permitido'),
+    ({'to': '1e30'}, 'to fora do intervalo permitido'),
+    ({'from': '-1', 'to': '100'}, 'from fora do intervalo permitido'),
+])
+def test_parametros_invalidos(client, query, erro):
+    assert history(client, **query) == (400, {'error': erro})
+
+
+def test_intervalo_sem_pontos(client):
+    fim = int(time.time())
+    status, corpo = history(client, **{'from': fim - 60, 'to': fim, 'step': 'minute'})
+    assert status == 200
+    assert corpo['series'] == {'categoria': {}, 'estoque': {}}
@@ -0,0 +1,35 @@
+"""Migracoes: DDL congelado e upgrade de bancos antigos"""
+import sqlite3
+
+import migrations
+import stats
+
+
+def test_banco_na_versao_3_chega_a_ultima_com_faixas_recalculadas(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'm.db'), isolation_level=None)
+    for migration in migrations.MIGRATIONS[:3]:
+        assert migrations._apply(conn, migration)
+    # Faixa da migracao 3: baixo = quantidade < 10
+    conn.executemany("INSERT INTO produtos (nome, categoria, quantidade) VALUES (?, ?, ?)",
+                     [('a', 'X', 0), ('b', 'X', 9), ('c', 'X', 10)])
+
+    assert migrations.migrate(conn, verbose=False) == list(range(4, migrations.LATEST + 1))
+    assert migrations.current_version(conn) == migrations.LATEST
+    assert not migrations.pending(conn)
+
+    # Triggers da 6: limite da categoria (padrao 9) em vez de quantidade < 10
+    conn.execute("INSERT INTO limites_reposicao (categoria, limite) VALUES ('Y', 20)")
+    conn.execute("INSERT INTO produtos (nome, categoria, quantidade) VALUES ('d', 'Y', 15)")
+    triggers = dict(conn.execute("SELECT bucket, total FROM stats_estoque").fetchall())
+    assert triggers == {'sem_estoque': 1, 'estoque_baixo': 2, 'estoque_normal': 1}
+    # ... e batem com o recalculo pelas regras atuais
+    stats.rebuild(conn)
+    assert dict(conn.execute("SELECT bucket, total FROM stats_estoque").fetchall()) == triggers
+    conn.close()
+
+
+def test_planos_das_queries_quentes(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'm.db'), isolation_level=None)
+    migrations.migrate(conn, verbose=False)
+    assert all(usa for usa, _ in migrations.check_plans(conn).values())
+    conn.close()
@@ -0,0 +1,105 @@
+"""Movimentos de estoque pela API: lote atomico e validacao"""
+import json
+
+import pytest
+
+from validators import MAX_QUANTIDADE
+
+
+def criar(client, nome, quantidade):
+    resposta = client.post('/api/produtos', json={
+        'nome': nome, 'categoria': 'Teste', 'quantidade': quantidade})
+    assert resposta.status_code == 201
+    return resposta.get_json()['id']
+
+
+def quantidade(client, produto_id):
+    itens = client.post('/api/produtos/batch-get', json={'ids': [produto_id]}).get_json()['items']
+    return itens[0]['quantidade']
+
+
+def test_lote_aplica_e_registra_no_historico(client):
+    a, b = criar(client, 'A', 10), criar(client, 'B', 5)
+    resposta = client.post('/api/produtos/movimentos', json={'movimentos': [
+        {'produto_id': a, 'delta': -3, 'motivo': 'venda'},
+        {'produto_id': b, 'delta': 7},
+    ]})
+    assert resposta.status_code == 200
+    assert resposta.get_json() == [{'produto_id': a, 'quantidade': 7},
+                                   {'produto_id': b, 'quantidade': 12}]
+
+    historico = client.get(f'/api/produtos/{a}/movimentos').get_json()
+    assert [(m['delta'], m['quantidade_final'], m['motivo']) for m in historico] == [(-3, 7, 'venda')]
+
+
+def test_movimento_unico(client):
+    a = criar(client, 'A', 1)
+    resposta = client.post(f'/api/produtos/{a}/estoque', json={'delta': 4})
+    assert resposta.get_json() == {'produto_id': a, 'quantidade': 5}
+
+
+def test_produto_inexistente_404(client):
+    resposta = client.post('/api/produtos/999/estoque', json={'delta': 1})
+    assert resposta.status_code == 404
+    assert resposta.get_json() == {'error': 'Produto nao encontrado', 'indice': 0,
+                                   'produto_id': 999}
+
+
+def test_estoque_insuficiente_desfaz_o_lote_todo(client):
+    a, b = criar(client, 'A', 10), criar(client, 'B', 2)
+    resposta = client.post('/api/produtos/movimentos', json=[
+        {'produto_id': a, 'delta': -5},
+        {'produto_id': b, 'delta': -3},
+    ])
+    assert resposta.status_code == 409
+    assert resposta.get_json()['indice'] == 1
+    # O primeiro movimento tambem foi desfeito
+    assert quantidade(client, a) == 10
+    assert client.get(f'/api/produtos/{a}/movimentos').get_json() == []
+
+
+@pytest.mark.parametrize('movimento, erro', [
+    ({'produto_id': 1, 'delta': 1.5}, 'delta deve ser um numero inteiro'),
+    ({'produto_id': 1, 'delta': '2'}, 'delta deve ser um numero inteiro'),
+    ({'produto_id': 1, 'delta': True}, 'delta deve ser um numero inteiro'),
+    ({'produto_id': 1, 'delta': 0}, 'delta nao pode ser zero'),
+    ({'produto_id': 1, 'delta': 2 ** 70}, 'delta fora do intervalo permitido'),
+    ({'produto_id': 2 ** 70, 'delta': 1}, 'produto_id fora do intervalo permitido'),
+    ({'produto_id': 'x', 'delta': 1}, 'produto_id deve ser um numero inteiro'),
+    ({'produto_id': '1', 'delta': 1}, 'produto_id deve ser um numero inteiro'),
+    ({'produto_id': 1.9, 'delta': 1}, 'produto_id deve ser um numero inteiro'),
+    ({'produto_id': True, 'delta': 1}, 'produto_id deve ser um numero inteiro'),
+    ({'delta': 1}, 'produto_id deve ser um numero inteiro'),
+    ({'produto_id': 1, 'delta': MAX_QUANTIDADE + 1}, 'delta fora do intervalo permitido'),
+    ({'produto_id': 1, 'delta': -MAX_QUANTIDADE - 1}, 'delta fora do intervalo permitido'),
+])
+def test_movimento_invalido_400(client, movimento, erro):
+    # json.dumps: o orjson do test client nao codifica inteiros > 64 bits
+    resposta = client.post('/api/produtos/movimentos', data=json.dumps([movimento]),
+                           content_type='application/json')
+    assert resposta.status_code == 400
+    assert resposta.get_json() == {'error': erro}
+
+
+def test_produto_id_da_rota_fora_do_intervalo(client):
+    resposta = client.post(f'/api/produtos/{2 ** 70}/estoque', json={'delta': 1})
+    assert resposta.get_json() == {'error': 'produto_id fora do intervalo permitido'}
+
+
+def test_produto_id_fora_do_intervalo_no_historico(client):
+    resposta = client.get(f'/api/produtos/{2 ** 70}/movimentos')
+    assert resposta.status_code == 400
+    assert resposta.get_json() == {'error': 'produto_id fora do intervalo permitido'}
+
+
+def test_estoque_acima_do_maximo_desfaz_o_lote(client):
+    a = criar(client, 'A', 10)
+    resposta = client.post('/api/produtos/movimentos', json=[
+        {'produto_id': a, 'delta': MAX_QUANTIDADE - 10},
+        {'produto_id': a, 'delta': 1},
+    ])
+    assert resposta.status_code == 409
+    assert resposta.get_json() == {'error': 'Estoque acima do maximo permitido', 'indice': 1,
+                                   'produto_id': a}
+    assert quantidade(client, a) == 10
+    assert client.get(f'/api/produtos/{a}/movimentos').get_json() == []
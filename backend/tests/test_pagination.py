@@ -0,0 +1,77 @@
+"""Listas paginadas por cursor (keyset), filtros e fields="""
+import pytest
+
+from pagination import MAX_LIMIT, encode_cursor
+
+
+@pytest.fixture
+def produtos(api):
+    rows = [(i, (f'P{i:02d}', 'Roupas' if i % 2 else 'Alimentos', i)) for i in range(1, 13)]
+    rows.append((13, ('P00', 'Zerados', 0)))
+    api.db.bulk_insert('produtos', rows)
+
+
+def paginas(client, query):
+    """Segue next_cursor ate o fim; retorna os nomes por pagina"""
+    resultado, cursor = [], None
+    while True:
+        corpo = client.get('/api/produtos', query_string=dict(query, **(
+            {'cursor': cursor} if cursor else {}))).get_json()
+        resultado.append([item['nome'] for item in corpo['items']])
+        cursor = corpo['next_cursor']
+        if cursor is None:
+            return resultado
+
+
+def test_cursor_percorre_tudo_sem_repetir(client, produtos):
+    todas = paginas(client, {'limit': 5})
+    assert [len(p) for p in todas] == [5, 5, 3]
+    nomes = [nome for pagina in todas for nome in pagina]
+    assert nomes == sorted(nomes) and len(set(nomes)) == 13
+
+
+def test_limites_do_limit(client, produtos):
+    assert len(client.get('/api/produtos?limit=1').get_json()['items']) == 1
+    corpo = client.get(f'/api/produtos?limit={MAX_LIMIT + 1000}').get_json()
+    assert len(corpo['items']) == 13 and corpo['next_cursor'] is None
+    for valor, erro in (('0', 'limit deve ser maior que zero'), ('-1', 'limit deve ser maior que zero'),
+                        ('abc', 'limit deve ser um numero')):
+        resposta = client.get(f'/api/produtos?limit={valor}')
+        assert (resposta.status_code, resposta.get_json()) == (400, {'error': erro})
+
+
+def test_cursor_invalido(client, produtos):
+    for cursor in ('lixo', encode_cursor(1, 'x')):
+        resposta = client.get('/api/produtos', query_string={'cursor': cursor})
+        assert resposta.status_code == 400
+        assert resposta.get_json() == {'error': 'Cursor invalido'}
+
+
+def test_filtros(client, produtos):
+    def nomes(query):
+        return [p['nome'] for p in client.get('/api/produtos', query_string=query).get_json()['items']]
+
+    assert nomes({'categoria': 'Roupas', 'limit': 2}) == ['P01', 'P03']
+    assert nomes({'qtd_min': 4, 'qtd_max': 6}) == ['P04', 'P05', 'P06']
+    assert nomes({'estoque': 'sem_estoque'}) == ['P00']
+    assert nomes({'estoque': 'estoque_baixo', 'categoria': 'Alimentos'}) == ['P02', 'P04', 'P06', 'P08']
+    assert nomes({'estoque': 'estoque_normal'}) == ['P10', 'P11', 'P12']
+
+    assert client.get('/api/produtos?estoque=muito').status_code == 400
+    assert client.get('/api/produtos?qtd_min=x').get_json() == {'error': 'qtd_min deve ser um numero'}
+
+
+@pytest.mark.parametrize('nome', ['qtd_min', 'qtd_max'])
+def test_filtro_fora_do_intervalo(client, nome):
+    resposta = client.get('/api/produtos', query_string={nome: 2 ** 70})
+    assert resposta.status_code == 400
+    assert resposta.get_json() == {'error': f'{nome} fora do intervalo permitido'}
+
+
+def test_fields_e_cargo(client, api):
+    api.db.bulk_insert('funcionarios', [(1, ('Ana', 'ana@x.com', 'Gerente')),
+                                        (2, ('Bia', 'bia@x.com', 'Caixa'))])
+    corpo = client.get('/api/funcionarios?cargo=Caixa&fields=email').get_json()
+    assert corpo == {'items': [{'email': 'bia@x.com'}], 'next_cursor': None}
+    resposta = client.get('/api/funcionarios?fields=email,senha')
+    assert resposta.get_json() == {'error': 'Campos invalidos: senha'}
@@ -0,0 +1,105 @@
+"""ConnectionPool: limite, timeout e descarte de conexoes quebradas"""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from pool import ConnectionPool, PoolTimeout
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=1, timeout=5)
+    yield pool
+    pool.close()
+
+
+def esperar_conexao(pool):
+    """Thread bloqueada no acquire; resultado em resultado['conn']/['erro']"""
+    resultado = {}
+
+    def pegar():
+        t0 = time.monotonic()
+        try:
+            resultado['conn'] = pool.acquire()
+        except Exception as e:
+            resultado['erro'] = e
+        resultado['segundos'] = time.monotonic() - t0
+
+    thread = threading.Thread(target=pegar)
+    thread.start()
+    # Da tempo de a thread entrar na espera
+    thread.join(0.2)
+    assert thread.is_alive()
+    return thread, resultado
+
+
+def test_timeout_com_pool_cheio(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=1, timeout=0.1)
+    conn = pool.acquire()
+    t0 = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert 0.1 <= time.monotonic() - t0 < 2
+    pool.release(conn)
+    assert pool.acquire() is conn
+    pool.close()
+
+
+def test_devolucao_acorda_quem_espera(pool):
+    conn = pool.acquire()
+    thread, resultado = esperar_conexao(pool)
+    pool.release(conn)
+    thread.join()
+    assert resultado['conn'] is conn
+    assert resultado['segundos'] < 2
+
+
+def test_descarte_libera_a_vaga_na_hora(pool):
+    conn = pool.acquire()
+    thread, resultado = esperar_conexao(pool)
+    pool.release(conn, broken=True)
+    thread.join()
+    # Conexao nova, sem esperar o DB_POOL_TIMEOUT
+    assert resultado['conn'] is not conn
+    assert resultado['segundos'] < 2
+    assert resultado['conn'].execute("SELECT 1").fetchone() == (1,)
+
+
+def test_close_acorda_quem_espera(pool):
+    pool.acquire()
+    thread, resultado = esperar_conexao(pool)
+    pool.close()
+    thread.join()
+    assert isinstance(resultado['erro'], RuntimeError)
+    assert resultado['segundos'] < 2
+
+
+def test_erro_do_banco_descarta_integridade_nao(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER UNIQUE)")
+        conn.execute("INSERT INTO t VALUES (1)")
+        conn.commit()
+
+    with pytest.raises(sqlite3.IntegrityError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+    with pool.connection() as mesma:
+        assert mesma is conn
+
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as conn:
+            conn.execute("SELECT * FROM nao_existe")
+    with pool.connection() as nova:
+        assert nova is not conn
+    assert pool.health_check() == {'size': 1, 'idle': 1, 'max_size': 1}
+
+
+def test_falha_ao_conectar_nao_gasta_vaga(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'nao' / 'existe.db'), max_size=1, timeout=0.1)
+    for _ in range(3):
+        # Com a vaga perdida o segundo acquire seria PoolTimeout
+        with pytest.raises(sqlite3.OperationalError):
+            pool.acquire()
+    pool.close()
@@ -0,0 +1,138 @@
+"""Rate limit e admissao: unidades e pelo test client do Flask"""
+import threading
+
+import pytest
+
+import ratelimit
+from ratelimit import AdmissionGate, MemoryStore, RateLimiter, SQLiteStore
+
+
+# RateLimiter
+
+def test_bucket_esgota_e_informa_a_espera():
+    limiter = RateLimiter(rate=1, burst=10, store=MemoryStore(), costs={'GET /x': 4})
+    assert limiter.check('a', 'GET /x') is None
+    assert limiter.check('a', 'GET /x') is None
+    # Sobram ~2 tokens: faltam ~2 segundos para os 4 da rota
+    assert limiter.check('a', 'GET /x') == pytest.approx(2, abs=0.1)
+    assert limiter.limited == 1
+    # Outro cliente e outra rota tem buckets proprios
+    assert limiter.check('b', 'GET /x') is None
+    assert limiter.check('a', 'GET /y') is None
+
+
+def test_custo_maior_que_o_bucket_ainda_passa():
+    limiter = RateLimiter(rate=1, burst=3, store=MemoryStore(), costs={'GET /x': 20})
+    assert limiter.check('a', 'GET /x') is None
+
+
+def test_store_sqlite_compartilhado(tmp_path):
+    path = str(tmp_path / 'rl.db')
+    a = RateLimiter(rate=0.01, burst=5, store=SQLiteStore(path), costs={})
+    b = RateLimiter(rate=0.01, burst=5, store=SQLiteStore(path), costs={})
+    for _ in range(5):
+        assert a.check('ip', 'GET /x') is None
+    # O segundo "worker" ve o mesmo bucket vazio
+    assert b.check('ip', 'GET /x') is not None
+    a.store.close()
+    b.store.close()
+
+
+def test_memory_store_despeja_o_mais_antigo():
+    store = MemoryStore(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        store.take(key, 1, 1, 5)
+    assert list(store._buckets) == ['b', 'c']
+
+
+# AdmissionGate
+
+def test_gate_descarta_com_fila_cheia():
+    gate = AdmissionGate(max_concurrent=1, max_queue=0, max_wait=1)
+    assert gate.acquire()
+    assert not gate.acquire()
+    assert gate.shed == 1
+    gate.release()
+    assert gate.acquire()
+
+
+def test_gate_espera_por_uma_vaga():
+    gate = AdmissionGate(max_concurrent=1, max_queue=1, max_wait=5)
+    assert gate.acquire()
+    resultado = []
+    espera = threading.Thread(target=lambda: resultado.append(gate.acquire()))
+    espera.start()
+    while gate.waiting == 0:
+        pass
+    gate.release()
+    espera.join()
+    assert resultado == [True]
+    assert gate.active == 1
+
+
+def test_gate_espera_estourada():
+    gate = AdmissionGate(max_concurrent=1, max_queue=1, max_wait=0.05)
+    assert gate.acquire()
+    assert not gate.acquire()
+    assert (gate.shed, gate.waiting) == (1, 0)
+
+
+# Pelo app
+
+@pytest.fixture
+def gate(monkeypatch):
+    gate = AdmissionGate(max_concurrent=2, max_queue=0, max_wait=0)
+    monkeypatch.setattr(ratelimit, 'gate', gate)
+    return gate
+
+
+def test_limiter_desligado_por_padrao():
+    assert not RateLimiter(store=MemoryStore()).enabled
+
+
+def test_rota_responde_429_com_retry_after(client, monkeypatch):
+    monkeypatch.setattr(ratelimit, 'limiter',
+                        RateLimiter(rate=1, burst=5, store=MemoryStore()))
+    assert client.get('/api/produtos').status_code == 200
+    response = client.get('/api/produtos')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '5'
+    # Rotas isentas nao gastam tokens
+    assert client.get('/api/health').status_code == 200
+
+
+def test_gate_nao_vaza_vagas_sem_close(client, gate):
+    # O test client nao fecha as respostas: a vaga tem que voltar mesmo assim
+    client.post('/api/produtos', json={'nome': 'A', 'categoria': 'X', 'quantidade': 1})
+    for _ in range(20):
+        assert client.get('/api/produtos').status_code == 200
+        assert client.get('/api/stats').status_code == 200
+    assert client.delete('/api/produtos/999').status_code == 404
+    assert client.get('/api/nada').status_code == 404
+    assert gate.active == 0
+    assert gate.shed == 0
+
+
+def test_gate_segura_a_vaga_ate_o_fim_do_stream(api, client, gate, monkeypatch):
+    monkeypatch.setattr(api, 'STREAM_THRESHOLD', 0)
+    client.post('/api/produtos', json={'nome': 'A', 'categoria': 'X', 'quantidade': 1})
+
+    # Corpo lido ate o fim
+    response = client.get('/api/produtos')
+    assert response.is_streamed
+    assert response.json[0]['nome'] == 'A'
+    assert gate.active == 0
+
+    # Cliente desconectou antes do fim: o close do servidor devolve a vaga
+    response = client.get('/api/produtos/export')
+    assert gate.active == 1
+    response.close()
+    assert gate.active == 0
+
+
+def test_gate_cheio_responde_503(client, gate):
+    assert gate.acquire() and gate.acquire()
+    response = client.get('/api/stats')
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
+    assert client.get('/api/health').status_code == 200
@@ -0,0 +1,30 @@
+"""Roteamento de leituras: replica atrasada fora das respostas cacheadas"""
+import pytest
+
+from database import Database, HEAVY_READS, REPLICA_READS
+
+
+@pytest.fixture
+def replica_db(tmp_path, monkeypatch):
+    monkeypatch.setenv('DB_REPLICA_REFRESH', '3600')
+    database = Database(str(tmp_path / 'r.db'), read_mode='replica')
+    yield database
+    database.close()
+
+
+def test_rotas_padrao_por_modo(tmp_path, replica_db):
+    assert replica_db.read_routes == frozenset(REPLICA_READS)
+    ro = Database(str(tmp_path / 'ro.db'), read_mode='ro')
+    assert ro.read_routes == frozenset(HEAVY_READS)
+    ro.close()
+
+
+def test_lista_cacheada_ve_a_propria_escrita_com_replica(api, client, replica_db, monkeypatch):
+    monkeypatch.setattr(api.db, 'get', lambda: replica_db)
+    assert client.get('/api/produtos').get_json() == []
+    client.post('/api/produtos', json={'nome': 'Novo', 'categoria': 'X', 'quantidade': 3})
+
+    # A replica ainda nao tem o produto; a lista e os contadores vem do primario
+    assert replica_db.replica.pool is not None
+    assert [p['nome'] for p in client.get('/api/produtos').get_json()] == ['Novo']
+    assert client.get('/api/stats').get_json()['total_produtos'] == 1
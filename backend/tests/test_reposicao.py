@@ -0,0 +1,80 @@
+"""Limites de reposicao por categoria e /api/produtos/low-stock"""
+import pytest
+
+from stats import DEFAULT_LIMITE, MAX_LIMITE
+
+
+@pytest.fixture
+def produtos(api):
+    api.db.bulk_insert('produtos', [
+        (1, ('Arroz', 'Alimentos', 2)),      # 2/9
+        (2, ('Feijao', 'Alimentos', 9)),     # 9/9
+        (3, ('Camisa', 'Roupas', 15)),       # acima do padrao
+        (4, ('Calca', 'Roupas', 0)),         # 0/9
+        (5, ('Mouse', 'Eletronicos', 40)),
+    ])
+
+
+def low_stock(client, **query):
+    return client.get('/api/produtos/low-stock', query_string=query).get_json()
+
+
+def test_padrao_mais_urgentes_primeiro(client, produtos):
+    corpo = low_stock(client)
+    assert [(i['nome'], i['limite']) for i in corpo['items']] == [
+        ('Calca', DEFAULT_LIMITE), ('Arroz', DEFAULT_LIMITE), ('Feijao', DEFAULT_LIMITE)]
+    assert corpo['next_cursor'] is None
+
+
+def test_limite_da_categoria_muda_lista_e_contadores(client, produtos):
+    resposta = client.put('/api/limites/Roupas', json={'limite': 20})
+    assert resposta.get_json() == {'categoria': 'Roupas', 'limite': 20}
+    client.put('/api/limites/Alimentos', json={'limite': 1})
+
+    assert [i['nome'] for i in low_stock(client)['items']] == ['Calca', 'Camisa']
+    assert low_stock(client, categoria='Alimentos')['items'] == []
+
+    limites = client.get('/api/limites').get_json()
+    assert limites['padrao'] == DEFAULT_LIMITE
+    assert [(l['categoria'], l['limite']) for l in limites['limites']] == [
+        ('Alimentos', 1), ('Roupas', 20)]
+
+    stats = client.get('/api/stats').get_json()
+    assert (stats['produtos_sem_estoque'], stats['produtos_estoque_baixo'],
+            stats['produtos_estoque_normal']) == (1, 1, 3)
+
+
+def test_paginacao_por_urgencia(client, produtos):
+    client.put('/api/limites/Eletronicos', json={'limite': 80})
+    vistos, cursor = [], None
+    while True:
+        corpo = low_stock(client, limit=2, **({'cursor': cursor} if cursor else {}))
+        assert len(corpo['items']) <= 2
+        vistos += [i['nome'] for i in corpo['items']]
+        cursor = corpo['next_cursor']
+        if not cursor:
+            break
+    assert vistos == ['Calca', 'Arroz', 'Mouse', 'Feijao']
+    assert low_stock(client, cursor='lixo') == {'error': 'Cursor invalido'}
+
+
+@pytest.mark.parametrize('corpo, erro', [
+    ({}, 'Campo limite e obrigatorio'),
+    ({'limite': 'muito'}, 'limite deve ser um numero inteiro'),
+    ({'limite': '5'}, 'limite deve ser um numero inteiro'),
+    ({'limite': 2.7}, 'limite deve ser um numero inteiro'),
+    ({'limite': True}, 'limite deve ser um numero inteiro'),
+    ({'limite': None}, 'limite deve ser um numero inteiro'),
+    ({'limite': -1}, f'limite deve estar entre 0 e {MAX_LIMITE}'),
+    ({'limite': MAX_LIMITE + 1}, f'limite deve estar entre 0 e {MAX_LIMITE}'),
+    ({'limite': 2 ** 63}, f'limite deve estar entre 0 e {MAX_LIMITE}'),
+])
+def test_limite_invalido(client, corpo, erro):
+    resposta = client.put('/api/limites/Roupas', json=corpo)
+    assert (resposta.status_code, resposta.get_json()) == (400, {'error': erro})
+
+
+def test_categoria_em_branco(client):
+    resposta = client.put('/api/limites/%20', json={'limite': 5})
+    assert (resposta.status_code, resposta.get_json()) == (400, {'error': 'Categoria eh obrigatoria'})
+    assert client.get('/api/limites').get_json()['limites'] == []
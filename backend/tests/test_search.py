@@ -0,0 +1,59 @@
+"""Busca por prefixo (FTS5) pela API"""
+import pytest
+
+
+@pytest.fixture
+def dados(api):
+    if not api.db.fts_enabled:
+        pytest.skip('SQLite sem FTS5')
+    api.db.bulk_insert('produtos', [(1, ('Café Especial', 'Alimentos', 3)),
+                                    (2, ('Cafeteira', 'Eletrônicos', 1)),
+                                    (3, ('Notebook', 'Eletrônicos', 2))])
+    api.db.bulk_insert('funcionarios', [(1, ('Joao Silva', 'joao@empresa.com', 'Vendedor'))])
+
+
+def nomes(client, **query):
+    corpo = client.get('/api/search', query_string=query).get_json()
+    return {t: [r['nome'] for r in corpo[t]] for t in ('produtos', 'funcionarios') if t in corpo}
+
+
+def test_prefixo_sem_acento_nas_duas_tabelas(client, dados):
+    resultado = nomes(client, q='cafe')
+    assert sorted(resultado['produtos']) == ['Cafeteira', 'Café Especial']
+    assert resultado['funcionarios'] == []
+    assert sorted(nomes(client, q='eletro', tipo='produtos')['produtos']) == ['Cafeteira', 'Notebook']
+    assert nomes(client, q='silva vend', tipo='funcionarios') == {'funcionarios': ['Joao Silva']}
+
+
+def test_busca_acompanha_as_escritas(client, dados):
+    produto_id = client.post('/api/produtos/batch-get', json={'ids': [3]}).get_json()['items'][0]['id']
+    client.put(f'/api/produtos/{produto_id}', json={'nome': 'Laptop', 'categoria': 'Eletrônicos'})
+    assert nomes(client, q='note', tipo='produtos') == {'produtos': []}
+    assert nomes(client, q='lap', tipo='produtos') == {'produtos': ['Laptop']}
+
+
+def test_paginacao_e_operadores_do_usuario(client, dados):
+    primeira = nomes(client, q='caf', tipo='produtos', limit=1)['produtos']
+    segunda = nomes(client, q='caf', tipo='produtos', limit=1, offset=1)['produtos']
+    assert sorted(primeira + segunda) == ['Cafeteira', 'Café Especial']
+    # Operadores do FTS5 viram texto comum
+    assert nomes(client, q='cafe AND NEAR(*', tipo='produtos') == {'produtos': []}
+    assert nomes(client, q='***', tipo='produtos') == {'produtos': []}
+
+
+@pytest.mark.parametrize('query, erro', [
+    ({}, 'Parametro q eh obrigatorio'),
+    ({'q': 'a', 'tipo': 'pedidos'}, 'tipo deve ser produtos ou funcionarios'),
+    ({'q': 'a', 'offset': -1}, 'offset nao pode ser negativo'),
+    ({'q': 'a', 'offset': 'x'}, 'offset deve ser um numero'),
+    ({'q': 'a', 'offset': 2 ** 70}, 'offset fora do intervalo permitido'),
+    ({'q': 'a', 'offset': -2 ** 70}, 'offset fora do intervalo permitido'),
+])
+def test_parametros_invalidos(client, dados, query, erro):
+    resposta = client.get('/api/search', query_string=query)
+    assert (resposta.status_code, resposta.get_json()) == (400, {'error': erro})
+
+
+def test_offset_alem_do_fim(client, dados):
+    corpo = client.get('/api/search', query_string={'q': 'caf', 'offset': 2 ** 62}).get_json()
+    assert (corpo['produtos'], corpo['funcionarios']) == ([], [])
@@ -0,0 +1,47 @@
+"""Rows: resultado compacto serializado sem dict por linha"""
+import json
+
+from serialization import Rows, dumps, dumps_rows, stream_array
+
+COLUMNS = ('id', 'nome', 'quantidade')
+TUPLAS = [(i, f'item {i}', i * 2) for i in range(2500)]
+
+
+def test_dumps_rows_igual_a_lista_de_dicts():
+    esperado = [dict(zip(COLUMNS, t)) for t in TUPLAS]
+    assert json.loads(dumps_rows(Rows(COLUMNS, TUPLAS), batch_size=1000)) == esperado
+    assert dumps_rows(Rows(COLUMNS, [])) == b'[]'
+    assert dumps(Rows(COLUMNS, TUPLAS[:2])) == dumps(esperado[:2])
+
+
+def test_rows_le_por_nome():
+    rows = Rows(COLUMNS, TUPLAS[:3])
+    assert len(rows) == 3
+    assert rows[1]['nome'] == 'item 1'
+    assert [r['id'] for r in rows] == [0, 1, 2]
+
+
+def test_stream_array_pula_lotes_vazios():
+    corpo = b''.join(stream_array(COLUMNS, [[], TUPLAS[:1], [], TUPLAS[1:2]]))
+    assert json.loads(corpo) == [dict(zip(COLUMNS, t)) for t in TUPLAS[:2]]
+
+
+def test_lista_completa_pela_api(client):
+    for nome in ('b', 'a'):
+        client.post('/api/produtos', json={'nome': nome, 'categoria': 'X', 'quantidade': 1})
+    itens = client.get('/api/produtos').get_json()
+    assert [p['nome'] for p in itens] == ['a', 'b']
+
+
+def test_streaming_e_jsonify_no_mesmo_formato(client, api, monkeypatch):
+    api.db.create_produto('Arroz', 'Alimentos', 3)
+    api.db.create_funcionario('Ana', 'ana@x.com', None)
+    for rota in ('/api/produtos', '/api/funcionarios'):
+        api.response_cache.clear()
+        monkeypatch.setattr(api, 'STREAM_THRESHOLD', 5000)
+        pequena = client.get(rota)
+        api.response_cache.clear()
+        monkeypatch.setattr(api, 'STREAM_THRESHOLD', 0)
+        grande = client.get(rota)
+        assert 'Content-Length' in pequena.headers and 'Content-Length' not in grande.headers
+        assert grande.get_data() == pequena.get_data()
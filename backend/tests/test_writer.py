@@ -0,0 +1,87 @@
+"""Group commit: um lote, um commit, erros por item"""
+import sqlite3
+import threading
+
+import pytest
+
+import errors
+import writer as writer_module
+from database import Database
+
+INSERT = "INSERT INTO produtos (nome, categoria, quantidade) VALUES (?, ?, ?)"
+
+
+@pytest.fixture
+def db(tmp_path):
+    # Janela larga: tudo que o teste enfileira cai no mesmo lote
+    database = Database(str(tmp_path / 'writer.db'), group_commit_ms=200)
+    yield database
+    database.close()
+
+
+def test_conflito_volta_so_o_item(db):
+    futures = [db.writer.submit(INSERT, params) for params in [
+        ('A', 'X', 1), ('B', 'X', 2), ('A', 'X', 3), ('C', 'X', 4)]]
+
+    ids = [f.result() if f.exception() is None else f.exception() for f in futures]
+    assert isinstance(ids[2], errors.UniqueConflict)
+    assert ids[2].table == 'produtos'
+    assert set(ids[2].columns) == {'nome', 'categoria'}
+
+    assert db.writer.stats()['batches'] == 1
+    nomes = {row['nome']: row['quantidade'] for row in db.get_produtos()}
+    assert nomes == {'A': 1, 'B': 2, 'C': 4}
+    assert db.count_rows('produtos') == 3
+
+
+def test_outro_erro_do_sqlite_tambem_volta_so_o_item(db):
+    futures = [db.writer.submit(INSERT, ('A', 'X', 1)),
+               db.writer.submit("INSERT INTO nao_existe (x) VALUES (?)", (1,)),
+               db.writer.submit(INSERT, ('B', 'X', 2))]
+
+    assert futures[0].result() and futures[2].result()
+    assert isinstance(futures[1].exception(), sqlite3.OperationalError)
+    assert db.writer.stats()['batches'] == 1
+    assert db.count_rows('produtos') == 2
+
+
+def test_close_no_meio_do_submit_nao_deixa_future_pendente(db):
+    """submit ja passou da checagem de fechado quando o close comeca"""
+    fila = db.writer._queue
+    dentro, liberar = threading.Event(), threading.Event()
+    put_original = fila.put
+
+    def put_lento(item):
+        if item is not writer_module._STOP:
+            dentro.set()
+            liberar.wait(5)
+        put_original(item)
+
+    fila.put = put_lento
+    futures = []
+    submit = threading.Thread(target=lambda: futures.append(db.writer.submit(INSERT, ('A', 'X', 1))))
+    submit.start()
+    dentro.wait(5)
+    close = threading.Thread(target=db.writer.close)
+    close.start()
+    close.join(0.2)
+    liberar.set()
+    submit.join()
+    close.join()
+
+    assert futures[0].result(timeout=2)
+    assert db.count_rows('produtos') == 1
+
+
+def test_metodos_do_database_levantam_o_conflito(db):
+    db.create_produto('A', 'X', 1)
+    with pytest.raises(errors.UniqueConflict):
+        db.create_produto('A', 'X', 2)
+    assert db.create_produto('B', 'X', 2)
+    assert db.count_rows('produtos') == 2
+
+
+def test_fechado_recusa_escritas(db):
+    db.writer.close()
+    with pytest.raises(RuntimeError):
+        db.writer.submit(INSERT, ('A', 'X', 1))
@@ -0,0 +1,205 @@
+"""Serie historica do estoque com rollups pre-agregados
+
+Cada snapshot le os contadores (stats_categoria / stats_estoque, O(1)) e
+acumula o valor nos tres niveis - minuto, hora e dia - de uma vez. Um
+grafico de 1 ano le so o nivel diario (~365 pontos por serie) em vez de
+todos os snapshots.
+
+    python timeseries.py snapshot              # um snapshot (cron)
+    python timeseries.py snapshot --loop 60    # roda sem parar
+    python timeseries.py prune                 # aplica a retencao
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+# nivel -> (segundos por ponto, retencao em segundos)
+LEVELS = {
+    'minute': (60, int(os.environ.get('HISTORY_MINUTE_DAYS', 2)) * 86400),
+    'hour': (3600, int(os.environ.get('HISTORY_HOUR_DAYS', 90)) * 86400),
+    'day': (86400, int(os.environ.get('HISTORY_DAY_DAYS', 1825)) * 86400),
+}
+
+# Pontos maximos por serie quando step nao e informado
+MAX_POINTS = 500
+
+# Valores atuais de cada serie
+CURRENT_SQL = """
+    SELECT 'categoria', categoria, total FROM stats_categoria
+    UNION ALL
+    SELECT 'estoque', bucket, total FROM stats_estoque
+"""
+
+UPSERT_SQL = """
+    INSERT INTO serie_estoque (nivel, ts, tipo, chave, ultimo, minimo, maximo, soma, amostras)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+    ON CONFLICT (nivel, ts, tipo, chave) DO UPDATE SET
+        ultimo = excluded.ultimo,
+        minimo = MIN(minimo, excluded.minimo),
+        maximo = MAX(maximo, excluded.maximo),
+        soma = soma + excluded.soma,
+        amostras = amostras + 1
+"""
+
+PRUNE_SQL = "DELETE FROM serie_estoque WHERE nivel = ? AND ts < ?"
+
+HISTORY_SQL = """
+    SELECT ts, tipo, chave, ultimo, minimo, maximo, soma, amostras
+    FROM serie_estoque
+    WHERE nivel = ? AND ts >= ? AND ts <= ?
+    ORDER BY ts
+"""
+
+
+def _bucket(ts, level):
+    step = LEVELS[level][0]
+    return ts - ts % step
+
+
+def minute_of(now):
+    return _bucket(now, 'minute')
+
+
+def snapshot_rows(now, valores):
+    """(tipo, chave, total) atuais -> parametros do UPSERT_SQL nos tres niveis"""
+    return [(level, _bucket(now, level), tipo, chave, total, total, total, total)
+            for level in LEVELS for tipo, chave, total in valores]
+
+
+def cutoffs(now):
+    """(nivel, ts) - pontos anteriores a ts estao fora da retencao"""
+    return [(level, now - retencao) for level, (_, retencao) in LEVELS.items()]
+
+
+def snapshot(conn, now=None):
+    """Grava os contadores atuais nos tres niveis
+
+    Idempotente por minuto: se outro worker/cron ja gravou este minuto,
+    nao faz nada (retorna False). Commit proprio.
+    """
+    now = int(now if now is not None else time.time())
+    minuto = minute_of(now)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        ja_gravado = conn.execute(
+            "SELECT 1 FROM serie_estoque WHERE nivel = 'minute' AND ts = ? LIMIT 1", (minuto,)
+        ).fetchone()
+        if ja_gravado:
+            conn.rollback()
+            return False
+
+        valores = conn.execute(CURRENT_SQL).fetchall()
+        conn.executemany(UPSERT_SQL, snapshot_rows(now, valores))
+        prune(conn, now)
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def prune(conn, now=None):
+    """Remove pontos alem da retencao de cada nivel (faixa da PK)"""
+    now = int(now if now is not None else time.time())
+    removidos = 0
+    for level, limite in cutoffs(now):
+        cursor = conn.execute(PRUNE_SQL, (level, limite))
+        removidos += cursor.rowcount
+    return removidos
+
+
+def pick_level(inicio, fim):
+    """Nivel mais fino com no maximo MAX_POINTS pontos no intervalo"""
+    for level, (step, _) in LEVELS.items():
+        if (fim - inicio) / step <= MAX_POINTS:
+            return level
+    return 'day'
+
+
+def resolve_level(inicio, fim, step=None):
+    """step pedido (validado) ou o nivel escolhido pelo intervalo"""
+    if step is None:
+        return pick_level(inicio, fim)
+    if step not in LEVELS:
+        raise ValueError(f"step deve ser um de: {', '.join(LEVELS)}")
+    return step
+
+
+def history_params(inicio, fim, level):
+    return (level, _bucket(inicio, level), fim)
+
+
+def history(conn, inicio, fim, level):
+    """{tipo: {chave: [pontos]}} de um unico nivel"""
+    return series_from(conn.execute(HISTORY_SQL, history_params(inicio, fim, level)))
+
+
+def series_from(rows):
+    """Linhas do HISTORY_SQL -> series (mesmo formato em qualquer backend)"""
+    series = {'categoria': {}, 'estoque': {}}
+    for ts, tipo, chave, ultimo, minimo, maximo, soma, amostras in rows:
+        series.setdefault(tipo, {}).setdefault(chave, []).append({
+            'ts': ts,
+            'valor': ultimo,
+            'media': round(soma / amostras, 2),
+            'min': minimo,
+            'max': maximo,
+        })
+    return series
+
+
+class Snapshotter:
+    """Thread que grava um snapshot a cada N segundos (db.snapshot_stats)"""
+
+    def __init__(self, db, interval):
+        self.db = db
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stats-snapshot', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.db.snapshot_stats()
+            except self.db.driver_errors:
+                # Lock ocupado etc - tenta no proximo intervalo
+                pass
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serie historica do estoque')
+    parser.add_argument('--db', default=os.environ.get('DATABASE_FILE', 'fabrismart.db'))
+    sub = parser.add_subparsers(dest='comando', required=True)
+    snap = sub.add_parser('snapshot')
+    snap.add_argument('--loop', type=float, help='Repete a cada N segundos')
+    sub.add_parser('prune')
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    try:
+        if args.comando == 'prune':
+            removidos = prune(conn)
+            conn.commit()
+            print(f"Removidos {removidos} pontos")
+            return 0
+
+        while True:
+            gravado = snapshot(conn)
+            print(f"Snapshot {'gravado' if gravado else 'ja existia neste minuto'}")
+            if not args.loop:
+                return 0
+            time.sleep(args.loop)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
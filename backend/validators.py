@@ -0,0 +1,50 @@
+"""Validacao e limpeza de dados de entrada"""
+import re
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# INTEGER do SQLite / BIGINT do PostgreSQL (64 bits com sinal)
+INT_MIN = -2 ** 63
+INT_MAX = 2 ** 63 - 1
+
+# quantidade/delta sao INTEGER de 32 bits no PostgreSQL
+MAX_QUANTIDADE = 2 ** 31 - 1
+
+def validate_email(email):
+    """Validacao de email - regex simples mas funcional"""
+    if not email:
+        return False
+    
+    # Pattern basico de email
+    return EMAIL_PATTERN.match(email) is not None
+
+def clean_string(text):
+    """Limpa string de entrada - experiencia com limpeza de dados"""
+    if not text:
+        return ""
+    # Remove espacos e limita tamanho
+    cleaned = text.strip()
+    return cleaned[:200]  # Limita tamanho para seguranca
+
+def is_integer(valor):
+    """Inteiro de verdade vindo do JSON (True/False nao contam)"""
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+def in_int_range(valor):
+    """Cabe numa coluna INTEGER - fora disso o driver falha com OverflowError"""
+    return INT_MIN <= valor <= INT_MAX
+
+def parse_quantidade(valor):
+    """Quantidade de estoque (create, update e import): 0..MAX_QUANTIDADE
+
+    Aceita texto (CSV) - levanta ValueError com a mensagem para o cliente.
+    """
+    try:
+        quantidade = int(valor)
+    except (ValueError, TypeError, OverflowError):
+        raise ValueError('Quantidade deve ser um numero')
+    if quantidade < 0:
+        raise ValueError('Quantidade nao pode ser negativa')
+    if quantidade > MAX_QUANTIDADE:
+        raise ValueError('Quantidade acima do maximo permitido')
+    return quantidade
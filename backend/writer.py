@@ -0,0 +1,143 @@
+"""Group commit: escritas de varias threads numa transacao so
+
+Com DB_GROUP_COMMIT_MS > 0 os create/update/delete do Database entram
+numa fila. Um unico thread escritor junta o que chegar dentro da janela
+(ou ate DB_GROUP_COMMIT_BATCH itens), aplica tudo num BEGIN IMMEDIATE e
+faz um commit so. Cada escrita roda num SAVEPOINT proprio: um erro do
+SQLite (UNIQUE violado, SQL invalido...) volta so aquele item e vai para
+o future de quem pediu.
+
+Os workers deixam de disputar o lock de escrita entre si (so o escritor
+o pega), e o fsync do commit e dividido pelo lote.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import errors
+
+# Fim da fila
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Thread escritor dedicado com commits em lote"""
+
+    def __init__(self, pool, window_ms=None, max_batch=None):
+        self.pool = pool
+        if window_ms is None:
+            window_ms = float(os.environ.get('DB_GROUP_COMMIT_MS', 2))
+        self.window = window_ms / 1000
+        self.max_batch = max_batch or int(os.environ.get('DB_GROUP_COMMIT_BATCH', 64))
+        self._queue = queue.Queue()
+        # submit/close: nada entra na fila depois do _STOP
+        self._lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.writes = 0
+        self._thread = threading.Thread(target=self._run, name='db-group-commit', daemon=True)
+        self._thread.start()
+
+    def submit(self, query, params=()):
+        """Enfileira a escrita; o future recebe o lastrowid ou a excecao"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Writer fechado')
+            self._queue.put((query, params, future))
+        return future
+
+    def execute(self, query, params=()):
+        """submit() + espera o commit do lote"""
+        return self.submit(query, params).result()
+
+    def _collect(self):
+        """Primeiro item (bloqueia) + o que chegar dentro da janela"""
+        item = self._queue.get()
+        if item is _STOP:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.window
+
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Aplica o lote atual e para na proxima volta
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            self._apply(batch)
+
+    def _apply(self, batch):
+        resultados = []
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for query, params, future in batch:
+                        conn.execute("SAVEPOINT item")
+                        try:
+                            cursor = conn.execute(query, params)
+                            resultados.append((future, cursor.lastrowid, None))
+                            conn.execute("RELEASE item")
+                        except sqlite3.Error as e:
+                            conn.execute("ROLLBACK TO item")
+                            conn.execute("RELEASE item")
+                            resultados.append((future, None, errors.from_sqlite(e)))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        except Exception as e:
+            # Falha do lote (lock, disco...) - todos recebem o erro
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.writes += len(batch)
+        for future, valor, erro in resultados:
+            if erro is None:
+                future.set_result(valor)
+            else:
+                future.set_exception(erro)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'writes': self.writes,
+            'avg_batch': round(self.writes / self.batches, 2) if self.batches else 0.0,
+            'queued': self._queue.qsize(),
+            'window_ms': self.window * 1000,
+        }
+
+    def close(self):
+        """Aplica o que ja esta na fila e encerra o thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+        # Nada deveria sobrar; se sobrar, ninguem fica esperando para sempre
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                item[2].set_exception(RuntimeError('Writer fechado'))
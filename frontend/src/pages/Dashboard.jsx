@@ -9,10 +9,44 @@ export default function Dashboard() {
 
   useEffect(() => {
     carregarDados();
+
+    // Feed de mudancas: contadores chegam no evento, graficos recarregam
+    // /api/stats (ETag) no maximo a cada 2s. So abre se o servidor anuncia
+    // suporte (events.live no /api/health) - worker sync ficaria preso.
+    let eventos = null;
+    let timer = null;
+    let ativo = true;
+
+    fetch(`${API_URL}/api/health`)
+      .then((response) => response.json())
+      .then((health) => {
+        if (!ativo || !health.events?.live) return;
+
+        eventos = new EventSource(`${API_URL}/api/events`);
+        eventos.addEventListener("change", (e) => {
+          const evento = JSON.parse(e.data);
+          if (evento.counters) {
+            setStats((atual) => (atual ? { ...atual, ...evento.counters } : atual));
+          }
+          if (!timer) {
+            timer = setTimeout(() => {
+              timer = null;
+              carregarDados(false);
+            }, 2000);
+          }
+        });
+      })
+      .catch(() => {});
+
+    return () => {
+      ativo = false;
+      if (eventos) eventos.close();
+      clearTimeout(timer);
+    };
   }, []);
 
-  async function carregarDados() {
-    setLoading(true);
+  async function carregarDados(mostrarLoading = true) {
+    if (mostrarLoading) setLoading(true);
     setError("");
 
     try {